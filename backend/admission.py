@@ -0,0 +1,143 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is rejected instead of queued, `retry_after` is the suggested wait in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number of generations running at once. Requests beyond `max_in_flight` wait in a queue of
+    at most `max_queue` requests; requests beyond that are rejected right away with Overloaded, carrying
+    an estimate of when a slot frees up based on recent generation durations.
+    A `max_in_flight` of 0 disables admission control.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, initial_estimate: float = 30.0, smoothing: float = 0.2):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.average_duration = initial_estimate  # Exponentially weighted, in seconds
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._slots: Optional[asyncio.Semaphore] = None  # Created on first use, inside the event loop
+
+    def retry_after(self) -> float:
+        """
+        Estimated seconds until a newly arriving request would be admitted to the queue.
+        """
+        rounds = (self.waiting - self.max_queue) // max(1, self.max_in_flight) + 1
+        return max(1.0, self.average_duration * max(1, rounds))
+
+    async def acquire(self, wait: bool = False) -> None:
+        """
+        Takes a generation slot. Requests queue if all slots are taken, unless the queue is full,
+        in which case Overloaded is raised; with `wait` the queue limit does not apply.
+        """
+        if self.max_in_flight <= 0:
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self._slots.locked() and not wait and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Too many summaries in progress, please retry later.", self.retry_after())
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    async def try_acquire(self) -> bool:
+        """
+        Takes a generation slot if one is free and nobody is waiting for it, without waiting; returns whether
+        it did. For extra generations of a request that already holds a slot.
+        """
+        if self.max_in_flight <= 0:
+            return True
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self._slots.locked() or self.waiting:
+            return False
+        # Does not suspend, the semaphore is not locked
+        await self._slots.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self, duration: Optional[float] = None) -> None:
+        if self.max_in_flight <= 0:
+            return
+        self.in_flight -= 1
+        self._slots.release()
+        if duration is not None:
+            self.average_duration += self.smoothing * (duration - self.average_duration)
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False):
+        await self.acquire(wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "average_duration": round(self.average_duration, 3),
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket per client: every client may spend `burst` requests at once, refilled at
+    `rate` requests per second. A `rate` of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # Client -> (tokens, time.monotonic() of the last update)
+
+    def acquire(self, client: str, cost: float = 1.0) -> Optional[float]:
+        """
+        Takes `cost` tokens from the client's bucket. Returns None if the client is within its quota,
+        otherwise the seconds until enough tokens are available.
+        """
+        if self.rate <= 0:
+            return None
+        # Requests larger than the bucket take all of it, they could never be admitted otherwise
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < cost:
+            self._buckets[client] = (tokens, now)
+            return math.ceil((cost - tokens) / self.rate)
+        self._buckets[client] = (tokens - cost, now)
+        if len(self._buckets) > self.max_clients:
+            # Buckets that have been refilled completely carry no state worth keeping
+            self._buckets = {
+                key: (value, at) for key, (value, at) in self._buckets.items()
+                if min(self.burst, value + (now - at) * self.rate) < self.burst
+            }
+        return None
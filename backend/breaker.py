@@ -0,0 +1,117 @@
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling an upstream that is failing, `retry_after` is the wait in seconds until it is tried again.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive failures. While the circuit is open,
+    calls fail right away with CircuitOpen; once the backoff has passed, a single call is let through to
+    probe the upstream. A successful probe closes the circuit, a failed one opens it again for twice as long,
+    up to `max_backoff` seconds.
+    `is_failure` decides which exceptions count as upstream failures; other exceptions mean the upstream
+    answered (e.g. "not found") and count as successes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        is_failure: Callable[[Exception], bool] = lambda error: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.is_failure = is_failure
+        self.failures = 0  # Consecutive failures
+        self.opened = 0  # Times the circuit opened
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._current_backoff = backoff
+        self._open_until: Optional[float] = None  # time.monotonic() until which calls are rejected, None if closed
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._open_until is None:
+            return "closed"
+        if self._probing or time.monotonic() >= self._open_until:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        """
+        Raises CircuitOpen unless a call may go to the upstream now.
+        """
+        if self._open_until is None or self.failure_threshold <= 0:
+            return
+        now = time.monotonic()
+        if now >= self._open_until and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        retry_after = max(1, math.ceil(self._open_until - now))
+        raise CircuitOpen(f"{self.name} is failing ({self.last_error}), retrying in {retry_after} s.", retry_after)
+
+    def success(self) -> None:
+        self.failures = 0
+        self._open_until = None
+        self._current_backoff = self.backoff
+
+    def failure(self, error: Exception) -> None:
+        self.failures += 1
+        # Upstream errors can span many lines, the first one is enough to tell what happened
+        self.last_error = (str(error).strip().splitlines() or [type(error).__name__])[0][:200]
+        if self.failure_threshold <= 0:
+            return
+        if self._probing:
+            # The upstream is still failing, wait longer before the next probe
+            self._current_backoff = min(self._current_backoff * 2, self.max_backoff)
+        elif self.failures < self.failure_threshold:
+            return
+        self.opened += 1
+        self._open_until = time.monotonic() + self._current_backoff
+
+    @asynccontextmanager
+    async def call(self):
+        """
+        Guards an upstream call: raises CircuitOpen while the circuit is open, records the outcome otherwise.
+        """
+        self.check()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.failure(e)
+            else:
+                self.success()
+            raise
+        else:
+            self.success()
+        finally:
+            # A cancelled probe leaves the circuit half open, the next call probes again
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "backoff": self._current_backoff,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,379 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class SQLiteCache:
+    """
+    Persistent key/value store backed by SQLite.
+    Values are stored as JSON, entries expire after `ttl` seconds and the least recently
+    used entries are evicted once the total stored size exceeds `max_bytes`.
+    Every method is blocking, callers on the event loop should run them on an executor.
+    """
+
+    def __init__(self, path: str, table: str = "entries", max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+        # Kept up to date by every write, so that inserts do not have to sum up the table
+        self._size = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._delete(key)
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Stores `value` under `key` and evicts least recently used entries if the store grew too large.
+        """
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete(key)
+                self._conn.execute(
+                    f"INSERT INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now),
+                )
+                self._size += len(payload)
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._size = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+                raise
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._delete(key)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Drops the entries whose keys start with `prefix`, returns how many there were.
+        """
+        # A key range rather than LIKE, which would need escaping and could not use the primary key
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        condition = f"FROM {self.table} WHERE key >= ? AND key < ?"
+        with self._lock:
+            entries, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) {condition}", (prefix, end)).fetchone()
+            self._conn.execute(f"DELETE {condition}", (prefix, end))
+            self._size -= size
+        return entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def _delete(self, key: str) -> None:
+        row = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            condition = f"FROM {self.table} WHERE created_at < ?"
+            expired = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) {condition}", (now - self.ttl,)).fetchone()[0]
+            if expired:
+                self._conn.execute(f"DELETE {condition}", (now - self.ttl,))
+                self._size -= expired
+        if self._size <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._size -= size
+            if self._size <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss counters together with the current number of entries and stored size.
+        """
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key so that only one of them does the work.
+    Callers arriving while a call is in flight await it and receive its result or exception.
+    The work runs as its own task, so a disconnecting caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Starts `fn` unless a call for `key` is in flight, and returns the task of the call without awaiting it.
+        """
+        task = self.join(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(functools.partial(self._finished, key))
+        return task
+
+    def join(self, key: str) -> Optional[asyncio.Task]:
+        """
+        Returns the task of the call for `key` in flight, or None if there is none.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class TokenStream:
+    """
+    Text of a generation in progress, shared by every request for it: a follower first receives all tokens
+    produced so far, then the new ones as they arrive. If every follower leaves before the generation is
+    closed, `on_abandoned` is called, e.g. to cancel the generation.
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.closed = False
+        self.followers = 0
+        self.on_abandoned: Optional[Callable[[], Any]] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, token: str) -> None:
+        self.tokens.append(token)
+        self._notify()
+
+    def close(self) -> None:
+        self.closed = True
+        self._notify()
+
+    @contextmanager
+    def follower(self):
+        """
+        Counts the caller as a follower while the block runs.
+        """
+        self.followers += 1
+        try:
+            yield self
+        finally:
+            self.followers -= 1
+            if self.followers == 0 and not self.closed and self.on_abandoned is not None:
+                self.on_abandoned()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """
+        Yields the text produced so far as one piece, then every new token, until the stream is closed.
+        """
+        position = 0
+        while True:
+            changed = self._changed
+            if position < len(self.tokens):
+                text = "".join(self.tokens[position:])
+                position = len(self.tokens)
+                yield text
+                continue
+            if self.closed:
+                return
+            await changed.wait()
+
+
+class TTLCache:
+    """
+    In-memory cache with stale-while-revalidate semantics for cheap, frequently repeated lookups.
+    Entries younger than `ttl` are served directly. Entries younger than `ttl + stale_ttl` are still
+    served immediately while a background refresh replaces them, so callers never wait for the
+    upstream once the cache is warm. Loads of the same key are coalesced, and None is never cached.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._refreshes: Set[asyncio.Task] = set()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._refresh_in_background(key, loader)
+                return value
+        self.misses += 1
+        return await self._flight.do(key, functools.partial(self._load, key, loader))
+
+    async def refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Loads `key` again, bypassing the cached value.
+        """
+        return await self._flight.do(key, functools.partial(self._load, key, loader))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        async def refresh():
+            try:
+                await self.refresh(key, loader)
+            except Exception:
+                # Keep serving the stale value, the next lookup retries
+                pass
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+        }
+
+
+class NegativeCache:
+    """
+    Remembers failed lookups for a short time, so that repeating a request for something known not to
+    exist (e.g. a video without transcripts) fails immediately instead of asking the upstream again.
+    Stores the exception of the failure, `get` returns a fresh copy of it for the caller to raise.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self._entries: "OrderedDict[str, Tuple[float, Exception]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Exception]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, error = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self.hits += 1
+        return self._copy(error)
+
+    @staticmethod
+    def _copy(error: Exception) -> Exception:
+        # Without traceback, cause and context: raising one instance again and again would grow its traceback
+        # and keep the frames of every raise alive. __init__ is skipped, exception constructors often take
+        # other arguments than they keep in `args`
+        copy = type(error).__new__(type(error), *error.args)
+        copy.__dict__.update(error.__dict__)
+        return copy
+
+    def set(self, key: str, error: Exception) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic(), self._copy(error))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, prefix: Optional[str] = None) -> None:
+        if prefix is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "entries": len(self._entries), "ttl": self.ttl}
@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import ollama
+
+# Ollama instance used when a request does not name one via the X-Ollama-API-URL header
+DEFAULT_OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "600"))  # Seconds, generation of long summaries takes a while
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # Seconds
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+# Threads available to blocking library calls (youtube_transcript_api), bounds concurrent YouTube requests
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+_ollama_clients: Dict[str, ollama.AsyncClient] = {}
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+
+
+def http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared, connection pooled HTTP client.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+def ollama_host(ollama_api_url: Optional[str] = None) -> str:
+    """
+    Normalizes an Ollama URL, falling back to DEFAULT_OLLAMA_API_URL.
+    """
+    return (ollama_api_url or DEFAULT_OLLAMA_API_URL).rstrip("/")
+
+
+def ollama_client(ollama_api_url: Optional[str] = None) -> ollama.AsyncClient:
+    """
+    Returns the cached async Ollama client of the given host, creating it on first use.
+    Every host keeps its own connection pool, so requests to the same host reuse connections.
+    """
+    host = ollama_host(ollama_api_url)
+    client = _ollama_clients.get(host)
+    if client is None:
+        client = _ollama_clients[host] = ollama.AsyncClient(host=host, timeout=OLLAMA_TIMEOUT)
+    return client
+
+
+def forget_ollama_client(client: ollama.AsyncClient) -> None:
+    """
+    Drops a client from the cache, so that the next request for its host creates a new one.
+    """
+    for host, cached in list(_ollama_clients.items()):
+        if cached is client:
+            del _ollama_clients[host]
+
+
+async def close_ollama_client(client: ollama.AsyncClient) -> None:
+    forget_ollama_client(client)
+    # ollama.AsyncClient wraps an httpx.AsyncClient but does not expose a close method
+    inner = getattr(client, "_client", None)
+    if inner is not None:
+        await inner.aclose()
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a blocking call on the bounded executor so it does not stall the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def close_clients() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    for client in list(_ollama_clients.values()):
+        await close_ollama_client(client)
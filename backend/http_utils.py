@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from clients import run_blocking
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, responses fall back to gzip
+    brotli = None
+
+# Responses smaller than this are sent uncompressed, compression would not pay off
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Responses larger than this are compressed on the blocking I/O executor instead of the event loop
+COMPRESSION_THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", str(128 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+
+def select_fields(payload: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """
+    Keeps only the comma separated `fields` of a response, e.g. `fields=summary`, and its `error` if it has one.
+    Raises 400 for fields the response does not have.
+    """
+    if not fields:
+        return payload
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in payload]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(payload)}.")
+    # A failed request must not look like an empty result
+    if payload.get("error") is not None and "error" not in selected:
+        selected.append("error")
+    return {field: payload[field] for field in selected}
+
+
+def entity_tag(*parts: Optional[str]) -> str:
+    """
+    Weak ETag over the inputs that determine a response, including the selected fields, so that it stays
+    the same across compressed and uncompressed representations and across backend restarts.
+    """
+    digest = hashlib.sha256("\x00".join(part or "" for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """
+    Whether the client's If-None-Match already names `etag` (weak comparison, as for GET requests).
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in header.split(",")}
+
+
+def _accepted_encodings(request: Request) -> List[str]:
+    accepted = []
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.append(coding.strip().lower())
+    return accepted
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+async def compress_body(request: Request, body: bytes) -> Tuple[bytes, Optional[str]]:
+    """
+    Compresses a response body with the best encoding the client accepts (brotli, then gzip).
+    Returns the body and its Content-Encoding, which is None if the body is sent as is.
+    """
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    accepted = _accepted_encodings(request)
+    if brotli is not None and "br" in accepted:
+        encoding = "br"
+    elif "gzip" in accepted:
+        encoding = "gzip"
+    else:
+        return body, None
+    if len(body) > COMPRESSION_THREAD_BYTES:
+        return await run_blocking(_compress, body, encoding), encoding
+    return _compress(body, encoding), encoding
+
+
+async def json_response(
+    request: Request,
+    content: Any,
+    fields: Optional[str] = None,
+    etag: Optional[str] = None,
+) -> Response:
+    """
+    Serializes a response model (or dict) once, reduced to the selected `fields`, compressed as the client
+    accepts it, and tagged with `etag`. Answers 304 Not Modified if the client already has that ETag.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+    payload = select_fields(jsonable_encoder(content), fields)
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body, encoding = await compress_body(request, body)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
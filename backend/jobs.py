@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class Job:
+    """
+    A unit of background work together with its status, progress and result.
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any], host: str, priority: int = 0):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.host = host
+        self.priority = priority
+        self.sequence = 0
+        self.status = "queued"  # queued, running, done, failed
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def set_progress(self, stage: str, fraction: float) -> None:
+        self.stage = stage
+        self.progress = max(0.0, min(1.0, fraction))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+class JobQueue:
+    """
+    In-process job queue with one priority queue and a fixed number of workers per Ollama host
+    (or pool of hosts). Jobs with a higher priority run first, jobs of equal priority run in submission
+    order, and no host ever runs more than `concurrency_for(host)` jobs at once.
+    Finished jobs are kept for `retention` seconds so that clients can poll their results.
+    Queues and workers of a host are dropped once the host has had no jobs for `idle_timeout` seconds, hosts
+    come and go with the X-Ollama-API-URL header of the requests.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Job], Awaitable[Any]],
+        concurrency_for: Callable[[str], int] = lambda host: 1,
+        retention: float = 3600,
+        idle_timeout: float = 300,
+    ):
+        self._run = run
+        self.concurrency_for = concurrency_for
+        self.retention = retention
+        self.idle_timeout = idle_timeout
+        self._jobs: Dict[str, Job] = {}
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._workers: Dict[str, List[asyncio.Task]] = {}
+        self._sequence = itertools.count()
+
+    def submit(self, kind: str, params: Dict[str, Any], host: str, priority: int = 0) -> Job:
+        self._purge()
+        job = Job(kind, params, host, priority)
+        job.sequence = next(self._sequence)
+        self._jobs[job.id] = job
+        self._queue_for(host).put_nowait((-priority, job.sequence, job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """
+        Returns the number of queued jobs on the same host that run before `job`, or None if it is not queued.
+        """
+        if job.status != "queued":
+            return None
+        key = (-job.priority, job.sequence)
+        return sum(
+            1 for other in self._jobs.values()
+            if other.status == "queued" and other.host == job.host and (-other.priority, other.sequence) < key
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "jobs": counts,
+            "queued_per_host": {host: queue.qsize() for host, queue in self._queues.items()},
+        }
+
+    def _queue_for(self, host: str) -> asyncio.PriorityQueue:
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = asyncio.PriorityQueue()
+            self._workers[host] = [
+                asyncio.create_task(self._worker(host, queue)) for _ in range(max(1, self.concurrency_for(host)))
+            ]
+        return queue
+
+    def _is_idle(self, host: str, queue: asyncio.PriorityQueue) -> bool:
+        return queue.empty() and not any(job.status == "running" and job.host == host for job in self._jobs.values())
+
+    def _reap(self, host: str) -> None:
+        # Called by one of the host's workers, which returns right after; the others wait for jobs and are cancelled
+        del self._queues[host]
+        for task in self._workers.pop(host):
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    async def _worker(self, host: str, queue: asyncio.PriorityQueue) -> None:
+        while True:
+            try:
+                _, _, job = await asyncio.wait_for(queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                if self._queues.get(host) is queue and self._is_idle(host, queue):
+                    self._reap(host)
+                    return
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self._run(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Job was cancelled."
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                queue.task_done()
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    async def stop(self) -> None:
+        workers = [task for tasks in self._workers.values() for task in tasks]
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
@@ -1,15 +1,254 @@
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-import ollama
-from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, CouldNotRetrieveTranscript
-import requests
-from typing import Optional, List, Dict
+import youtube_transcript_api
+from youtube_transcript_api import (
+    YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, CouldNotRetrieveTranscript, VideoUnavailable, InvalidVideoId,
+)
+import httpx
+import os
+import hashlib
+import math
+import functools
+import json
+import asyncio
+import re
+import time
+import threading
+from contextlib import asynccontextmanager, nullcontext
+from typing import Optional, List, Dict, Any, Tuple, Callable, Set, Awaitable
+
+from cache import NegativeCache, SQLiteCache, SingleFlight, TokenStream, TTLCache
+from summarize import compact_segments, context_window, estimate_tokens, format_timestamp, summarize_chunks, trim_to_budget
+from clients import http_client, run_blocking, close_clients
+from ollama_pool import DEFAULT_MODEL, OLLAMA_HOSTS, OllamaPool, normalize_model, ollama_pool, default_pool
+from jobs import Job, JobQueue
+from sessions import AnalysisSession, SessionStore
+from admission import AdmissionController, Overloaded, RateLimiter
+from http_utils import entity_tag, json_response, not_modified
+from breaker import CircuitBreaker, CircuitOpen
+from profiles import CHUNKED, DEFAULT_SUMMARY_PROFILE, FULL, SAMPLE, SUMMARY_PROFILES, SummaryProfile, get_profile, sample_segments
+from prewarm import Prewarmer
+from segment_store import CompactTranscript, SegmentStore, fts_query
+from retrieval import EmbeddingIndex, EmbeddingIndexStore, format_passage, index_key, retrieval_chunks
+from metrics import (
+    ADMISSION_REJECTED, REQUEST_SECONDS, SUMMARY_LATENCY_TARGET_MISSED, SUMMARY_SECONDS, UPSTREAM_FAST_FAILURES, SERVER_TIMING, TRANSCRIPT_TOKENS, observe_generation, server_timing_header, stage, start_request_timings,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    default_pool.start()
+    if PREWARM_WATCH_LIST or PREWARM_FEED_URLS:
+        prewarmer.start()
+    yield
+    await prewarmer.stop()
+    await default_pool.stop()
+    await job_queue.stop()
+    # Release the pooled HTTP and Ollama connections on shutdown
+    await close_clients()
+
+app = FastAPI(lifespan=lifespan)
+
+# Requests to these paths are monitoring, not live traffic that pre-warming would have to yield to
+MONITORING_PATHS = ("/metrics", "/cache_stats", "/ollama_hosts", "/prewarm")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Observes the request duration per route and reports the stage timings in a Server-Timing header.
+    Streaming responses are measured until their headers are sent.
+    """
+    timings = start_request_timings()
+    started = time.perf_counter()
+    if not request.url.path.startswith(MONITORING_PATHS):
+        prewarmer.note_activity()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=str(response.status_code),
+    ).observe(elapsed)
+    if SERVER_TIMING:
+        timings["total"] = elapsed
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+# Transcript cache settings, shared by all endpoints that need transcripts
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+TRANSCRIPT_CACHE_MAX_MB = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512"))
+TRANSCRIPT_CACHE_TTL = float(os.getenv("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+
+transcript_cache = SQLiteCache(
+    os.path.join(CACHE_DIR, "transcripts.sqlite3"),
+    table="transcripts",
+    max_bytes=TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024,
+    ttl=TRANSCRIPT_CACHE_TTL,
+)
+# Transcript segments are stored in columnar form with a full-text index over all of them, so that
+# cached transcripts can be searched and sliced by time without joining their segments again
+segment_store = SegmentStore(
+    os.path.join(CACHE_DIR, "segments.sqlite3"),
+    max_bytes=TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024,
+    ttl=TRANSCRIPT_CACHE_TTL,
+)
+# Transcript search returns at most TRANSCRIPT_SEARCH_MAX_VIDEOS videos, ranked among the best TRANSCRIPT_SEARCH_MAX_HITS segments
+TRANSCRIPT_SEARCH_MAX_VIDEOS = int(os.getenv("TRANSCRIPT_SEARCH_MAX_VIDEOS", "100"))
+TRANSCRIPT_SEARCH_MAX_HITS = int(os.getenv("TRANSCRIPT_SEARCH_MAX_HITS", "2000"))
 
-app = FastAPI()
+# Summary cache settings, summaries are keyed by a hash of video, language, model and prompt
+SUMMARY_CACHE_MAX_MB = int(os.getenv("SUMMARY_CACHE_MAX_MB", "128"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds
+
+summary_cache = SQLiteCache(
+    os.path.join(CACHE_DIR, "summaries.sqlite3"),
+    table="summaries",
+    max_bytes=SUMMARY_CACHE_MAX_MB * 1024 * 1024,
+    ttl=SUMMARY_CACHE_TTL,
+)
+# Concurrent identical summary requests share a single generation
+summary_flight = SingleFlight()
+# Token streams of the streamed generations in summary_flight, followed by every identical streaming request
+summary_streams: Dict[str, TokenStream] = {}
+
+# Upstream endpoints, overridable to point the backend at local stand-ins (see bench/)
+YOUTUBE_OEMBED_URL = os.getenv("YOUTUBE_OEMBED_URL", "https://www.youtube.com/oembed")
+# If set, transcripts are fetched from this HTTP service instead of YouTube via youtube_transcript_api.
+# GET {url}/transcripts/{video_id} returns {"languages": [...]}, GET {url}/transcripts/{video_id}/{language}
+# returns {"segments": [...]}; 404 means no transcript, 403 means transcripts are disabled.
+TRANSCRIPT_SERVICE_URL = os.getenv("TRANSCRIPT_SERVICE_URL")
+
+TRANSCRIPT_LIST_TTL = float(os.getenv("TRANSCRIPT_LIST_TTL", "300"))  # Seconds a listed TranscriptList handle is reused
+
+# Videos without transcripts (in a language) and unknown videos are remembered for a while, so that retries
+# fail without asking YouTube again
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "300"))  # Seconds, 0 disables negative caching
+def transcript_errors(*names: str) -> Tuple[type, ...]:
+    """
+    The youtube_transcript_api exceptions of these names that the installed version defines.
+    """
+    return tuple(getattr(youtube_transcript_api, name) for name in names if hasattr(youtube_transcript_api, name))
+
+class TranscriptServiceUnavailable(CouldNotRetrieveTranscript):
+    """
+    Raised when TRANSCRIPT_SERVICE_URL fails or rate-limits requests (429 or 5xx).
+    """
+    CAUSE_MESSAGE = "The transcript service is failing or rate-limiting requests."
+
+# Transcript outcomes that are definitive for a video or one of its languages, as opposed to YouTube failing
+# or rate-limiting us
+LANGUAGE_TRANSCRIPT_ERRORS = (NoTranscriptFound,) + transcript_errors("NotTranslatable", "TranslationLanguageNotAvailable")
+DEFINITIVE_TRANSCRIPT_ERRORS = LANGUAGE_TRANSCRIPT_ERRORS + (TranscriptsDisabled, VideoUnavailable, InvalidVideoId) + transcript_errors(
+    "AgeRestricted", "VideoUnplayable",
+)
+# Failures of the upstream itself, the only ones that count towards opening the transcript circuit;
+# requests and httpx connection errors are OSError and httpx.HTTPError
+UPSTREAM_TRANSCRIPT_ERRORS = (TranscriptServiceUnavailable, OSError, httpx.HTTPError) + transcript_errors(
+    "RequestBlocked", "IpBlocked", "TooManyRequests", "YouTubeRequestFailed",
+)
+
+negative_cache = NegativeCache(ttl=NEGATIVE_CACHE_TTL)
+# Concurrent lookups of the same transcript or language list share one read and, on a miss, one download
+transcript_flight = SingleFlight()
+
+# After UPSTREAM_FAILURE_THRESHOLD consecutive failures of YouTube transcripts or oEmbed, requests fail right
+# away; the upstream is probed again after UPSTREAM_BACKOFF seconds, doubling up to UPSTREAM_MAX_BACKOFF
+UPSTREAM_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_FAILURE_THRESHOLD", "5"))  # 0 disables circuit breaking
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "5"))
+UPSTREAM_MAX_BACKOFF = float(os.getenv("UPSTREAM_MAX_BACKOFF", "300"))
+
+transcript_breaker = CircuitBreaker(
+    "YouTube transcripts", UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_BACKOFF, UPSTREAM_MAX_BACKOFF,
+    is_failure=lambda error: isinstance(error, UPSTREAM_TRANSCRIPT_ERRORS),
+)
+oembed_breaker = CircuitBreaker("YouTube oEmbed", UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_BACKOFF, UPSTREAM_MAX_BACKOFF)
+
+# In-memory caches for model lists (per Ollama pool) and oEmbed metadata (per video). Stale entries
+# are served while they are refreshed in the background, so warm lookups never wait for upstream.
+MODEL_LIST_TTL = float(os.getenv("MODEL_LIST_TTL", "30"))  # Seconds
+MODEL_LIST_STALE_TTL = float(os.getenv("MODEL_LIST_STALE_TTL", "600"))  # Seconds
+OEMBED_TTL = float(os.getenv("OEMBED_TTL", str(24 * 3600)))  # Seconds
+OEMBED_STALE_TTL = float(os.getenv("OEMBED_STALE_TTL", str(7 * 24 * 3600)))  # Seconds
+
+model_list_cache = TTLCache(ttl=MODEL_LIST_TTL, stale_ttl=MODEL_LIST_STALE_TTL)
+oembed_cache = TTLCache(ttl=OEMBED_TTL, stale_ttl=OEMBED_STALE_TTL, max_entries=int(os.getenv("OEMBED_CACHE_MAX_ENTRIES", "10000")))
+
+# Transcripts longer than the threshold are summarized in token-budgeted chunks (map-reduce)
+LONG_TRANSCRIPT_THRESHOLD_TOKENS = int(os.getenv("LONG_TRANSCRIPT_THRESHOLD_TOKENS", "6000"))
+LONG_TRANSCRIPT_CHUNK_TOKENS = int(os.getenv("LONG_TRANSCRIPT_CHUNK_TOKENS", "3000"))
+LONG_TRANSCRIPT_PARALLELISM = int(os.getenv("LONG_TRANSCRIPT_PARALLELISM", "2"))  # Concurrent chunk generations per summary
+
+# Transcripts are compacted before prompting (non-speech annotations, hesitations and repeated caption
+# fragments removed) and optionally trimmed to a token budget
+TRANSCRIPT_COMPACTION = os.getenv("TRANSCRIPT_COMPACTION", "true").lower() in ("1", "true", "yes")
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "0"))  # 0 disables trimming
+
+# num_ctx of every generation is sized to its prompt plus the expected output, within these bounds
+NUM_CTX_MIN = int(os.getenv("NUM_CTX_MIN", "2048"))
+NUM_CTX_MAX = int(os.getenv("NUM_CTX_MAX", "32768"))
+SUMMARY_OUTPUT_TOKENS = int(os.getenv("SUMMARY_OUTPUT_TOKENS", "1024"))
+
+# Analysis sessions keep a transcript in a conversation for follow-up questions
+ANALYSIS_SESSION_TTL = float(os.getenv("ANALYSIS_SESSION_TTL", "1800"))  # Seconds since the last question
+ANALYSIS_MAX_SESSIONS = int(os.getenv("ANALYSIS_MAX_SESSIONS", "100"))
+ANALYSIS_HISTORY_TOKENS = int(os.getenv("ANALYSIS_HISTORY_TOKENS", "2048"))  # Context reserved for questions and answers
+
+# Questions about a video are answered from the transcript passages most similar to the question, found in
+# an embedding index that is built once per video, language and embedding model and kept on disk
+EMBEDDING_MODEL = normalize_model(os.getenv("EMBEDDING_MODEL", "nomic-embed-text"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # Passages per embedding request
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "256"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_MAX_TOP_K = int(os.getenv("RETRIEVAL_MAX_TOP_K", "16"))
+
+# Indexes expire with the transcripts they were built from
+embedding_indexes = EmbeddingIndexStore(
+    os.path.join(CACHE_DIR, "embeddings"),
+    max_loaded=int(os.getenv("EMBEDDING_INDEXES_LOADED", "64")),
+    max_bytes=int(os.getenv("EMBEDDING_INDEX_MAX_MB", "512")) * 1024 * 1024,
+    ttl=TRANSCRIPT_CACHE_TTL,
+)
+# Concurrent questions about a video that has no index yet share a single build
+embedding_flight = SingleFlight()
+
+# Batch summaries fetch transcripts with a wide fan-out and feed them into a narrow generation pipeline
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "500"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "8"))
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "1"))
+
+# Videos of a watch list (IDs or URLs, comma separated or a file with one per line) and of channel feeds
+# are summarized in advance while the backend is idle, so that the first request for them is a cache hit
+PREWARM_WATCH_LIST = os.getenv("PREWARM_WATCH_LIST", "")
+PREWARM_FEED_URLS = [url.strip() for url in os.getenv("PREWARM_FEED_URLS", "").split(",") if url.strip()]
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "600"))  # Seconds between rounds over the watch list
+PREWARM_IDLE_SECONDS = float(os.getenv("PREWARM_IDLE_SECONDS", "30"))  # Seconds without requests before warming
+PREWARM_MAX_VIDEOS = int(os.getenv("PREWARM_MAX_VIDEOS", "50"))  # Videos warmed per round
+PREWARM_PROMPT = os.getenv("PREWARM_PROMPT") or None  # Prompt of the warmed summaries, the profile's default if unset
+
+# Admission control: at most GENERATION_MAX_IN_FLIGHT summaries are generated at once and GENERATION_MAX_QUEUE
+# more wait for a slot; further interactive requests are rejected with 429. Jobs and batches always wait.
+GENERATION_MAX_IN_FLIGHT = int(os.getenv("GENERATION_MAX_IN_FLIGHT", str(2 * len(OLLAMA_HOSTS))))  # 0 disables
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "16"))
+# Optional quota on summary requests per client address, as a token bucket
+CLIENT_RATE_LIMIT = float(os.getenv("CLIENT_RATE_LIMIT", "0"))  # Requests per minute, 0 disables
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "10"))  # Requests a client may send at once
+
+generation_admission = AdmissionController(GENERATION_MAX_IN_FLIGHT, GENERATION_MAX_QUEUE)
+client_quota = RateLimiter(CLIENT_RATE_LIMIT / 60, CLIENT_BURST)
+
+# Background summary jobs
+JOB_CONCURRENCY_PER_HOST = int(os.getenv("JOB_CONCURRENCY_PER_HOST", "1"))  # Jobs running at once per Ollama host
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))  # Seconds finished jobs can still be polled
+JOB_IDLE_TIMEOUT = float(os.getenv("JOB_IDLE_TIMEOUT", "300"))  # Seconds the queue of a pool without jobs is kept
 
 class VideoSummaryResponse(BaseModel):
     summary: Optional[str] = None
     transcript: Optional[str] = None
+    transcript_tokens: Optional[int] = None  # Estimated tokens of the transcript as fetched
+    compacted_tokens: Optional[int] = None  # Estimated tokens of the transcript sent to the model
+    profile: Optional[str] = None
     error: Optional[str] = None
 
 class VideoMetadata(BaseModel):
@@ -18,23 +257,398 @@ class VideoMetadata(BaseModel):
     thumbnail_url: str
     supported_languages: List[Dict[str, str]]
 
+class VideoPrepareResponse(VideoMetadata):
+    models: List[str] = []
+    default_model: Optional[str] = None  # Model the backend would pick, preferably one already loaded
+    models_error: Optional[str] = None
+    profiles: List[Dict[str, Any]] = []
+    default_profile: Optional[str] = None
+
 class VideoTranscriptResponse(BaseModel):
     transcript: Optional[str] = None
     error: Optional[str] = None
 
+class TranscriptSegment(BaseModel):
+    start_ms: int
+    end_ms: int
+    text: str
+
+class VideoSegmentsResponse(BaseModel):
+    segments: List[TranscriptSegment] = []
+    error: Optional[str] = None
+
+class TranscriptSearchResult(BaseModel):
+    video_id: str
+    language: str
+    score: float  # Relevance of the best matching segment, higher is better
+    matches: List[TranscriptSegment]
+
+class TranscriptSearchResponse(BaseModel):
+    query: str
+    results: List[TranscriptSearchResult] = []
+    error: Optional[str] = None
+
+class SummaryJobRequest(BaseModel):
+    video_id: str
+    language: Optional[str] = "en"
+    model: Optional[str] = None
+    prompt: Optional[str] = None
+    profile: Optional[str] = None  # One of SUMMARY_PROFILES, DEFAULT_SUMMARY_PROFILE by default
+    priority: int = 0  # Jobs with a higher priority run first
+
+class BatchSummaryRequest(BaseModel):
+    video_ids: List[str] = []  # Video IDs or URLs
+    video_ids_text: Optional[str] = None  # Contents of a file with one video ID or URL per line
+    playlist: Optional[str] = None  # Playlist ID or URL
+    language: Optional[str] = "en"
+    model: Optional[str] = None
+    prompt: Optional[str] = None
+    profile: Optional[str] = None
+
+class AnalysisSessionRequest(BaseModel):
+    video_id: str
+    language: Optional[str] = "en"
+    model: Optional[str] = None
+
+class AnalysisQuestionRequest(BaseModel):
+    question: Optional[str] = None
+    preset: Optional[str] = None  # One of ANALYSIS_PRESETS, used if no question is given
+
+class AnalysisSessionResponse(BaseModel):
+    session_id: Optional[str] = None
+    video_id: Optional[str] = None
+    language: Optional[str] = None
+    model: Optional[str] = None
+    num_ctx: Optional[int] = None
+    transcript_tokens: Optional[int] = None
+    compacted_tokens: Optional[int] = None
+    history: List[Dict[str, str]] = []
+    error: Optional[str] = None
+
+class AnalysisAnswerResponse(BaseModel):
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    prompt_eval_count: Optional[int] = None  # Tokens Ollama evaluated for this question, excluding the reused prefix
+    prompt_eval_ms: Optional[float] = None
+    eval_count: Optional[int] = None
+    eval_ms: Optional[float] = None
+    error: Optional[str] = None
+
+class VideoQuestionRequest(BaseModel):
+    question: str
+    language: Optional[str] = "en"
+    model: Optional[str] = None
+    top_k: Optional[int] = None  # Passages to answer from, RETRIEVAL_TOP_K by default
+
+class AnswerSource(BaseModel):
+    start: float
+    end: float
+    timestamp: str
+    text: str
+    score: float
+
+class VideoAnswerResponse(BaseModel):
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    model: Optional[str] = None
+    sources: List[AnswerSource] = []
+    passages: Optional[int] = None  # Passages in the video's index
+    index_cached: Optional[bool] = None  # False if the index was built for this question
+    prompt_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float = 0.0
+    queue_position: Optional[int] = None
+    result: Optional[VideoSummaryResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+def _list_transcript_languages(transcript_list) -> List[Dict[str, str]]:
+    # Collect all available transcripts (both manually created and generated)
+    return [
+        {"code": transcript.language_code, "name": transcript.language}
+        for transcript in transcript_list
+    ]
+
+# Recently listed TranscriptList handles, so that fetching a transcript right after listing the
+# languages (e.g. summarizing after /video_prepare) does not list the transcripts again
+_transcript_lists: Dict[str, Tuple[float, Any]] = {}
+_transcript_lists_lock = threading.Lock()
+
+def _get_transcript_list(youtube_video_id: str):
+    now = time.monotonic()
+    with _transcript_lists_lock:
+        entry = _transcript_lists.get(youtube_video_id)
+        if entry is not None and now - entry[0] < TRANSCRIPT_LIST_TTL:
+            return entry[1]
+    transcript_list = YouTubeTranscriptApi.list_transcripts(youtube_video_id)
+    with _transcript_lists_lock:
+        # Drop expired handles so the dictionary does not grow unbounded
+        for video_id in [video_id for video_id, (listed_at, _) in _transcript_lists.items() if now - listed_at >= TRANSCRIPT_LIST_TTL]:
+            del _transcript_lists[video_id]
+        _transcript_lists[youtube_video_id] = (now, transcript_list)
+    return transcript_list
+
+async def guarded_transcript_call(negative_keys: List[str], fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Calls the transcript upstream through the circuit breaker. Definitive failures are remembered under the
+    first of `negative_keys` (the video) or, for a missing language, under the last one, and raised again
+    without a call while they are remembered.
+    """
+    for key in negative_keys:
+        error = negative_cache.get(key)
+        if error is not None:
+            UPSTREAM_FAST_FAILURES.labels(upstream="transcripts", reason="negative_cache").inc()
+            raise error
+    try:
+        async with transcript_breaker.call():
+            return await fn()
+    except CircuitOpen:
+        UPSTREAM_FAST_FAILURES.labels(upstream="transcripts", reason="circuit_open").inc()
+        raise
+    except LANGUAGE_TRANSCRIPT_ERRORS as e:
+        negative_cache.set(negative_keys[-1], e)
+        raise
+    except DEFINITIVE_TRANSCRIPT_ERRORS as e:
+        negative_cache.set(negative_keys[0], e)
+        raise
+
+def _download_transcript_languages(youtube_video_id: str) -> List[Dict[str, str]]:
+    return _list_transcript_languages(_get_transcript_list(youtube_video_id))
+
+def _download_transcript(youtube_video_id: str, language: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    transcript_list = _get_transcript_list(youtube_video_id)
+    transcript = transcript_list.find_transcript([language])
+    segments = [
+        {"text": item["text"], "start": item["start"], "duration": item["duration"]}
+        for item in transcript.fetch()
+    ]
+    return segments, _list_transcript_languages(transcript_list)
+
+async def _request_transcript_service(youtube_video_id: str, path: str, language: Optional[str] = None) -> Dict[str, Any]:
+    response = await http_client().get(f"{TRANSCRIPT_SERVICE_URL.rstrip('/')}/transcripts/{path}")
+    if response.status_code == 404:
+        raise NoTranscriptFound(youtube_video_id, [language] if language else [], [])
+    if response.status_code == 403:
+        raise TranscriptsDisabled(youtube_video_id)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TranscriptServiceUnavailable(youtube_video_id)
+    if response.status_code != 200:
+        raise CouldNotRetrieveTranscript(youtube_video_id)
+    return response.json()
+
+async def fetch_transcript_languages(youtube_video_id: str) -> List[Dict[str, str]]:
+    """
+    Returns the available transcript languages of a video, reading from the transcript cache first.
+    Raises the youtube_transcript_api exceptions if the languages can not be retrieved.
+    """
+    key = f"languages:{youtube_video_id}"
+    return await transcript_flight.do(key, functools.partial(_load_transcript_languages, youtube_video_id, key))
+
+async def _load_transcript_languages(youtube_video_id: str, key: str) -> List[Dict[str, str]]:
+    languages = await run_blocking(transcript_cache.get, key)
+    if languages is None:
+        async def download() -> List[Dict[str, str]]:
+            if TRANSCRIPT_SERVICE_URL:
+                return (await _request_transcript_service(youtube_video_id, youtube_video_id))["languages"]
+            # youtube_transcript_api is blocking, so it runs on the bounded executor
+            return await run_blocking(_download_transcript_languages, youtube_video_id)
+
+        with stage("transcript_list"):
+            languages = await guarded_transcript_call([f"transcript:{youtube_video_id}"], download)
+        await run_blocking(transcript_cache.set, key, languages)
+    return languages
+
+async def fetch_transcript(youtube_video_id: str, language: str) -> CompactTranscript:
+    """
+    Returns the transcript of a video in the given language, reading from the segment store first.
+    Downloaded transcripts are stored and indexed for search.
+    Raises the youtube_transcript_api exceptions if the transcript can not be retrieved.
+    """
+    return await transcript_flight.do(
+        f"transcript:{youtube_video_id}:{language}", functools.partial(_load_transcript, youtube_video_id, language),
+    )
+
+async def _load_transcript(youtube_video_id: str, language: str) -> CompactTranscript:
+    transcript = await run_blocking(segment_store.get, youtube_video_id, language)
+    if transcript is None:
+        async def download() -> List[Dict[str, Any]]:
+            if TRANSCRIPT_SERVICE_URL:
+                data = await _request_transcript_service(youtube_video_id, f"{youtube_video_id}/{language}", language)
+                return data["segments"]
+            segments, languages = await run_blocking(_download_transcript, youtube_video_id, language)
+            await run_blocking(transcript_cache.set, f"languages:{youtube_video_id}", languages)
+            return segments
+
+        with stage("transcript_fetch"):
+            segments = await guarded_transcript_call(
+                [f"transcript:{youtube_video_id}", f"transcript:{youtube_video_id}:{language}"], download,
+            )
+        transcript = await run_blocking(segment_store.put, youtube_video_id, language, segments)
+    return transcript
+
+async def fetch_transcript_segments(youtube_video_id: str, language: str) -> List[Dict[str, Any]]:
+    """
+    Returns the timestamped transcript segments of a video in the given language, see fetch_transcript.
+    """
+    return (await fetch_transcript(youtube_video_id, language)).segments()
+
+async def available_models(pool: OllamaPool, required: Optional[str] = None) -> List[str]:
+    """
+    Returns the models of an Ollama pool from the model list cache.
+    If `required` is missing from the cached list, for example because it was pulled since, the list is refreshed.
+    """
+    with stage("model_list"):
+        models = await model_list_cache.get_or_load(pool.name, pool.list_models)
+        if required and required not in models:
+            models = await model_list_cache.refresh(pool.name, pool.list_models)
+    return models
+
+async def select_model(pool: OllamaPool, models: List[str]) -> str:
+    """
+    Picks the model for a request that leaves the choice open: DEFAULT_MODEL if it is available, otherwise
+    a model that is already loaded in memory, so that the request does not wait for a model load, otherwise
+    the first model. EMBEDDING_MODEL can not generate text and is only picked if there is no other model.
+    """
+    if DEFAULT_MODEL in models:
+        return DEFAULT_MODEL
+    models = [model for model in models if model != EMBEDDING_MODEL] or models
+    try:
+        loaded = await pool.loaded_models()
+    except Exception:
+        loaded = set()
+    return next((model for model in models if model in loaded), models[0])
+
+def concatenate_transcript(segments: List[Dict[str, Any]]) -> str:
+    return " ".join([item['text'] for item in segments])
+
+def transcript_error_message(error: Exception) -> str:
+    """
+    The message returned to the client for an error fetching a transcript.
+    """
+    if isinstance(error, NoTranscriptFound):
+        return "Transcript not found for the specified language."
+    if isinstance(error, TranscriptsDisabled):
+        return "Transcripts are disabled for this video."
+    if isinstance(error, CouldNotRetrieveTranscript):
+        return "Could not retrieve transcripts."
+    return f"Error fetching transcript: {error}"
+
+def check_time_range(start_ms: Optional[int], end_ms: Optional[int]) -> None:
+    if (start_ms is not None and start_ms < 0) or (start_ms is not None and end_ms is not None and end_ms <= start_ms):
+        raise HTTPException(status_code=400, detail="The time range needs 0 <= start_ms < end_ms.")
+
+def summary_cache_key(youtube_video_id: str, language: str, model: str, prompt: str, profile: str = "") -> str:
+    """
+    Content address of a summary: identical video, language, model, resolved prompt and profile share one entry.
+    """
+    digest = hashlib.sha256("\x00".join([youtube_video_id, language, model, prompt, profile]).encode("utf-8")).hexdigest()
+    # Prefixed with the video, so that the summaries of a video can be dropped together
+    return f"{youtube_video_id}:{digest}"
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: request and stage latencies, and the generation timings reported by Ollama.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/cache_stats")
+async def cache_stats():
+    """
+    Returns hit/miss counters and size information of the backend caches.
+    """
+    return {
+        "transcripts": {**await run_blocking(transcript_cache.stats), "coalesced": transcript_flight.coalesced},
+        "segments": await run_blocking(segment_store.stats),
+        "summaries": {**await run_blocking(summary_cache.stats), "coalesced": summary_flight.coalesced, "in_flight": summary_flight.in_flight()},
+        "models": model_list_cache.stats(),
+        "oembed": oembed_cache.stats(),
+        "job_queue": job_queue.stats(),
+        "analysis_sessions": analysis_sessions.stats(),
+        "admission": generation_admission.stats(),
+        "embedding_indexes": await run_blocking(embedding_indexes.stats),
+        "negative": negative_cache.stats(),
+        "circuit_breakers": {"transcripts": transcript_breaker.stats(), "oembed": oembed_breaker.stats()},
+        "prewarm": prewarmer.stats(),
+    }
+
+@app.post("/cache_invalidate")
+async def cache_invalidate(cache: str = "all", video_id: Optional[str] = None):
+    """
+    Drops cached entries. `cache` is one of 'models', 'metadata', 'transcripts', 'summaries' or 'all'.
+    With `video_id` only the entries of that video are dropped.
+    """
+    caches = ["models", "metadata", "transcripts", "summaries"] if cache == "all" else [cache]
+    for name in caches:
+        if name == "models":
+            model_list_cache.invalidate()
+        elif name == "metadata":
+            oembed_cache.invalidate(video_id)
+            negative_cache.invalidate(f"oembed:{video_id}" if video_id else "oembed:")
+        elif name == "transcripts":
+            with _transcript_lists_lock:
+                if video_id:
+                    _transcript_lists.pop(video_id, None)
+                else:
+                    _transcript_lists.clear()
+            if video_id:
+                await run_blocking(transcript_cache.delete, f"languages:{video_id}")
+                await run_blocking(segment_store.delete, video_id)
+                # Indexes built from the dropped transcripts would outlive them otherwise
+                await run_blocking(embedding_indexes.delete_video, video_id)
+            else:
+                await run_blocking(transcript_cache.clear)
+                await run_blocking(segment_store.clear)
+                await run_blocking(embedding_indexes.clear)
+            negative_cache.invalidate(f"transcript:{video_id}" if video_id else "transcript:")
+        elif name == "summaries":
+            if video_id:
+                await run_blocking(summary_cache.delete_prefix, f"{video_id}:")
+            else:
+                await run_blocking(summary_cache.clear)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown cache: {name}")
+    return {"invalidated": caches, "video_id": video_id}
+
+@app.get("/summary_profiles")
+async def summary_profiles():
+    """
+    Lists the summary profiles with their latency targets, models, generation bounds and transcript strategies.
+    """
+    return {"profiles": [profile.stats() for profile in SUMMARY_PROFILES.values()], "default": DEFAULT_SUMMARY_PROFILE}
+
+@app.get("/prewarm")
+async def prewarm_status():
+    """
+    Returns the state of the pre-warming service: pending, warmed and failed videos and how often it yielded to live traffic.
+    """
+    return {"enabled": bool(PREWARM_WATCH_LIST or PREWARM_FEED_URLS), **prewarmer.stats()}
+
+@app.get("/ollama_hosts")
+async def ollama_hosts():
+    """
+    Returns health, available and loaded models and outstanding requests of every configured Ollama host.
+    """
+    return default_pool.stats()
+
 @app.get("/available_models", response_model=List[str])
-def list_available_models(
+async def list_available_models(
     ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
 ):
     """
     Lists available models from Ollama using the ollama library.
+    Uses the Ollama instance named by the X-Ollama-API-URL header, or the union of the models of all
+    OLLAMA_HOSTS if it is not set.
     """
-    if not ollama_api_url:
-        ollama_api_url = "http://localhost:11434"  # Default Ollama URL
-
     try:
-        # Initialize the Ollama client
-        models = [item.get('model') for item in ollama.list().get('models','')]
+        models = await available_models(ollama_pool(ollama_api_url))
         if not models:
             raise HTTPException(status_code=500, detail="No models found in Ollama.")
 
@@ -42,162 +656,1228 @@ def list_available_models(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching available models: {e}")
 
-@app.get("/video_metadata/{youtube_video_id}", response_model=VideoMetadata)
-def get_video_metadata(youtube_video_id: str):
+async def _download_oembed(youtube_video_id: str) -> Optional[Dict[str, Any]]:
+    if negative_cache.get(f"oembed:{youtube_video_id}") is not None:
+        UPSTREAM_FAST_FAILURES.labels(upstream="oembed", reason="negative_cache").inc()
+        return None
+    try:
+        async with oembed_breaker.call():
+            with stage("oembed"):
+                oembed_response = await http_client().get(
+                    YOUTUBE_OEMBED_URL,
+                    params={"url": f"http://www.youtube.com/watch?v={youtube_video_id}", "format": "json"},
+                )
+            # Rate limiting and server errors are upstream failures, other errors mean the video is unknown
+            if oembed_response.status_code == 429 or oembed_response.status_code >= 500:
+                oembed_response.raise_for_status()
+    except CircuitOpen:
+        UPSTREAM_FAST_FAILURES.labels(upstream="oembed", reason="circuit_open").inc()
+        raise
+    if oembed_response.status_code != 200:
+        negative_cache.set(f"oembed:{youtube_video_id}", LookupError(f"oEmbed answered {oembed_response.status_code}"))
+        return None
+    return oembed_response.json()
+
+async def fetch_oembed(youtube_video_id: str) -> Optional[Dict[str, Any]]:
     """
-    Fetches video metadata using YouTube's oEmbed endpoint and retrieves available transcript languages.
+    Fetches video metadata from YouTube's oEmbed endpoint, reading from the oEmbed cache first.
+    Returns None if the video is unknown.
+    Raises httpx.HTTPError on connection problems and ValueError on invalid responses,
+    and CircuitOpen while oEmbed is failing.
     """
-    oembed_url = f"https://www.youtube.com/oembed?url=http://www.youtube.com/watch?v={youtube_video_id}&format=json"
+    return await oembed_cache.get_or_load(youtube_video_id, functools.partial(_download_oembed, youtube_video_id))
 
+async def fetch_transcript_languages_or_empty(youtube_video_id: str) -> List[Dict[str, str]]:
+    # Attempt to fetch available transcript languages
     try:
-        # Fetch video metadata
-        oembed_response = requests.get(oembed_url)
-        if oembed_response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Video not found or unable to fetch metadata.")
-
-        oembed_data = oembed_response.json()
-        title = oembed_data.get("title", "No Title Available")
-        thumbnail_url = oembed_data.get("thumbnail_url", "")
+        return await fetch_transcript_languages(youtube_video_id)
+    except TranscriptsDisabled:
+        return []
+    except NoTranscriptFound:
+        return []
+    except CouldNotRetrieveTranscript:
+        return []
+    except CircuitOpen:
+        return []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching transcripts: {e}")
 
-        # Attempt to fetch available transcript languages
-        try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(youtube_video_id)
-            # Collect all available transcripts (both manually created and generated)
-            available_transcripts = []
-            for transcript in transcript_list:
-                available_transcripts.append({
-                    "code": transcript.language_code,
-                    "name": transcript.language
-                })
-        except TranscriptsDisabled:
-            available_transcripts = []
-        except NoTranscriptFound:
-            available_transcripts = []
-        except CouldNotRetrieveTranscript:
-            available_transcripts = []
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error fetching transcripts: {e}")
+async def load_video_metadata(youtube_video_id: str) -> VideoMetadata:
+    """
+    Fetches oEmbed metadata and the available transcript languages concurrently.
+    Raises HTTPException if the video can not be found or the metadata can not be fetched.
+    """
+    try:
+        oembed_data, available_transcripts = await asyncio.gather(
+            fetch_oembed(youtube_video_id),
+            fetch_transcript_languages_or_empty(youtube_video_id),
+        )
+        if oembed_data is None:
+            raise HTTPException(status_code=404, detail="Video not found or unable to fetch metadata.")
 
         return VideoMetadata(
-            title=title,
-            thumbnail_url=thumbnail_url,
+            title=oembed_data.get("title", "No Title Available"),
+            thumbnail_url=oembed_data.get("thumbnail_url", ""),
             supported_languages=available_transcripts
         )
     except HTTPException as he:
         raise he
-    except requests.exceptions.RequestException as e:
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Error fetching video metadata: {e}")
     except ValueError:
         raise HTTPException(status_code=500, detail="Invalid response from oEmbed endpoint.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
-@app.get("/video_transcripts/{youtube_video_id}", response_model=VideoTranscriptResponse)
-def get_transcript(youtube_video_id: str, language: Optional[str] = "en"):
+@app.get("/video_metadata/{youtube_video_id}", response_model=VideoMetadata)
+async def get_video_metadata(youtube_video_id: str):
     """
-    Fetches and concatenates the transcript of the YouTube video in the specified language.
+    Fetches video metadata using YouTube's oEmbed endpoint and retrieves available transcript languages.
     """
-    # Validate language
+    return await load_video_metadata(youtube_video_id)
+
+# Transcript prefetches started by /video_prepare, referenced until they finish
+_prefetches: Set[asyncio.Task] = set()
+
+async def _prefetch_transcript(youtube_video_id: str, language: str) -> None:
     try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(youtube_video_id)
-        # Attempt to find transcript in the specified language
-        transcript = transcript_list.find_transcript([language])
-    except NoTranscriptFound:
-        return VideoTranscriptResponse(error="Transcript not found for the specified language.")
-    except TranscriptsDisabled:
-        return VideoTranscriptResponse(error="Transcripts are disabled for this video.")
-    except CouldNotRetrieveTranscript:
-        return VideoTranscriptResponse(error="Could not retrieve transcripts.")
-    except Exception as e:
-        return VideoTranscriptResponse(error=f"An error occurred: {e}")
+        await fetch_transcript(youtube_video_id, language)
+    except Exception:
+        # The summary request reports the error if the transcript really can not be fetched
+        pass
+
+@app.get("/video_prepare/{youtube_video_id}", response_model=VideoPrepareResponse)
+async def prepare_video(
+    youtube_video_id: str,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Returns everything the frontend needs before a summary in one round-trip: video metadata,
+    available transcript languages and available models, fetched concurrently.
+    The transcript of the first language is prefetched in the background, so the summary request
+    that usually follows finds it in the transcript cache.
+    """
+    metadata, models = await asyncio.gather(
+        load_video_metadata(youtube_video_id),
+        available_models(ollama_pool(ollama_api_url)),
+        return_exceptions=True,
+    )
+    if isinstance(metadata, BaseException):
+        raise metadata
+
+    response = VideoPrepareResponse(
+        title=metadata.title,
+        upload_date=metadata.upload_date,
+        thumbnail_url=metadata.thumbnail_url,
+        supported_languages=metadata.supported_languages,
+        profiles=[profile.stats() for profile in SUMMARY_PROFILES.values()],
+        default_profile=DEFAULT_SUMMARY_PROFILE,
+    )
+    if isinstance(models, BaseException):
+        response.models_error = f"Error fetching available models: {models}"
+    elif models:
+        response.models = models
+        response.default_model = await select_model(ollama_pool(ollama_api_url), models)
 
+    if metadata.supported_languages:
+        task = asyncio.create_task(_prefetch_transcript(youtube_video_id, metadata.supported_languages[0]["code"]))
+        _prefetches.add(task)
+        task.add_done_callback(_prefetches.discard)
+
+    return response
+
+@app.get("/video_transcripts/{youtube_video_id}", response_model=VideoTranscriptResponse)
+async def get_transcript(
+    request: Request,
+    youtube_video_id: str,
+    language: Optional[str] = "en",
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Fetches and concatenates the transcript of the YouTube video in the specified language, or only the part
+    spoken between 'start_ms' and 'end_ms'.
+    Supports 'fields' selection, compression and conditional requests with If-None-Match.
+    """
+    check_time_range(start_ms, end_ms)
     try:
-        transcript_data = transcript.fetch()
+        transcript = await fetch_transcript(youtube_video_id, language)
     except Exception as e:
-        return VideoTranscriptResponse(error=f"Error fetching transcript: {e}")
+        return VideoTranscriptResponse(error=transcript_error_message(e))
 
-    concatenated_transcript = " ".join([item['text'] for item in transcript_data])
-    return VideoTranscriptResponse(transcript=concatenated_transcript)
+    # The stored text is the concatenated transcript, a time range is a single slice of it
+    concatenated_transcript = transcript.text(*transcript.span(start_ms, end_ms))
+    etag = entity_tag("transcript", youtube_video_id, language, concatenated_transcript, fields)
+    return await json_response(request, VideoTranscriptResponse(transcript=concatenated_transcript), fields, etag)
 
-@app.get("/video_summary/{youtube_video_id}", response_model=VideoSummaryResponse)
-def video_summary(
+@app.get("/video_segments/{youtube_video_id}", response_model=VideoSegmentsResponse)
+async def get_segments(
+    request: Request,
     youtube_video_id: str,
     language: Optional[str] = "en",
-    model: Optional[str] = None,
-    prompt: Optional[str] = None,
-    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    fields: Optional[str] = None,
 ):
     """
-    Generates a summary of the YouTube video transcript using Ollama.
-    Accepts optional 'model' and 'prompt' query parameters.
+    Returns the timestamped transcript segments spoken between 'start_ms' and 'end_ms', by default all of them.
     """
-    if not ollama_api_url:
-        # Default to internal Docker network URL if not provided
-        ollama_api_url = "http://ollama:11434"
-
-    # Validate language by fetching available transcripts
+    check_time_range(start_ms, end_ms)
     try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(youtube_video_id)
-        available_transcripts = transcript_list.find_transcript([language])
-    except NoTranscriptFound:
-        return VideoSummaryResponse(error="Transcript not found for the specified language.")
-    except TranscriptsDisabled:
-        return VideoSummaryResponse(error="Transcripts are disabled for this video.")
-    except CouldNotRetrieveTranscript:
-        return VideoSummaryResponse(error="Could not retrieve transcripts.")
+        transcript = await fetch_transcript(youtube_video_id, language)
     except Exception as e:
-        return VideoSummaryResponse(error=f"Error fetching transcripts: {e}")
+        return VideoSegmentsResponse(error=transcript_error_message(e))
+
+    first, last = transcript.span(start_ms, end_ms)
+    etag = entity_tag("segments", youtube_video_id, language, transcript.text(first, last), str(first), str(last), fields)
+    response = VideoSegmentsResponse(segments=[transcript.segment(position) for position in range(first, last)])
+    return await json_response(request, response, fields, etag)
+
+@app.get("/transcript_search", response_model=TranscriptSearchResponse)
+async def search_transcripts(
+    q: str,
+    language: Optional[str] = None,
+    limit: int = 20,
+    matches_per_video: int = 5,
+):
+    """
+    Searches all stored transcripts for segments containing every word of 'q' ("quoted words" as a phrase),
+    and returns the best matching videos with the times of the matching segments in milliseconds.
+    Only transcripts that were fetched before, and are still cached, are searched.
+    """
+    query = fts_query(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="The search query has no words.")
+    results = await run_blocking(
+        segment_store.search, query, language, None,
+        max(1, min(limit, TRANSCRIPT_SEARCH_MAX_VIDEOS)), max(1, matches_per_video), TRANSCRIPT_SEARCH_MAX_HITS,
+    )
+    return TranscriptSearchResponse(query=q, results=results)
 
+@app.get("/video_transcripts/{youtube_video_id}/search", response_model=TranscriptSearchResponse)
+async def search_video_transcript(
+    youtube_video_id: str,
+    q: str,
+    language: Optional[str] = "en",
+    limit: int = 20,
+):
+    """
+    Searches the transcript of one video, fetching it first if it is not stored yet, and returns up to 'limit'
+    matching segments in transcript order.
+    """
+    query = fts_query(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="The search query has no words.")
     try:
-        # Fetch the transcript
-        transcript_data = available_transcripts.fetch()
-        concatenated_transcript = " ".join([item['text'] for item in transcript_data])
+        await fetch_transcript(youtube_video_id, language)
     except Exception as e:
-        return VideoSummaryResponse(error=f"Error fetching transcript: {e}")
+        return TranscriptSearchResponse(query=q, error=transcript_error_message(e))
+    results = await run_blocking(
+        segment_store.search, query, language, youtube_video_id, 1, max(1, limit), TRANSCRIPT_SEARCH_MAX_HITS,
+    )
+    return TranscriptSearchResponse(query=q, results=results)
 
-    if not concatenated_transcript:
-        return VideoSummaryResponse(error="No transcript available to generate summary.")
+# Called with the current stage of a summary and the fraction of that stage that is done
+ProgressCallback = Callable[[str, float], None]
 
-    # If model is not specified, fetch the first available model
-    if not model:
-        try:
-            models = [item.get('model') for item in ollama.list().get('models','')]
-            if not models:
-                raise HTTPException(status_code=500, detail="No models available in Ollama.")
-            if not model in models:
-                model = models[0]
-        except Exception as e:
-            return VideoSummaryResponse(error=f"Error fetching available models: {e}")
+class SummaryRequestError(Exception):
+    """
+    Raised when a summary request can not be prepared, the message is returned to the client.
+    """
 
-    # If prompt is not provided, use a default prompt
+def build_summary_prompt(prompt: Optional[str], transcript: str, language: str) -> str:
+    """
+    Inserts the transcript and language into the requested prompt, or into the default prompt if none was given.
+    """
+    # If prompt is not provided, use a default prompt; the frontend's DEFAULT_PROMPT is the same text
     if not prompt:
-        prompt = (
-            f"Please provide a summary for the following YouTube video transcript:\n\n{concatenated_transcript}\n\n"
+        return (
+            f"Please provide a summary for the following YouTube video transcript:\n\n{transcript}\n\n"
             "The summary should be structured as follows:\n"
             "1. A concise 4-sentence summary of the video's main points.\n"
             "2. A list of the main insights or takeaways presented in the video.\n"
             "3. An overall sentiment rating of the video's tone towards the main topic, expressed as Positive, Neutral, or Negative.\n"
             f"4. The summary shall be in this language as identified by its short-code: {language}.\n"
+            "5. Output the summary in Markdown syntax.\n"
         )
-    else:
-        prompt = prompt.replace("[[concatenated_transcript]]",concatenated_transcript).replace("[language]",language)
+    return prompt.replace("[[concatenated_transcript]]",transcript).replace("[[language]]",language).replace("[language]",language)
+
+class SummaryInput:
+    """
+    Transcript, model and profile of a summary request. `segments` and `transcript` are compacted and
+    reduced as the profile's transcript strategy requires, `original_transcript` is the transcript as fetched.
+    Summaries always have a profile, only analysis sessions prepare a transcript without one.
+    """
+
+    def __init__(
+        self,
+        segments: List[Dict[str, Any]],
+        transcript: str,
+        original_transcript: str,
+        model: str,
+        profile: Optional[SummaryProfile] = None,
+    ):
+        self.segments = segments
+        self.transcript = transcript
+        self.original_transcript = original_transcript
+        self.model = model
+        self.profile = profile
+        self.transcript_tokens = estimate_tokens(original_transcript, model)
+        self.compacted_tokens = estimate_tokens(transcript, model)
 
-    # Generate the summary using Ollama's library
+def compact_transcript(segments: List[Dict[str, Any]], model: str) -> List[Dict[str, Any]]:
+    with stage("compaction"):
+        if TRANSCRIPT_COMPACTION:
+            segments = compact_segments(segments)
+        if TRANSCRIPT_TOKEN_BUDGET > 0:
+            segments = trim_to_budget(segments, TRANSCRIPT_TOKEN_BUDGET, model)
+    return segments
+
+def resolve_profile(name: Optional[str]) -> SummaryProfile:
+    """
+    Returns the named summary profile, or the default profile if no name is given. Raises 400 for unknown names.
+    """
+    profile = get_profile(name)
+    if profile is None:
+        raise HTTPException(status_code=400, detail=f"Unknown profile: {name or DEFAULT_SUMMARY_PROFILE}. Available: {', '.join(SUMMARY_PROFILES)}.")
+    return profile
+
+def apply_transcript_strategy(segments: List[Dict[str, Any]], profile: SummaryProfile, model: str) -> List[Dict[str, Any]]:
+    """
+    Reduces the compacted transcript to what the profile reads: a sample of its beginning and end, or
+    everything, condensed by map-reduce if it is long (see uses_map_reduce).
+    """
+    if profile.transcript_strategy == SAMPLE:
+        return sample_segments(segments, profile.transcript_budget(NUM_CTX_MAX), model)
+    return segments
+
+def uses_map_reduce(summary_input: SummaryInput) -> bool:
+    """
+    Whether the transcript is condensed chunk by chunk before the final summary: with the chunked strategy
+    above LONG_TRANSCRIPT_THRESHOLD_TOKENS, with the full strategy when it does not fit the profile's prompt.
+    """
+    profile = summary_input.profile
+    if profile.transcript_strategy == CHUNKED:
+        return summary_input.compacted_tokens > LONG_TRANSCRIPT_THRESHOLD_TOKENS
+    if profile.transcript_strategy == FULL:
+        return summary_input.compacted_tokens > profile.transcript_budget(NUM_CTX_MAX)
+    return False
+
+async def prepare_summary_request(
+    pool: OllamaPool,
+    youtube_video_id: str,
+    language: str,
+    model: Optional[str],
+    profile: Optional[SummaryProfile] = None,
+) -> SummaryInput:
+    """
+    Resolves the transcript and the model of a summary request, the transcript compacted and reduced
+    according to the profile. Without a profile (e.g. for analysis sessions) the whole compacted transcript is kept.
+    """
+    # Fetch the transcript, served from the segment store when possible
     try:
-        # Generate the summary
-        summary_response = ollama.generate(
-            model=model,  # Use the selected model
-            prompt=prompt
+        transcript = await fetch_transcript(youtube_video_id, language)
+    except Exception as e:
+        raise SummaryRequestError(transcript_error_message(e))
+
+    transcript_data = transcript.segments()
+    concatenated_transcript = transcript.text()
+
+    if not concatenated_transcript:
+        raise SummaryRequestError("No transcript available to generate summary.")
+
+    # If model is not specified, use the profile's model, or pick the default or an already loaded model
+    if model:
+        try:
+            # Refreshes the cached model list if the model was added to Ollama since
+            await available_models(pool, required=model)
+        except Exception:
+            pass
+    else:
+        try:
+            models = await available_models(pool)
+        except Exception as e:
+            raise SummaryRequestError(f"Error fetching available models: {e}")
+        if not models:
+            raise SummaryRequestError("Error fetching available models: No models available in Ollama.")
+        model = profile.model if profile and profile.model in models else await select_model(pool, models)
+
+    segments = compact_transcript(transcript_data, model)
+    if not segments:
+        raise SummaryRequestError("No spoken content in the transcript to generate a summary from.")
+    if profile is not None:
+        segments = apply_transcript_strategy(segments, profile, model)
+    summary_input = SummaryInput(segments, concatenate_transcript(segments), concatenated_transcript, model, profile)
+    TRANSCRIPT_TOKENS.labels(kind="original").inc(summary_input.transcript_tokens)
+    TRANSCRIPT_TOKENS.labels(kind="compacted").inc(summary_input.compacted_tokens)
+    return summary_input
+
+def generation_options(model: str, prompt: str, profile: Optional[SummaryProfile] = None) -> Dict[str, Any]:
+    """
+    Ollama options of a generation, with a context window that fits the prompt instead of the model default.
+    With a profile, output length and context are bounded by the profile and its stop sequences apply.
+    """
+    if profile is None:
+        return {"num_ctx": context_window(estimate_tokens(prompt, model), SUMMARY_OUTPUT_TOKENS, NUM_CTX_MIN, NUM_CTX_MAX)}
+    maximum = max(NUM_CTX_MIN, min(profile.num_ctx, NUM_CTX_MAX))
+    options: Dict[str, Any] = {
+        "num_ctx": context_window(estimate_tokens(prompt, model), profile.num_predict, NUM_CTX_MIN, maximum),
+        "num_predict": profile.num_predict,
+    }
+    if profile.stop:
+        options["stop"] = profile.stop
+    return options
+
+async def generate_text(pool: OllamaPool, model: str, prompt: str, profile: Optional[SummaryProfile] = None) -> str:
+    with stage("generate"):
+        response = await pool.generate(model, prompt, options=generation_options(model, prompt, profile))
+    observe_generation(model, response)
+    # Adjust the key based on Ollama's actual response structure
+    return response.get('response', '').strip()
+
+async def summary_final_prompt(
+    pool: OllamaPool,
+    summary_input: SummaryInput,
+    prompt: Optional[str],
+    language: str,
+    progress: Optional[ProgressCallback] = None,
+) -> str:
+    """
+    Returns the prompt of the final summary generation.
+    Long transcripts (see uses_map_reduce) are first condensed chunk by chunk, and the combined chunk notes
+    take the place of the transcript in the prompt.
+    Runs in the generation slot of the summary: one chunk at a time is generated in it, up to
+    LONG_TRANSCRIPT_PARALLELISM in total only while spare slots are free, so that chunk generations count
+    towards GENERATION_MAX_IN_FLIGHT. Never waiting for a slot while holding one rules out deadlocks.
+    """
+    model = summary_input.model
+    profile = summary_input.profile
+    prompt = prompt or profile.prompt
+    if not uses_map_reduce(summary_input):
+        return build_summary_prompt(prompt, summary_input.transcript, language)
+
+    own_slot = asyncio.Lock()
+
+    async def generate_chunk(chunk_prompt: str) -> str:
+        if own_slot.locked() and await generation_admission.try_acquire():
+            try:
+                return await generate_text(pool, model, chunk_prompt, profile)
+            finally:
+                generation_admission.release()
+        async with own_slot:
+            return await generate_text(pool, model, chunk_prompt, profile)
+
+    with stage("chunking"):
+        notes = await summarize_chunks(
+            generate_chunk,
+            summary_input.segments,
+            language,
+            chunk_tokens=LONG_TRANSCRIPT_CHUNK_TOKENS,
+            parallelism=LONG_TRANSCRIPT_PARALLELISM,
+            progress=(lambda done, total: progress("chunking", done / total)) if progress else None,
         )
+    return build_summary_prompt(prompt, notes, language)
+
+def enforce_quota(request: Request, cost: float = 1) -> None:
+    """
+    Charges a request against the quota of the client's address, raising 429 if it is used up.
+    """
+    retry_after = client_quota.acquire(request.client.host if request.client else "unknown", cost)
+    if retry_after is not None:
+        ADMISSION_REJECTED.labels(reason="quota").inc()
+        raise HTTPException(status_code=429, detail="Request quota exceeded, please retry later.", headers={"Retry-After": str(retry_after)})
 
-        # Extract the summary from the response
-        # Adjust the key based on Ollama's actual response structure
-        summary = summary_response.get('response', 'No summary available').strip()
+def overloaded_error(e: Overloaded) -> HTTPException:
+    ADMISSION_REJECTED.labels(reason="overloaded").inc()
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
 
+def summary_key(summary_input: SummaryInput, youtube_video_id: str, language: str, prompt: Optional[str]) -> str:
+    """
+    Summary cache key of a prepared request, also the basis of the summary's ETag.
+    """
+    profile = summary_input.profile
+    return summary_cache_key(
+        youtube_video_id,
+        language,
+        summary_input.model,
+        build_summary_prompt(prompt or profile.prompt, summary_input.transcript, language),
+        profile.name,
+    )
+
+def observe_summary_latency(profile: SummaryProfile, seconds: float) -> None:
+    SUMMARY_SECONDS.labels(profile=profile.name).observe(seconds)
+    if seconds > profile.latency_target:
+        SUMMARY_LATENCY_TARGET_MISSED.labels(profile=profile.name).inc()
+
+async def summarize_prepared(
+    pool: OllamaPool,
+    summary_input: SummaryInput,
+    youtube_video_id: str,
+    language: str,
+    prompt: Optional[str],
+    progress: Optional[ProgressCallback] = None,
+    wait_for_slot: bool = False,
+) -> VideoSummaryResponse:
+    """
+    Summarizes a prepared request, see summarize_video.
+    """
+    report = progress or (lambda stage, fraction: None)
+    model = summary_input.model
+    profile = summary_input.profile
+
+    # Generate the summary using Ollama's library, unless an identical request was answered before
+    # or is currently being generated
+    cache_key = summary_key(summary_input, youtube_video_id, language, prompt)
+
+    async def generate_summary() -> str:
+        cached_summary = await run_blocking(summary_cache.get, cache_key)
+        if cached_summary is not None:
+            return cached_summary
+
+        report("queued", 0.0)
+        async with generation_admission.slot(wait=wait_for_slot):
+            started = time.monotonic()
+            final_prompt = await summary_final_prompt(pool, summary_input, prompt, language, report)
+            report("generating", 0.0)
+            generated_summary = await generate_text(pool, model, final_prompt, profile) or 'No summary available'
+            observe_summary_latency(profile, time.monotonic() - started)
+        await run_blocking(summary_cache.set, cache_key, generated_summary)
+        return generated_summary
+
+    try:
+        # A streamed generation of the same summary is only cancelled once no request waits for it
+        token_stream = summary_streams.get(cache_key)
+        with token_stream.follower() if token_stream else nullcontext():
+            while True:
+                try:
+                    summary = await summary_flight.do(cache_key, generate_summary)
+                    break
+                except Overloaded:
+                    # The flight was started by an interactive request that got no slot; a job or batch
+                    # that joined it starts a flight of its own, which waits for a slot
+                    if not wait_for_slot:
+                        raise
+    except Overloaded:
+        raise
     except Exception as e:
         return VideoSummaryResponse(error=f"Error generating summary with Ollama: {e}")
 
-    return VideoSummaryResponse(summary=summary, transcript=concatenated_transcript)
+    report("done", 1.0)
+    return VideoSummaryResponse(
+        summary=summary,
+        transcript=summary_input.original_transcript,
+        transcript_tokens=summary_input.transcript_tokens,
+        compacted_tokens=summary_input.compacted_tokens,
+        profile=profile.name,
+    )
+
+async def summarize_video(
+    pool: OllamaPool,
+    youtube_video_id: str,
+    language: str,
+    model: Optional[str],
+    prompt: Optional[str],
+    progress: Optional[ProgressCallback] = None,
+    wait_for_slot: bool = False,
+    profile: Optional[str] = None,
+) -> VideoSummaryResponse:
+    """
+    Summarizes a video on the given Ollama pool, shared by the summary endpoint, the job queue and batches.
+    `progress` is called with the current stage and the fraction of the stage that is done.
+    Raises Overloaded if the summary has to be generated and no generation slot is available,
+    unless `wait_for_slot` is set.
+    """
+    if progress:
+        progress("transcript", 0.0)
+    summary_profile = get_profile(profile)
+    if summary_profile is None:
+        return VideoSummaryResponse(error=f"Unknown profile: {profile}. Available: {', '.join(SUMMARY_PROFILES)}.")
+    try:
+        summary_input = await prepare_summary_request(pool, youtube_video_id, language, model, summary_profile)
+    except SummaryRequestError as e:
+        return VideoSummaryResponse(error=str(e))
+    return await summarize_prepared(pool, summary_input, youtube_video_id, language, prompt, progress, wait_for_slot)
+
+@app.get("/video_summary/{youtube_video_id}", response_model=VideoSummaryResponse)
+async def video_summary(
+    request: Request,
+    youtube_video_id: str,
+    language: Optional[str] = "en",
+    model: Optional[str] = None,
+    prompt: Optional[str] = None,
+    profile: Optional[str] = None,
+    fields: Optional[str] = None,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Generates a summary of the YouTube video transcript using Ollama.
+    Accepts optional 'model', 'prompt' and 'profile' ('quick', 'standard' or 'deep') query parameters,
+    and 'fields' to return only some fields, e.g. 'summary'.
+    Answers 304 if the client already has the summary (If-None-Match), without generating it again.
+    Answers 429 with a Retry-After header if too many summaries are being generated.
+    """
+    summary_profile = resolve_profile(profile)
+    enforce_quota(request)
+    pool = ollama_pool(ollama_api_url)
+    try:
+        summary_input = await prepare_summary_request(pool, youtube_video_id, language, model, summary_profile)
+    except SummaryRequestError as e:
+        return await json_response(request, VideoSummaryResponse(error=str(e)), fields)
+    # The ETag is the content address of the summary, so a client holding it is answered without generating
+    etag = entity_tag("summary", summary_key(summary_input, youtube_video_id, language, prompt), fields)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+    try:
+        response = await summarize_prepared(pool, summary_input, youtube_video_id, language, prompt)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    return await json_response(request, response, fields, etag if response.error is None else None)
+
+async def run_job(job: Job) -> Any:
+    if job.kind == "summary":
+        params = dict(job.params)
+        pool = ollama_pool(params.pop("ollama_api_url"))
+        result = await summarize_video(pool, progress=job.set_progress, wait_for_slot=True, **params)
+        if result.error:
+            raise RuntimeError(result.error)
+        return result
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+# Jobs are queued per Ollama pool, and a pool runs JOB_CONCURRENCY_PER_HOST jobs for each of its hosts
+job_queue = JobQueue(
+    run_job,
+    concurrency_for=lambda pool_name: JOB_CONCURRENCY_PER_HOST * len(pool_name.split(",")),
+    retention=JOB_RETENTION,
+    idle_timeout=JOB_IDLE_TIMEOUT,
+)
+
+def job_status(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        queue_position=job_queue.position(job),
+        result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+@app.post("/jobs/summary", response_model=JobStatusResponse, status_code=202)
+async def submit_summary_job(
+    request: SummaryJobRequest,
+    http_request: Request,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Queues a video summary as a background job and returns its job ID immediately.
+    Poll /jobs/{job_id} for status, progress and the result.
+    """
+    resolve_profile(request.profile)
+    enforce_quota(http_request)
+    job = job_queue.submit(
+        "summary",
+        {
+            "youtube_video_id": request.video_id,
+            "language": request.language,
+            "model": request.model,
+            "prompt": request.prompt,
+            "profile": request.profile,
+            "ollama_api_url": ollama_api_url,
+        },
+        host=ollama_pool(ollama_api_url).name,
+        priority=request.priority,
+    )
+    return job_status(job)
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Returns status, progress and, once finished, the result of a background job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job_status(job)
+
+def extract_video_id(value: str) -> Optional[str]:
+    """
+    Extracts the YouTube video ID from a URL or returns the input if it's already an ID.
+    """
+    value = value.strip()
+    if re.match(r'^[0-9A-Za-z_-]{11}$', value):
+        return value
+    match = re.search(r'(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})', value)
+    return match.group(1) if match else None
+
+async def fetch_playlist_video_ids(playlist: str) -> List[str]:
+    """
+    Resolves a playlist ID or URL into the video IDs listed on its YouTube page, in playlist order.
+    Only the videos YouTube renders on the initial page (about 100) are returned.
+    """
+    match = re.search(r'list=([0-9A-Za-z_-]+)', playlist)
+    playlist_id = match.group(1) if match else playlist.strip()
+    response = await http_client().get("https://www.youtube.com/playlist", params={"list": playlist_id})
+    response.raise_for_status()
+    return list(dict.fromkeys(re.findall(r'"videoId":"([0-9A-Za-z_-]{11})"', response.text)))
+
+async def summarize_batch_item(
+    pool: OllamaPool,
+    youtube_video_id: str,
+    request: BatchSummaryRequest,
+    fetch_slots: asyncio.Semaphore,
+    generation_slots: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"video_id": youtube_video_id, "title": None, "summary": None, "error": None}
+    try:
+        # Transcript and metadata are fetched ahead of generation, so the transcript cache is warm
+        # by the time a generation slot frees up
+        async with fetch_slots:
+            oembed_data, _ = await asyncio.gather(
+                fetch_oembed(youtube_video_id),
+                fetch_transcript(youtube_video_id, request.language),
+                return_exceptions=True,
+            )
+        if isinstance(oembed_data, dict):
+            item["title"] = oembed_data.get("title")
+        async with generation_slots:
+            result = await summarize_video(
+                pool, youtube_video_id, request.language, request.model, request.prompt,
+                wait_for_slot=True, profile=request.profile,
+            )
+        item["summary"] = result.summary
+        item["error"] = result.error
+    except Exception as e:
+        item["error"] = f"An unexpected error occurred: {e}"
+    return item
+
+@app.post("/batch_summary")
+async def batch_summary(
+    request: BatchSummaryRequest,
+    http_request: Request,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Summarizes many videos, given as IDs or URLs, as a text file of IDs or as a playlist.
+    Streams one JSON line per video as soon as its summary is finished (in completion order),
+    followed by a final line with the batch totals. Failing videos are reported in their line
+    and do not affect the rest of the batch.
+    """
+    resolve_profile(request.profile)
+    candidates = list(request.video_ids)
+    if request.video_ids_text:
+        candidates += [line for line in request.video_ids_text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if request.playlist:
+        try:
+            candidates += await fetch_playlist_video_ids(request.playlist)
+        except (httpx.HTTPError, ValueError) as e:
+            raise HTTPException(status_code=502, detail=f"Error fetching playlist: {e}")
+
+    video_ids = list(dict.fromkeys(filter(None, (extract_video_id(candidate) for candidate in candidates))))
+    if not video_ids:
+        raise HTTPException(status_code=400, detail="No valid video IDs given.")
+    if len(video_ids) > BATCH_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"Too many videos, at most {BATCH_MAX_VIDEOS} per batch.")
+    enforce_quota(http_request, cost=len(video_ids))
+
+    pool = ollama_pool(ollama_api_url)
+    fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+    generation_slots = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+    async def lines():
+        started = time.monotonic()
+        failed = 0
+        tasks = [
+            asyncio.create_task(summarize_batch_item(pool, video_id, request, fetch_slots, generation_slots))
+            for video_id in video_ids
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                item = await finished
+                failed += item["error"] is not None
+                yield json.dumps(item) + "\n"
+        finally:
+            # Stop the remaining work if the client disconnects
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({"batch": {
+            "total": len(video_ids),
+            "succeeded": len(video_ids) - failed,
+            "failed": failed,
+            "duration": round(time.monotonic() - started, 3),
+        }}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Formats a single Server-Sent Event with a JSON encoded payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_summary(
+    pool: OllamaPool,
+    summary_input: SummaryInput,
+    cache_key: str,
+    prompt: Optional[str],
+    language: str,
+    token_stream: TokenStream,
+) -> str:
+    """
+    Generates a summary into `token_stream` and stores it in the summary cache. Runs as the summary's single
+    flight, in the generation slot taken by the request that started it (see start_summary_stream).
+    """
+    model = summary_input.model
+    profile = summary_input.profile
+    started = time.monotonic()
+    final_prompt = await summary_final_prompt(pool, summary_input, prompt, language)
+    with stage("generate"):
+        options = generation_options(model, final_prompt, profile)
+        async for chunk in pool.stream_generate(model, final_prompt, options=options):
+            token = chunk.get('response', '')
+            if token:
+                token_stream.append(token)
+            if chunk.get('done'):
+                observe_generation(model, chunk)
+
+    observe_summary_latency(profile, time.monotonic() - started)
+    summary = "".join(token_stream.tokens).strip() or 'No summary available'
+    await run_blocking(summary_cache.set, cache_key, summary)
+    return summary
+
+def start_summary_stream(
+    pool: OllamaPool,
+    summary_input: SummaryInput,
+    cache_key: str,
+    prompt: Optional[str],
+    language: str,
+) -> asyncio.Task:
+    """
+    Starts the streamed generation of a summary as its single flight, in the generation slot the caller took.
+    The slot is released and the stream closed when the flight ends, even if it is cancelled before it runs.
+    """
+    token_stream = summary_streams[cache_key] = TokenStream()
+    task = summary_flight.start(
+        cache_key, functools.partial(stream_summary, pool, summary_input, cache_key, prompt, language, token_stream),
+    )
+    started = time.monotonic()
+
+    def finished(_task: asyncio.Task) -> None:
+        generation_admission.release(time.monotonic() - started)
+        if summary_streams.get(cache_key) is token_stream:
+            del summary_streams[cache_key]
+        token_stream.close()
+
+    task.add_done_callback(finished)
+    token_stream.on_abandoned = task.cancel
+    return task
+
+@app.get("/video_summary_stream/{youtube_video_id}")
+async def video_summary_stream(
+    request: Request,
+    youtube_video_id: str,
+    language: Optional[str] = "en",
+    model: Optional[str] = None,
+    prompt: Optional[str] = None,
+    profile: Optional[str] = None,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Streams the summary of the YouTube video transcript as Server-Sent Events while Ollama generates it.
+    Emits 'token' events with the newly generated text, followed by a single 'done' event with the
+    complete summary, or an 'error' event if the summary can not be generated.
+    Answers 429 with a Retry-After header, before the stream starts, if too many summaries are being generated.
+    """
+    summary_profile = resolve_profile(profile)
+    enforce_quota(request)
+    pool = ollama_pool(ollama_api_url)
+
+    try:
+        summary_input = await prepare_summary_request(pool, youtube_video_id, language, model, summary_profile)
+    except SummaryRequestError as e:
+        error = str(e)
+
+        async def error_event():
+            yield sse_event("error", {"error": error})
+        return sse_response(error_event())
+    resolved_model = summary_input.model
+    tokens = {
+        "transcript_tokens": summary_input.transcript_tokens,
+        "compacted_tokens": summary_input.compacted_tokens,
+        "profile": summary_profile.name,
+    }
+
+    cache_key = summary_key(summary_input, youtube_video_id, language, prompt)
+
+    def cached_response(cached_summary: str):
+        async def cached_events():
+            yield sse_event("token", {"token": cached_summary})
+            yield sse_event("done", {"summary": cached_summary, "model": resolved_model, "cached": True, **tokens})
+        return sse_response(cached_events())
+
+    cached_summary = await run_blocking(summary_cache.get, cache_key)
+    if cached_summary is not None:
+        return cached_response(cached_summary)
+
+    # Identical requests arriving while the summary is generated follow that generation, streamed ones
+    # from its first token on
+    task = summary_flight.join(cache_key)
+    if task is None:
+        # The slot is taken before the response starts, so that an overloaded backend can still answer 429
+        try:
+            await generation_admission.acquire()
+        except Overloaded as e:
+            raise overloaded_error(e)
+        # An identical request may have started or even finished the summary while this one waited for the slot;
+        # nothing is awaited between looking for its flight and starting one
+        cached_summary = await run_blocking(summary_cache.get, cache_key)
+        task = summary_flight.join(cache_key)
+        if task is not None or cached_summary is not None:
+            generation_admission.release()
+            if cached_summary is not None:
+                return cached_response(cached_summary)
+        else:
+            task = start_summary_stream(pool, summary_input, cache_key, prompt, language)
+    token_stream = summary_streams.get(cache_key)
+
+    async def events():
+        with token_stream.follower() if token_stream else nullcontext():
+            if uses_map_reduce(summary_input):
+                # Long transcripts are condensed chunk by chunk before the final summary is streamed
+                yield sse_event("progress", {"stage": "chunking"})
+            if token_stream:
+                async for token in token_stream.follow():
+                    yield sse_event("token", {"token": token})
+            try:
+                summary = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                # Joined just after every other request for the summary went away
+                yield sse_event("error", {"error": "The summary was cancelled, please retry."})
+                return
+            except Exception as e:
+                yield sse_event("error", {"error": f"Error generating summary with Ollama: {e}"})
+                return
+            if token_stream is None:
+                # Followed a generation that was not streamed
+                yield sse_event("token", {"token": summary})
+            yield sse_event("done", {"summary": summary, "model": resolved_model, "cached": False, **tokens})
+
+    return sse_response(events())
+
+# Questions that can be asked by name instead of spelling them out
+ANALYSIS_PRESETS = {
+    "summary": "Summarize the video in 4 sentences.",
+    "takeaways": "List the main insights or takeaways presented in the video.",
+    "sentiment": "Rate the overall sentiment of the video's tone towards its main topic as Positive, Neutral or Negative, and explain why in one sentence.",
+}
+
+analysis_sessions = SessionStore(ttl=ANALYSIS_SESSION_TTL, max_sessions=ANALYSIS_MAX_SESSIONS)
+
+def analysis_system_prompt(transcript: str, language: str) -> str:
+    return (
+        f"You answer questions about a YouTube video. This is its transcript:\n\n{transcript}\n\n"
+        "Base your answers on the transcript only. "
+        f"Answer in this language as identified by its short-code: {language}."
+    )
+
+def analysis_session_response(session: AnalysisSession, summary_input: Optional[SummaryInput] = None) -> AnalysisSessionResponse:
+    return AnalysisSessionResponse(
+        session_id=session.id,
+        video_id=session.video_id,
+        language=session.language,
+        model=session.model,
+        num_ctx=session.num_ctx,
+        transcript_tokens=summary_input.transcript_tokens if summary_input else None,
+        compacted_tokens=summary_input.compacted_tokens if summary_input else None,
+        history=session.history(),
+    )
+
+def duration_ms(response: Any, field: str) -> Optional[float]:
+    value = response.get(field)
+    return round(value / 1e6, 1) if value is not None else None
+
+@app.post("/analysis_sessions", response_model=AnalysisSessionResponse)
+async def create_analysis_session(
+    request: AnalysisSessionRequest,
+    http_request: Request,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Loads the transcript of a video into a conversation for several questions about it.
+    The transcript is evaluated once, when the session is created, and later questions to
+    /analysis_sessions/{session_id}/questions reuse the evaluated prefix from Ollama's cache.
+    """
+    enforce_quota(http_request)
+    pool = ollama_pool(ollama_api_url)
+    try:
+        summary_input = await prepare_summary_request(pool, request.video_id, request.language, request.model)
+    except SummaryRequestError as e:
+        return AnalysisSessionResponse(error=str(e))
+
+    # The transcript, the history and the answer must fit into one context window of fixed size
+    model = summary_input.model
+    transcript = summary_input.transcript
+    budget = NUM_CTX_MAX - ANALYSIS_HISTORY_TOKENS - SUMMARY_OUTPUT_TOKENS
+    if summary_input.compacted_tokens > budget:
+        transcript = concatenate_transcript(trim_to_budget(summary_input.segments, budget, model))
+    system_prompt = analysis_system_prompt(transcript, request.language)
+    num_ctx = context_window(
+        estimate_tokens(system_prompt, model) + ANALYSIS_HISTORY_TOKENS, SUMMARY_OUTPUT_TOKENS, NUM_CTX_MIN, NUM_CTX_MAX,
+    )
+    session = AnalysisSession(request.video_id, request.language, model, system_prompt, num_ctx, ollama_api_url)
+
+    # Evaluate the transcript right away, so that the first question already finds it in the cache
+    try:
+        async with generation_admission.slot():
+            with stage("generate"):
+                response, session.host = await pool.chat(
+                    model, session.messages, options={"num_ctx": num_ctx, "num_predict": 1},
+                )
+        observe_generation(model, response)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        return AnalysisSessionResponse(error=f"Error loading the transcript into Ollama: {e}")
+
+    analysis_sessions.add(session)
+    return analysis_session_response(session, summary_input)
+
+def get_analysis_session(session_id: str) -> AnalysisSession:
+    session = analysis_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Analysis session not found or expired.")
+    return session
+
+@app.get("/analysis_sessions/{session_id}", response_model=AnalysisSessionResponse)
+async def get_analysis_session_status(session_id: str):
+    """
+    Returns the video, model and the questions and answers of an analysis session.
+    """
+    return analysis_session_response(get_analysis_session(session_id))
+
+@app.post("/analysis_sessions/{session_id}/questions", response_model=AnalysisAnswerResponse)
+async def ask_analysis_question(session_id: str, request: AnalysisQuestionRequest, http_request: Request):
+    """
+    Answers a question about the video of an analysis session, e.g. a follow-up to an earlier answer.
+    Instead of a question, a preset ('summary', 'takeaways' or 'sentiment') can be given.
+    Questions are sent to the Ollama host that answered the previous one, so only the new question
+    is evaluated; the response reports the evaluated tokens and timings.
+    """
+    enforce_quota(http_request)
+    session = get_analysis_session(session_id)
+    question = request.question or ANALYSIS_PRESETS.get(request.preset or "")
+    if not question:
+        raise HTTPException(status_code=400, detail=f"Give a question or one of the presets: {', '.join(ANALYSIS_PRESETS)}.")
+
+    pool = ollama_pool(session.ollama_api_url)
+    async with session.lock:
+        messages = session.messages + [{"role": "user", "content": question}]
+        # Old turns are forgotten once the conversation would no longer fit, the transcript is always kept
+        while estimate_tokens("".join(message["content"] for message in messages), session.model) + SUMMARY_OUTPUT_TOKENS > session.num_ctx:
+            if not session.drop_oldest_turn():
+                break
+            messages = session.messages + [{"role": "user", "content": question}]
+        try:
+            async with generation_admission.slot():
+                with stage("generate"):
+                    response, session.host = await pool.chat(
+                        session.model, messages, prefer=session.host, options={"num_ctx": session.num_ctx},
+                    )
+        except Overloaded as e:
+            raise overloaded_error(e)
+        except Exception as e:
+            return AnalysisAnswerResponse(question=question, error=f"Error answering the question with Ollama: {e}")
+        observe_generation(session.model, response)
+        answer = (response.get('message') or {}).get('content', '').strip()
+        session.messages = messages + [{"role": "assistant", "content": answer}]
+
+    return AnalysisAnswerResponse(
+        question=question,
+        answer=answer,
+        prompt_eval_count=response.get('prompt_eval_count'),
+        prompt_eval_ms=duration_ms(response, 'prompt_eval_duration'),
+        eval_count=response.get('eval_count'),
+        eval_ms=duration_ms(response, 'eval_duration'),
+    )
+
+@app.delete("/analysis_sessions/{session_id}")
+async def delete_analysis_session(session_id: str):
+    """
+    Ends an analysis session before it expires.
+    """
+    if not analysis_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Analysis session not found or expired.")
+    return {"session_id": session_id, "deleted": True}
+
+async def embedding_index(pool: OllamaPool, youtube_video_id: str, language: str) -> Tuple[EmbeddingIndex, bool]:
+    """
+    Returns the embedding index of a video transcript and whether it was found on disk,
+    building and storing it first if needed.
+    Raises SummaryRequestError if the transcript can not be retrieved.
+    """
+    key = index_key(youtube_video_id, language, EMBEDDING_MODEL, RETRIEVAL_CHUNK_TOKENS, TRANSCRIPT_COMPACTION)
+    index = await run_blocking(embedding_indexes.get, key)
+    if index is not None:
+        return index, True
+
+    async def build() -> EmbeddingIndex:
+        try:
+            segments = await fetch_transcript_segments(youtube_video_id, language)
+        except Exception as e:
+            raise SummaryRequestError(transcript_error_message(e))
+        if TRANSCRIPT_COMPACTION:
+            with stage("compaction"):
+                segments = compact_segments(segments)
+        with stage("chunking"):
+            chunks = retrieval_chunks(segments, RETRIEVAL_CHUNK_TOKENS)
+        if not chunks:
+            raise SummaryRequestError("No transcript available to answer questions.")
+
+        embeddings: List[List[float]] = []
+        with stage("embedding"):
+            for offset in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
+                batch = chunks[offset:offset + EMBEDDING_BATCH_SIZE]
+                embeddings.extend(await pool.embed(EMBEDDING_MODEL, [chunk["text"] for chunk in batch]))
+        if len(embeddings) != len(chunks):
+            raise RuntimeError(f"Ollama returned {len(embeddings)} embeddings for {len(chunks)} passages.")
+        return await run_blocking(embedding_indexes.save, key, chunks, embeddings)
+
+    return await embedding_flight.do(key, build), False
+
+def question_prompt(question: str, passages: List[Dict[str, Any]], language: str) -> str:
+    excerpts = "\n\n".join(format_passage(passage) for passage in passages)
+    return (
+        "Answer the question about a YouTube video using only these excerpts from its transcript, "
+        "each marked with its time range:\n\n"
+        f"{excerpts}\n\n"
+        f"Question: {question}\n\n"
+        "Mention the time ranges your answer is based on. If the excerpts do not answer the question, say so. "
+        f"Answer in this language as identified by its short-code: {language}."
+    )
+
+@app.post("/video_questions/{youtube_video_id}", response_model=VideoAnswerResponse)
+async def answer_video_question(
+    youtube_video_id: str,
+    request: VideoQuestionRequest,
+    http_request: Request,
+    ollama_api_url: Optional[str] = Header(None, alias="X-Ollama-API-URL")
+):
+    """
+    Answers a question about a video from the transcript passages most relevant to it, with their timestamps.
+    Only those passages are sent to the model, so prompts stay small however long the video is.
+    The first question about a video builds its embedding index, later ones reuse it.
+    """
+    enforce_quota(http_request)
+    question = request.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="The question must not be empty.")
+    top_k = max(1, min(request.top_k or RETRIEVAL_TOP_K, RETRIEVAL_MAX_TOP_K))
+    pool = ollama_pool(ollama_api_url)
+
+    try:
+        async with generation_admission.slot():
+            try:
+                index, cached = await embedding_index(pool, youtube_video_id, request.language)
+            except SummaryRequestError as e:
+                return VideoAnswerResponse(question=question, error=str(e))
+            except Exception as e:
+                return VideoAnswerResponse(question=question, error=f"Error building the embedding index with Ollama: {e}")
+
+            try:
+                with stage("retrieval"):
+                    query = (await pool.embed(EMBEDDING_MODEL, [question]))[0]
+                    matches = index.search(query, top_k)
+                model = request.model or await select_model(pool, await available_models(pool))
+                prompt = question_prompt(question, [passage for _, passage in matches], request.language)
+                answer = await generate_text(pool, model, prompt)
+            except Exception as e:
+                return VideoAnswerResponse(question=question, error=f"Error answering the question with Ollama: {e}")
+    except Overloaded as e:
+        raise overloaded_error(e)
+
+    return VideoAnswerResponse(
+        question=question,
+        answer=answer,
+        model=model,
+        sources=[
+            AnswerSource(
+                start=passage["start"],
+                end=passage["end"],
+                timestamp=format_timestamp(passage["start"]),
+                text=passage["text"],
+                score=round(score, 4),
+            )
+            for score, passage in matches
+        ],
+        passages=len(index.chunks),
+        index_cached=cached,
+        prompt_tokens=estimate_tokens(prompt, model),
+    )
+
+async def prewarm_video_ids() -> List[str]:
+    """
+    Returns the watched videos, newest feed entries first, followed by the watch list.
+    """
+    candidates: List[str] = []
+    for url in PREWARM_FEED_URLS:
+        try:
+            response = await http_client().get(url)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            prewarmer.last_error = f"Error reading feed {url}: {e}"
+            continue
+        # YouTube channel feeds are Atom documents with one yt:videoId per entry, newest first
+        candidates += re.findall(r'<yt:videoId>([0-9A-Za-z_-]{11})</yt:videoId>', response.text)
+    if PREWARM_WATCH_LIST:
+        if os.path.isfile(PREWARM_WATCH_LIST):
+            with open(PREWARM_WATCH_LIST, encoding="utf-8") as f:
+                candidates += [line for line in f.read().splitlines() if line.strip() and not line.lstrip().startswith("#")]
+        else:
+            candidates += PREWARM_WATCH_LIST.split(",")
+    return [video_id for video_id in (extract_video_id(candidate) for candidate in candidates) if video_id]
+
+async def prewarm_video(youtube_video_id: str) -> None:
+    """
+    Loads metadata, transcript and summary of a video into the caches the endpoints read from, in the first
+    transcript language, with the default profile and the model a request without one would get.
+    """
+    metadata = await load_video_metadata(youtube_video_id)
+    if not metadata.supported_languages:
+        raise RuntimeError("No transcript available.")
+    language = metadata.supported_languages[0]["code"]
+    result = await summarize_video(default_pool, youtube_video_id, language, None, PREWARM_PROMPT, wait_for_slot=True)
+    if result.error:
+        raise RuntimeError(result.error)
+
+def generation_busy() -> bool:
+    """
+    Whether any generation is running or waiting, on behalf of requests, jobs or batches.
+    """
+    stats = generation_admission.stats()
+    return stats["in_flight"] > 0 or stats["waiting"] > 0 or any(host.outstanding for host in default_pool.hosts)
+
+prewarmer = Prewarmer(
+    prewarm_video_ids,
+    prewarm_video,
+    generation_busy,
+    interval=PREWARM_INTERVAL,
+    idle_seconds=PREWARM_IDLE_SECONDS,
+    max_videos=PREWARM_MAX_VIDEOS,
+)
 
 # Enable CORS to allow frontend to communicate with backend
 from fastapi.middleware.cors import CORSMiddleware
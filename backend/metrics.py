@@ -0,0 +1,120 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+
+# Adds a Server-Timing header with the per-stage durations to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REQUEST_SECONDS = Histogram(
+    "yt_tldr_request_seconds", "Duration of HTTP requests until the response headers are sent.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "yt_tldr_stage_seconds", "Duration of the individual stages of a request.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+OLLAMA_LOAD_SECONDS = Histogram(
+    "yt_tldr_ollama_load_seconds", "Model load time reported by Ollama.", ["model"], buckets=LATENCY_BUCKETS,
+)
+OLLAMA_PROMPT_EVAL_SECONDS = Histogram(
+    "yt_tldr_ollama_prompt_eval_seconds", "Prompt evaluation time reported by Ollama.", ["model"], buckets=LATENCY_BUCKETS,
+)
+OLLAMA_EVAL_SECONDS = Histogram(
+    "yt_tldr_ollama_eval_seconds", "Generation time reported by Ollama.", ["model"], buckets=LATENCY_BUCKETS,
+)
+OLLAMA_PROMPT_TOKENS = Counter("yt_tldr_ollama_prompt_tokens", "Prompt tokens evaluated by Ollama.", ["model"])
+OLLAMA_EVAL_TOKENS = Counter("yt_tldr_ollama_eval_tokens", "Tokens generated by Ollama.", ["model"])
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "yt_tldr_ollama_tokens_per_second", "Generation speed reported by Ollama.", ["model"],
+    buckets=(1, 2, 5, 10, 20, 30, 40, 60, 80, 100, 150, 200, 400),
+)
+OLLAMA_PROMPT_TOKENS_PER_SECOND = Histogram(
+    "yt_tldr_ollama_prompt_tokens_per_second", "Prompt evaluation speed reported by Ollama.", ["model"],
+    buckets=(10, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+TRANSCRIPT_TOKENS = Counter(
+    "yt_tldr_transcript_tokens", "Estimated transcript tokens of summary requests, before and after compaction.", ["kind"],
+)
+ADMISSION_REJECTED = Counter(
+    "yt_tldr_admission_rejected", "Requests answered with 429, because of overload or an exhausted client quota.", ["reason"],
+)
+SUMMARY_SECONDS = Histogram(
+    "yt_tldr_summary_seconds", "Duration of summary generations, from the first prompt to the finished summary.",
+    ["profile"], buckets=LATENCY_BUCKETS,
+)
+SUMMARY_LATENCY_TARGET_MISSED = Counter(
+    "yt_tldr_summary_latency_target_missed", "Summary generations that took longer than the latency target of their profile.",
+    ["profile"],
+)
+UPSTREAM_FAST_FAILURES = Counter(
+    "yt_tldr_upstream_fast_failures", "Upstream lookups failed without a call, from the negative cache or an open circuit.",
+    ["upstream", "reason"],
+)
+
+# Stage durations of the current request in seconds, summed per stage, reported in the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Measures the enclosed block as a request stage, in the stage histogram and the Server-Timing header.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        record_timing(name, elapsed)
+
+
+def observe_generation(model: str, response: Any) -> None:
+    """
+    Records the timing fields Ollama returns with a finished generation (durations are in nanoseconds).
+    """
+    def field(name: str) -> int:
+        value = response.get(name) if hasattr(response, "get") else None
+        return value or 0
+
+    load = field("load_duration") / 1e9
+    prompt_eval = field("prompt_eval_duration") / 1e9
+    evaluation = field("eval_duration") / 1e9
+    prompt_tokens = field("prompt_eval_count")
+    eval_tokens = field("eval_count")
+
+    OLLAMA_LOAD_SECONDS.labels(model=model).observe(load)
+    OLLAMA_PROMPT_EVAL_SECONDS.labels(model=model).observe(prompt_eval)
+    OLLAMA_EVAL_SECONDS.labels(model=model).observe(evaluation)
+    OLLAMA_PROMPT_TOKENS.labels(model=model).inc(prompt_tokens)
+    OLLAMA_EVAL_TOKENS.labels(model=model).inc(eval_tokens)
+    if evaluation > 0:
+        OLLAMA_TOKENS_PER_SECOND.labels(model=model).observe(eval_tokens / evaluation)
+    if prompt_eval > 0:
+        OLLAMA_PROMPT_TOKENS_PER_SECOND.labels(model=model).observe(prompt_tokens / prompt_eval)
+
+    record_timing("ollama_load", load)
+    record_timing("ollama_prompt_eval", prompt_eval)
+    record_timing("ollama_eval", evaluation)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
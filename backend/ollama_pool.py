@@ -0,0 +1,368 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar, Union
+
+import ollama
+
+from clients import DEFAULT_OLLAMA_API_URL, OLLAMA_TIMEOUT, close_ollama_client, forget_ollama_client, ollama_client, ollama_host
+
+# Comma separated list of Ollama instances to balance between, defaults to OLLAMA_API_URL only
+OLLAMA_HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()] or [DEFAULT_OLLAMA_API_URL]
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))  # Seconds between health checks
+LOADED_MODELS_MAX_AGE = float(os.getenv("LOADED_MODELS_MAX_AGE", "5"))  # Seconds a list of loaded models is trusted
+# X-Ollama-API-URL hosts outside OLLAMA_HOSTS that keep a client, the least recently used one is closed beyond that
+OLLAMA_MAX_DIRECT_HOSTS = int(os.getenv("OLLAMA_MAX_DIRECT_HOSTS", "16"))
+
+T = TypeVar("T")
+
+
+def normalize_model(name: str) -> str:
+    """
+    Adds the implicit ':latest' tag, as Ollama reports model names with their tag.
+    """
+    name = name.strip()
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_keep_alive(value: str) -> Optional[Union[float, str]]:
+    """
+    Ollama accepts durations ("30m") or seconds; plain numbers like "-1" (never unload) must be sent as numbers.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+# Model used when a request leaves the choice open, kept loaded on every host that has it
+DEFAULT_MODEL = normalize_model(os.environ["DEFAULT_MODEL"]) if os.getenv("DEFAULT_MODEL", "").strip() else None
+# Comma separated models loaded on every host that has them when the backend starts
+PRELOAD_MODELS = [normalize_model(model) for model in os.getenv("PRELOAD_MODELS", "").split(",") if model.strip()]
+# keep_alive sent with every generation (e.g. "30m", or -1 to never unload), empty leaves Ollama's default.
+# MODEL_KEEP_ALIVE_OVERRIDES sets it per model ("llama3.2:3b=-1,qwen2.5:7b=10m"), DEFAULT_MODEL defaults to -1.
+MODEL_KEEP_ALIVE = parse_keep_alive(os.getenv("MODEL_KEEP_ALIVE", ""))
+MODEL_KEEP_ALIVE_OVERRIDES = {
+    normalize_model(model): parse_keep_alive(value)
+    for model, _, value in (item.partition("=") for item in os.getenv("MODEL_KEEP_ALIVE_OVERRIDES", "").split(",") if "=" in item)
+}
+
+
+def keep_alive_for(model: str) -> Optional[Union[float, str]]:
+    if model in MODEL_KEEP_ALIVE_OVERRIDES:
+        return MODEL_KEEP_ALIVE_OVERRIDES[model]
+    if model == DEFAULT_MODEL:
+        # Generations must not shorten the lifetime of the model the keeper holds resident
+        return -1
+    return MODEL_KEEP_ALIVE
+
+
+class OllamaHost:
+    """
+    Routing state of a single Ollama instance.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client = ollama_client(url)
+        self.healthy = True
+        self.models: Optional[Set[str]] = None  # None until the first health check
+        self.loaded: Set[str] = set()
+        self.loaded_checked: Optional[float] = None  # time.monotonic() of the last ps() call
+        self.outstanding = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def has_model(self, model: Optional[str]) -> bool:
+        return model is None or self.models is None or model in self.models
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models) if self.models is not None else None,
+            "loaded": sorted(self.loaded),
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked,
+        }
+
+
+class OllamaPool:
+    """
+    Routes Ollama calls across several instances.
+    Requests go to the healthy host with the fewest outstanding requests, preferring hosts that
+    have the requested model loaded in memory, and fail over to the next host when a call fails.
+    A background task periodically refreshes health, available models and loaded models per host,
+    loads the `preload` models once and reloads the `pinned` models whenever a host unloaded them.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_interval: float = OLLAMA_HEALTH_INTERVAL,
+        pinned: List[str] = (),
+        preload: List[str] = (),
+    ):
+        self.hosts = [OllamaHost(url) for url in dict.fromkeys(ollama_host(url) for url in urls)]
+        self.name = ",".join(host.url for host in self.hosts)
+        self.health_interval = health_interval
+        self.pinned = list(pinned)
+        self.preload = list(preload)
+        self._health_task: Optional[asyncio.Task] = None
+
+    def __contains__(self, url: str) -> bool:
+        return any(host.url == url for host in self.hosts)
+
+    def candidates(self, model: Optional[str] = None, prefer: Optional[str] = None) -> List[OllamaHost]:
+        """
+        Returns the hosts in the order they should be tried for `model`.
+        Hosts known not to have the model are only tried if no host has it.
+        The healthy host with URL `prefer`, if any, comes first regardless of load.
+        """
+        hosts = [host for host in self.hosts if host.has_model(model)] or list(self.hosts)
+        return sorted(hosts, key=lambda host: (
+            not host.healthy, not (prefer and host.url == prefer), model not in host.loaded, host.outstanding,
+        ))
+
+    def _succeeded(self, host: OllamaHost, model: Optional[str]) -> None:
+        host.healthy = True
+        if model:
+            # A model that just answered is resident on that host
+            host.loaded.add(model)
+
+    def _failed(self, host: OllamaHost, error: Exception) -> None:
+        host.failures += 1
+        host.last_error = str(error)
+        # Ollama answered with an error (e.g. unknown model), the host itself is still reachable
+        if not isinstance(error, ollama.ResponseError):
+            host.healthy = False
+
+    async def run(self, model: Optional[str], fn: Callable[[ollama.AsyncClient], Awaitable[T]]) -> T:
+        """
+        Calls `fn` with the client of the preferred host for `model`, failing over to the next host on errors.
+        """
+        return await self.run_on_host(model, lambda host: fn(host.client))
+
+    async def run_on_host(self, model: Optional[str], fn: Callable[[OllamaHost], Awaitable[T]], prefer: Optional[str] = None) -> T:
+        """
+        Like run(), but calls `fn` with the host itself, trying the host with URL `prefer` first.
+        """
+        last_error: Optional[Exception] = None
+        for host in self.candidates(model, prefer):
+            host.outstanding += 1
+            try:
+                result = await fn(host)
+            except Exception as e:
+                self._failed(host, e)
+                last_error = e
+                continue
+            finally:
+                host.outstanding -= 1
+            self._succeeded(host, model)
+            return result
+        raise last_error or RuntimeError("No Ollama hosts configured.")
+
+    def _with_keep_alive(self, model: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        keep_alive = keep_alive_for(model)
+        if keep_alive is not None and "keep_alive" not in kwargs:
+            kwargs = {**kwargs, "keep_alive": keep_alive}
+        return kwargs
+
+    async def generate(self, model: str, prompt: str, **kwargs) -> Any:
+        kwargs = self._with_keep_alive(model, kwargs)
+        return await self.run(model, lambda client: client.generate(model=model, prompt=prompt, **kwargs))
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], prefer: Optional[str] = None, **kwargs) -> Tuple[Any, str]:
+        """
+        Sends a chat request, preferring the host with URL `prefer`. Returns the response and the URL of the
+        host that answered, so that follow-ups can go to the host whose KV cache holds the conversation.
+        """
+        kwargs = self._with_keep_alive(model, kwargs)
+
+        async def call(host: OllamaHost) -> Tuple[Any, str]:
+            return await host.client.chat(model=model, messages=messages, **kwargs), host.url
+
+        return await self.run_on_host(model, call, prefer)
+
+    async def embed(self, model: str, inputs: List[str], **kwargs) -> List[List[float]]:
+        """
+        Returns one embedding per input text.
+        """
+        kwargs = self._with_keep_alive(model, kwargs)
+        response = await self.run(model, lambda client: client.embed(model=model, input=inputs, **kwargs))
+        return list(response.get('embeddings') or [])
+
+    async def stream_generate(self, model: str, prompt: str, **kwargs) -> AsyncIterator[Any]:
+        """
+        Streams a generation from the preferred host. Fails over only until the first chunk arrived,
+        a stream that breaks later raises to the caller.
+        """
+        kwargs = self._with_keep_alive(model, kwargs)
+        last_error: Optional[Exception] = None
+        for host in self.candidates(model):
+            host.outstanding += 1
+            started = False
+            try:
+                async for chunk in await host.client.generate(model=model, prompt=prompt, stream=True, **kwargs):
+                    started = True
+                    yield chunk
+                self._succeeded(host, model)
+                return
+            except Exception as e:
+                self._failed(host, e)
+                if started:
+                    raise
+                last_error = e
+            finally:
+                host.outstanding -= 1
+        raise last_error or RuntimeError("No Ollama hosts configured.")
+
+    async def list_models(self) -> List[str]:
+        """
+        Returns the union of the models available on all reachable hosts.
+        """
+        results = await asyncio.gather(*[self._list_host_models(host) for host in self.hosts], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+        models: List[str] = []
+        for result in results:
+            if not isinstance(result, Exception):
+                models.extend(result)
+        return list(dict.fromkeys(models))
+
+    async def _list_host_models(self, host: OllamaHost) -> List[str]:
+        try:
+            models = [item.get('model') for item in (await host.client.list()).get('models', [])]
+        except Exception as e:
+            self._failed(host, e)
+            raise
+        host.models = set(models)
+        host.healthy = True
+        return models
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*[self._check_host(host) for host in self.hosts])
+
+    async def _check_host(self, host: OllamaHost) -> None:
+        host.last_checked = time.time()
+        try:
+            await self._list_host_models(host)
+            await self._list_host_loaded(host)
+        except Exception:
+            # _list_host_models already recorded the failure, a failing ps() keeps the last known state
+            pass
+
+    async def _list_host_loaded(self, host: OllamaHost) -> Set[str]:
+        running = await host.client.ps()
+        host.loaded = {item.get('model') for item in running.get('models', [])}
+        host.loaded_checked = time.monotonic()
+        return host.loaded
+
+    async def loaded_models(self, max_age: float = LOADED_MODELS_MAX_AGE) -> Set[str]:
+        """
+        Returns the models loaded in memory on the healthy hosts, asking Ollama's running-models API
+        again if the last answer of a host is older than `max_age` seconds.
+        """
+        now = time.monotonic()
+        hosts = [host for host in self.hosts if host.healthy]
+        # A failing ps() keeps the last known state of the host
+        await asyncio.gather(*[
+            self._list_host_loaded(host)
+            for host in hosts
+            if host.loaded_checked is None or now - host.loaded_checked > max_age
+        ], return_exceptions=True)
+        loaded: Set[str] = set()
+        for host in hosts:
+            loaded |= host.loaded
+        return loaded
+
+    async def warm(self, models: List[str]) -> None:
+        """
+        Loads the models on every healthy host that has them and does not have them loaded yet.
+        Hosts load one model after the other, so warming never makes a host swap models back and forth.
+        """
+        await asyncio.gather(*[self._warm_host(host, models) for host in self.hosts if host.healthy])
+
+    async def _warm_host(self, host: OllamaHost, models: List[str]) -> None:
+        for model in models:
+            if host.models is None or model not in host.models or model in host.loaded:
+                continue
+            try:
+                # A generation without prompt only loads the model
+                await host.client.generate(model=model, prompt="", **self._with_keep_alive(model, {}))
+            except Exception as e:
+                self._failed(host, e)
+                continue
+            self._succeeded(host, model)
+
+    async def _health_loop(self) -> None:
+        preload = list(self.preload)
+        while True:
+            await self.check_health()
+            # Preloaded models are loaded once, pinned models again whenever they were unloaded
+            await self.warm(list(dict.fromkeys(preload + self.pinned)))
+            preload = []
+            await asyncio.sleep(self.health_interval)
+
+    def start(self) -> None:
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def close(self, grace: float = OLLAMA_TIMEOUT) -> None:
+        """
+        Stops the pool and closes its clients once the calls still using them are done, or after `grace` seconds.
+        """
+        for host in self.hosts:
+            forget_ollama_client(host.client)
+        await self.stop()
+        deadline = time.monotonic() + grace
+        while any(host.outstanding for host in self.hosts) and time.monotonic() < deadline:
+            await asyncio.sleep(1)
+        await asyncio.gather(*[close_ollama_client(host.client) for host in self.hosts])
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [host.stats() for host in self.hosts]
+
+
+default_pool = OllamaPool(OLLAMA_HOSTS, pinned=[DEFAULT_MODEL] if DEFAULT_MODEL else [], preload=PRELOAD_MODELS)
+_direct_pools: "OrderedDict[str, OllamaPool]" = OrderedDict()
+# Closing tasks of evicted direct pools, referenced until they finish
+_closing: Set[asyncio.Task] = set()
+
+
+def ollama_pool(ollama_api_url: Optional[str] = None) -> OllamaPool:
+    """
+    Returns the pool serving a request. Requests without an X-Ollama-API-URL header, or naming a host
+    of the configured pool, are balanced across OLLAMA_HOSTS; any other URL gets its own single-host pool,
+    of which the OLLAMA_MAX_DIRECT_HOSTS most recently used are kept.
+    """
+    if not ollama_api_url:
+        return default_pool
+    host = ollama_host(ollama_api_url)
+    if host in default_pool:
+        return default_pool
+    pool = _direct_pools.get(host)
+    if pool is None:
+        pool = _direct_pools[host] = OllamaPool([host])
+        while len(_direct_pools) > max(OLLAMA_MAX_DIRECT_HOSTS, 1):
+            _, evicted = _direct_pools.popitem(last=False)
+            task = asyncio.ensure_future(evicted.close())
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+    else:
+        _direct_pools.move_to_end(host)
+    return pool
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class Prewarmer:
+    """
+    Summarizes videos from a watch list ahead of the first request for them, while the backend is idle.
+    Every `interval` seconds `list_videos` is called for the current watch list, and the videos not warmed
+    yet are passed to `warm` one at a time, newest first and at most `max_videos` per round.
+    Before each video the prewarmer waits until no request has arrived for `idle_seconds` (see
+    `note_activity`) and `is_busy` reports no generation in progress, so that it only uses idle capacity
+    and never delays live traffic by more than the one video it is working on.
+    """
+
+    def __init__(
+        self,
+        list_videos: Callable[[], Awaitable[List[str]]],
+        warm: Callable[[str], Awaitable[Any]],
+        is_busy: Callable[[], bool],
+        interval: float = 600,
+        idle_seconds: float = 30,
+        max_videos: int = 50,
+        poll_interval: float = 1.0,
+        max_remembered: int = 10000,
+    ):
+        self._list_videos = list_videos
+        self._warm = warm
+        self._is_busy = is_busy
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.max_videos = max_videos
+        self.poll_interval = poll_interval
+        self.max_remembered = max_remembered
+        self.state = "stopped"  # stopped, listing, waiting_for_idle, warming, sleeping
+        self.pending: List[str] = []
+        self.warmed: "OrderedDict[str, float]" = OrderedDict()  # Video ID -> time.time() it was warmed
+        self.failed: Dict[str, str] = {}  # Video ID -> error of the last attempt, retried next round
+        self.deferred = 0  # Times warming waited for live traffic to end
+        self.last_round: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._last_activity = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def note_activity(self) -> None:
+        """
+        Marks live traffic, warming pauses until the backend has been idle for `idle_seconds`.
+        """
+        self._last_activity = time.monotonic()
+
+    def _idle(self) -> bool:
+        return time.monotonic() - self._last_activity >= self.idle_seconds and not self._is_busy()
+
+    async def _wait_until_idle(self) -> None:
+        if self._idle():
+            return
+        self.deferred += 1
+        self.state = "waiting_for_idle"
+        while not self._idle():
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_round(self) -> None:
+        """
+        Lists the watched videos and warms the ones not warmed yet.
+        """
+        self.state = "listing"
+        # Cleared before listing, the listing may record errors of single feeds and still return the other videos
+        self.last_error = None
+        try:
+            video_ids = await self._list_videos()
+        except Exception as e:
+            self.last_error = f"Error listing watched videos: {e}"
+            return
+        self.failed = {video_id: error for video_id, error in self.failed.items() if video_id in video_ids}
+        self.pending = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in self.warmed][:self.max_videos]
+        while self.pending:
+            video_id = self.pending[0]
+            await self._wait_until_idle()
+            self.state = "warming"
+            try:
+                await self._warm(video_id)
+            except Exception as e:
+                self.failed[video_id] = str(e)
+            else:
+                self.failed.pop(video_id, None)
+                self.warmed[video_id] = time.time()
+                while len(self.warmed) > self.max_remembered:
+                    self.warmed.popitem(last=False)
+            self.pending.pop(0)
+        self.last_round = time.time()
+
+    async def _loop(self) -> None:
+        while True:
+            await self.run_round()
+            self.state = "sleeping"
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.state = "stopped"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "pending": len(self.pending),
+            "warmed": len(self.warmed),
+            "failed": dict(self.failed),
+            "deferred": self.deferred,
+            "last_round": self.last_round,
+            "last_error": self.last_error,
+            "idle_seconds": self.idle_seconds,
+            "interval": self.interval,
+        }
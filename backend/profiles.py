@@ -0,0 +1,160 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from ollama_pool import normalize_model
+from summarize import estimate_tokens
+
+# Transcript strategies: a head and tail sample within a token budget, the whole transcript in a single prompt
+# (condensed by map-reduce if it does not fit the context), or map-reduce over chunks for long transcripts
+SAMPLE = "sample"
+FULL = "full"
+CHUNKED = "chunked"
+
+# Tokens of the prompt around the transcript, reserved when fitting a transcript into the context window
+PROMPT_OVERHEAD_TOKENS = 256
+
+QUICK_PROMPT = (
+    "Summarize this YouTube video transcript excerpt in 3 sentences, then list its 3 main takeaways as bullet points. "
+    "Write in this language as identified by its short-code: [language].\n\n"
+    "[[concatenated_transcript]]\n"
+)
+
+
+class SummaryProfile:
+    """
+    A named trade-off between summary latency and depth: model, context size, output length, stop
+    sequences and how much of the transcript the model reads. `latency_target` is the time in seconds the
+    profile is designed to answer in; summaries taking longer are counted per profile in the metrics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        latency_target: float,
+        num_ctx: int,
+        num_predict: int,
+        transcript_strategy: str,
+        transcript_tokens: Optional[int] = None,
+        stop: Sequence[str] = (),
+        model: Optional[str] = None,
+        prompt: Optional[str] = None,
+    ):
+        self.name = name
+        self.description = description
+        self.latency_target = latency_target
+        self.num_ctx = num_ctx  # Upper bound, generations get the smallest sufficient window below it
+        self.num_predict = num_predict
+        self.transcript_strategy = transcript_strategy
+        self.transcript_tokens = transcript_tokens  # Budget of the SAMPLE strategy
+        self.stop = list(stop)
+        self.model = model  # Preferred model, used if the request names none and the pool has it
+        self.prompt = prompt  # Default prompt, used if the request gives none
+
+    def transcript_budget(self, max_ctx: Optional[int] = None) -> int:
+        """
+        Transcript tokens the profile sends to the model in a single prompt, within a context of at most `max_ctx`.
+        """
+        num_ctx = min(self.num_ctx, max_ctx) if max_ctx else self.num_ctx
+        budget = num_ctx - self.num_predict - PROMPT_OVERHEAD_TOKENS
+        if self.transcript_strategy == SAMPLE and self.transcript_tokens:
+            budget = min(budget, self.transcript_tokens)
+        return max(budget, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "latency_target": self.latency_target,
+            "model": self.model,
+            "num_ctx": self.num_ctx,
+            "num_predict": self.num_predict,
+            "transcript_strategy": self.transcript_strategy,
+            "stop": self.stop,
+            "own_prompt": self.prompt is not None,
+        }
+
+
+def sample_segments(segments: List[Dict[str, Any]], max_tokens: int, model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Keeps the opening and the closing segments of a transcript within `max_tokens` tokens, where videos
+    usually introduce and recap their topic, and marks the gap between them.
+    """
+    tokens = [estimate_tokens(segment["text"], model) for segment in segments]
+    if sum(tokens) <= max_tokens:
+        return segments
+    head_budget = max_tokens * 2 // 3
+    head: List[Dict[str, Any]] = []
+    used = 0
+    for segment, count in zip(segments, tokens):
+        if used + count > head_budget:
+            break
+        head.append(segment)
+        used += count
+    tail: List[Dict[str, Any]] = []
+    for segment, count in zip(reversed(segments[len(head):]), reversed(tokens[len(head):])):
+        if used + count > max_tokens:
+            break
+        tail.append(segment)
+        used += count
+    tail.reverse()
+    gap_start = tail[0]["start"] if tail else segments[-1]["start"]
+    return head + [{"text": "...", "start": gap_start, "duration": 0.0}] + tail
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+# Preferred model per profile, e.g. "quick=llama3.2:1b,deep=qwen2.5:14b"
+PROFILE_MODELS = {
+    name.strip(): normalize_model(model)
+    for name, _, model in (item.partition("=") for item in os.getenv("SUMMARY_PROFILE_MODELS", "").split(",") if "=" in item)
+}
+
+SUMMARY_PROFILES = {
+    profile.name: profile
+    for profile in [
+        SummaryProfile(
+            "quick",
+            "A few sentences from the beginning and end of the video, in seconds even on CPU-only hosts.",
+            latency_target=float(os.getenv("QUICK_LATENCY_TARGET", "10")),
+            num_ctx=_env_int("QUICK_NUM_CTX", 2048),
+            num_predict=_env_int("QUICK_NUM_PREDICT", 200),
+            transcript_strategy=SAMPLE,
+            transcript_tokens=_env_int("QUICK_TRANSCRIPT_TOKENS", 768),
+            stop=["\n\n\n", "\n\nNote:"],
+            model=PROFILE_MODELS.get("quick"),
+            prompt=QUICK_PROMPT,
+        ),
+        SummaryProfile(
+            "standard",
+            "The structured summary of the whole transcript in one pass, transcripts too long for it are condensed in chunks first.",
+            latency_target=float(os.getenv("STANDARD_LATENCY_TARGET", "45")),
+            num_ctx=_env_int("STANDARD_NUM_CTX", 8192),
+            num_predict=_env_int("STANDARD_NUM_PREDICT", 512),
+            transcript_strategy=FULL,
+            stop=["\n\n\n"],
+            model=PROFILE_MODELS.get("standard"),
+        ),
+        SummaryProfile(
+            "deep",
+            "Reads every part of long transcripts chunk by chunk before summarizing, takes minutes.",
+            latency_target=float(os.getenv("DEEP_LATENCY_TARGET", "300")),
+            num_ctx=_env_int("DEEP_NUM_CTX", 32768),
+            num_predict=_env_int("DEEP_NUM_PREDICT", 1024),
+            transcript_strategy=CHUNKED,
+            model=PROFILE_MODELS.get("deep"),
+        ),
+    ]
+}
+
+# Profile of requests that do not name one
+DEFAULT_SUMMARY_PROFILE = os.getenv("DEFAULT_SUMMARY_PROFILE", "standard")
+
+
+def get_profile(name: Optional[str]) -> Optional[SummaryProfile]:
+    """
+    Returns the named profile, the default profile if no name is given, or None if there is no such profile.
+    """
+    return SUMMARY_PROFILES.get(name or DEFAULT_SUMMARY_PROFILE)
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from summarize import chunk_segments, format_timestamp
+
+
+def retrieval_chunks(segments: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Groups timestamped transcript segments into passages of at most `max_tokens` tokens, each with
+    the start and end time of its segments in seconds.
+    """
+    chunks = []
+    for chunk in chunk_segments(segments, max_tokens):
+        last = chunk[-1]
+        chunks.append({
+            "start": float(chunk[0].get("start", 0.0)),
+            "end": float(last.get("start", 0.0)) + float(last.get("duration", 0.0)),
+            "text": " ".join(segment["text"].strip() for segment in chunk),
+        })
+    return chunks
+
+
+def video_key(youtube_video_id: str) -> str:
+    """
+    Prefix of the keys of all indexes of a video.
+    """
+    return hashlib.sha256(youtube_video_id.encode("utf-8")).hexdigest()[:16]
+
+
+def index_key(youtube_video_id: str, language: str, model: str, chunk_tokens: int, compacted: bool) -> str:
+    """
+    Identifies an index: the same transcript embedded by another model or chunked differently is a separate index.
+    """
+    parts = [youtube_video_id, language, model, str(chunk_tokens), str(compacted)]
+    return video_key(youtube_video_id) + "-" + hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class EmbeddingIndex:
+    """
+    Passages of one transcript and their embeddings, one unit-length float16 row per passage,
+    so that a dot product with a normalized query is the cosine similarity.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        self.chunks = chunks
+        self.vectors = vectors
+
+    def search(self, query: List[float], top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Returns the `top_k` passages most similar to the query embedding, in transcript order, with their scores.
+        """
+        if not self.chunks:
+            return []
+        vector = normalize(np.asarray([query], dtype=np.float32))[0]
+        # float16 is only the storage format, NumPy multiplies float32 matrices much faster
+        scores = self.vectors.astype(np.float32) @ vector
+        top_k = min(top_k, len(self.chunks))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return [(float(scores[i]), self.chunks[i]) for i in sorted(best)]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def format_passage(chunk: Dict[str, Any]) -> str:
+    return f"[{format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}] {chunk['text']}"
+
+
+class EmbeddingIndexStore:
+    """
+    Embedding indexes on disk, one `.npy` matrix and one `.json` passage list per index. Matrices are
+    memory-mapped when loaded, so an index costs no memory until it is searched and its pages are shared
+    between requests; the `max_loaded` most recently used indexes are kept open.
+    Indexes expire `ttl` seconds after they were built, and the least recently used ones are deleted once
+    the indexes on disk take more than `max_bytes`.
+    File access is blocking, callers on the event loop should run it on an executor.
+    """
+
+    def __init__(self, directory: str, max_loaded: int = 64, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = None):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded: "OrderedDict[str, EmbeddingIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".npy", base + ".json"
+
+    def _remember(self, key: str, index: EmbeddingIndex) -> EmbeddingIndex:
+        with self._lock:
+            self._loaded[key] = index
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return index
+
+    def _is_expired(self, matrix_path: str, now: float) -> bool:
+        # The matrix is written once, its modification time is when the index was built
+        return self.ttl is not None and now - os.path.getmtime(matrix_path) > self.ttl
+
+    def get(self, key: str) -> Optional[EmbeddingIndex]:
+        matrix_path, chunks_path = self._paths(key)
+        now = time.time()
+        try:
+            if self._is_expired(matrix_path, now):
+                self._delete(key)
+                raise FileNotFoundError(matrix_path)
+            # The passages' modification time is when the index was last used, the order of eviction
+            os.utime(chunks_path, (now, now))
+        except OSError:
+            self.misses += 1
+            return None
+        with self._lock:
+            index = self._loaded.get(key)
+            if index is not None:
+                self._loaded.move_to_end(key)
+                self.hits += 1
+                return index
+        try:
+            with open(chunks_path, encoding="utf-8") as f:
+                chunks = json.load(f)
+            vectors = np.load(matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._remember(key, EmbeddingIndex(chunks, vectors))
+
+    def save(self, key: str, chunks: List[Dict[str, Any]], embeddings: List[List[float]]) -> EmbeddingIndex:
+        """
+        Stores the passages and their embeddings, normalized and as float16, and returns the memory-mapped index.
+        """
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32)).astype(np.float16)
+        matrix_path, chunks_path = self._paths(key)
+        # Written under temporary names and renamed, so that readers never see a partial index;
+        # the passages are renamed last, as their presence marks the index complete
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, vectors)
+        with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(chunks_path + ".tmp", chunks_path)
+        index = self._remember(key, EmbeddingIndex(chunks, np.load(matrix_path, mmap_mode="r")))
+        self._evict(keep=key)
+        return index
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._loaded.pop(key, None)
+        # Memory-mapped matrices stay readable for the requests still searching them
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self) -> List[Tuple[str, float, float, int]]:
+        """
+        Key, build time, last use and size of every index on disk.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            matrix_path, chunks_path = self._paths(key)
+            try:
+                matrix, chunks = os.stat(matrix_path), os.stat(chunks_path)
+            except OSError:
+                continue
+            entries.append((key, matrix.st_mtime, chunks.st_mtime, matrix.st_size + chunks.st_size))
+        return entries
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        now = time.time()
+        entries = []
+        for key, built, used, size in self._entries():
+            if self.ttl is not None and now - built > self.ttl and key != keep:
+                self._delete(key)
+                self.evictions += 1
+            else:
+                entries.append((used, key, size))
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._delete(key)
+            self.evictions += 1
+            total -= size
+
+    def delete_video(self, youtube_video_id: str) -> None:
+        """
+        Drops all indexes of a video, e.g. because its transcript changed.
+        """
+        prefix = video_key(youtube_video_id) + "-"
+        for key, _, _, _ in self._entries():
+            if key.startswith(prefix):
+                self._delete(key)
+
+    def clear(self) -> None:
+        for key, _, _, _ in self._entries():
+            self._delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "loaded": len(self._loaded),
+            "max_loaded": self.max_loaded,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, _, _, size in entries),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,358 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# FTS rows are addressed by transcript ID and segment position, `transcript_id << SEGMENT_BITS | position`
+SEGMENT_BITS = 20
+MAX_SEGMENTS = 1 << SEGMENT_BITS
+
+# Little-endian, so that stored columns read the same on every host
+OFFSET_DTYPE = np.dtype("<u4")
+
+
+class CompactTranscript:
+    """
+    The timestamped segments of one transcript in columnar form: start and duration of every segment in
+    milliseconds, and the segment texts as one UTF-8 blob separated by spaces, with the byte offset of every
+    segment in it. The blob is the concatenated transcript, so any range of segments is a single slice of it.
+    """
+
+    def __init__(self, starts: np.ndarray, durations: np.ndarray, offsets: np.ndarray, text: bytes):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets  # One more than there are segments, the last is the blob length plus a separator
+        self.blob = text
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict[str, Any]]) -> "CompactTranscript":
+        segments = sorted(segments, key=lambda segment: float(segment.get("start", 0.0)))
+        texts = [segment["text"].encode("utf-8") for segment in segments]
+        offsets = np.zeros(len(texts) + 1, dtype=OFFSET_DTYPE)
+        np.cumsum([len(text) + 1 for text in texts], out=offsets[1:])
+        return cls(
+            np.array([round(float(segment.get("start", 0.0)) * 1000) for segment in segments], dtype=OFFSET_DTYPE),
+            np.array([round(float(segment.get("duration", 0.0)) * 1000) for segment in segments], dtype=OFFSET_DTYPE),
+            offsets,
+            b" ".join(texts),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.starts.nbytes + self.durations.nbytes + self.offsets.nbytes + len(self.blob)
+
+    def span(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Positions of the first and after the last segment spoken between `start_ms` and `end_ms`,
+        including a segment that is still being spoken at `start_ms`.
+        """
+        first, last = 0, len(self)
+        if start_ms is not None and last:
+            first = max(int(np.searchsorted(self.starts, start_ms, side="right")) - 1, 0)
+            if self.starts[first] + self.durations[first] <= start_ms:
+                first += 1
+        if end_ms is not None:
+            last = int(np.searchsorted(self.starts, end_ms, side="left"))
+        return first, max(first, last)
+
+    def text(self, first: int = 0, last: Optional[int] = None) -> str:
+        """
+        The concatenated text of the segments from `first` up to `last`.
+        """
+        last = len(self) if last is None else last
+        if first >= last:
+            return ""
+        return self.blob[self.offsets[first]:self.offsets[last] - 1].decode("utf-8")
+
+    def segment(self, position: int) -> Dict[str, Any]:
+        """
+        One segment with times in milliseconds.
+        """
+        start = int(self.starts[position])
+        return {"start_ms": start, "end_ms": start + int(self.durations[position]), "text": self.text(position, position + 1)}
+
+    def segments(self, first: int = 0, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The segments from `first` up to `last` as youtube_transcript_api returns them, with times in seconds.
+        """
+        last = len(self) if last is None else last
+        return [
+            {
+                "text": self.text(position, position + 1),
+                "start": int(self.starts[position]) / 1000,
+                "duration": int(self.durations[position]) / 1000,
+            }
+            for position in range(first, last)
+        ]
+
+
+def fts_query(query: str) -> str:
+    """
+    Turns a search query into an FTS5 query matching segments with all of its words, in any order;
+    words in double quotes have to appear as a phrase. Returns "" if the query has no words.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        words = re.findall(r"\w+", phrase or word)
+        if phrase and words:
+            terms.append('"' + " ".join(words) + '"')
+        else:
+            terms.extend(f'"{w}"' for w in words)
+    return " ".join(terms)
+
+
+class SegmentStore:
+    """
+    Persistent store of transcripts in columnar form (see CompactTranscript), backed by SQLite, with an
+    FTS5 inverted index over the text of every stored segment. The index is contentless: it holds only the
+    postings, segment texts are read from the transcript blobs.
+    Transcripts expire after `ttl` seconds and the least recently used ones are evicted, together with their
+    postings, once the total stored size exceeds `max_bytes`.
+    Writes go through one connection and are serialized; reads use a connection per thread, which WAL mode
+    lets run concurrently with each other and with a write, so lookups never wait for indexing or searches.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.searches = 0
+        self._lock = threading.Lock()  # Serializes writes
+        self._counters_lock = threading.Lock()
+        self._accessed: Dict[int, float] = {}  # Reads since the last write, recorded with the next write
+        self._readers = threading.local()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "id INTEGER PRIMARY KEY, video_id TEXT NOT NULL, language TEXT NOT NULL, "
+            "starts BLOB NOT NULL, durations BLOB NOT NULL, offsets BLOB NOT NULL, text BLOB NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "UNIQUE (video_id, language))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS transcripts_accessed_at ON transcripts (accessed_at)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segment_index "
+            "USING fts5(text, content='', tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    @staticmethod
+    def _transcript(row: Tuple[bytes, bytes, bytes, bytes]) -> CompactTranscript:
+        starts, durations, offsets, text = row
+        return CompactTranscript(
+            np.frombuffer(starts, dtype=OFFSET_DTYPE),
+            np.frombuffer(durations, dtype=OFFSET_DTYPE),
+            np.frombuffer(offsets, dtype=OFFSET_DTYPE),
+            bytes(text),
+        )
+
+    def get(self, video_id: str, language: str) -> Optional[CompactTranscript]:
+        """
+        Returns the stored transcript, or None if it is missing or expired.
+        Reading is blocking, callers on the event loop should run it on an executor.
+        """
+        now = time.time()
+        row = self._reader().execute(
+            "SELECT id, starts, durations, offsets, text, created_at FROM transcripts WHERE video_id = ? AND language = ?",
+            (video_id, language),
+        ).fetchone()
+        with self._counters_lock:
+            if row is None or self._is_expired(row[5], now):
+                self.misses += 1
+                return None
+            self._accessed[row[0]] = now
+            self.hits += 1
+        return self._transcript(row[1:5])
+
+    def put(self, video_id: str, language: str, segments: List[Dict[str, Any]]) -> CompactTranscript:
+        """
+        Stores the transcript, replacing a previous one, and indexes its segments.
+        Indexing is blocking, callers on the event loop should run it on an executor.
+        """
+        transcript = CompactTranscript.from_segments(segments)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._record_accesses()
+                self._delete_where("video_id = ? AND language = ?", (video_id, language))
+                transcript_id = self._conn.execute(
+                    "INSERT INTO transcripts (video_id, language, starts, durations, offsets, text, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        video_id, language, transcript.starts.tobytes(), transcript.durations.tobytes(),
+                        transcript.offsets.tobytes(), transcript.blob, transcript.size_bytes, now, now,
+                    ),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO segment_index (rowid, text) VALUES (?, ?)",
+                    self._postings(transcript_id, transcript),
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return transcript
+
+    def _record_accesses(self) -> None:
+        # Eviction orders by accessed_at, so reads are written back before every eviction
+        with self._counters_lock:
+            accessed, self._accessed = self._accessed, {}
+        self._conn.executemany(
+            "UPDATE transcripts SET accessed_at = ? WHERE id = ?",
+            [(accessed_at, transcript_id) for transcript_id, accessed_at in accessed.items()],
+        )
+
+    @staticmethod
+    def _postings(transcript_id: int, transcript: CompactTranscript):
+        # Segments beyond MAX_SEGMENTS (days of captions) are stored but not searchable
+        for position in range(min(len(transcript), MAX_SEGMENTS)):
+            yield (transcript_id << SEGMENT_BITS) | position, transcript.text(position, position + 1)
+
+    def _delete_where(self, condition: str, parameters: Tuple = ()) -> int:
+        # A contentless index can only drop postings given the indexed text, which the blobs still hold
+        rows = self._conn.execute(
+            f"SELECT id, starts, durations, offsets, text, size FROM transcripts WHERE {condition}", parameters,
+        ).fetchall()
+        size = 0
+        for row in rows:
+            self._conn.executemany(
+                "INSERT INTO segment_index (segment_index, rowid, text) VALUES ('delete', ?, ?)",
+                self._postings(row[0], self._transcript(row[1:5])),
+            )
+            self._conn.execute("DELETE FROM transcripts WHERE id = ?", (row[0],))
+            size += row[5]
+        return size
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._delete_where("created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for (transcript_id,) in self._conn.execute("SELECT id FROM transcripts ORDER BY accessed_at ASC").fetchall():
+            total -= self._delete_where("id = ?", (transcript_id,))
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, video_id: str) -> None:
+        """
+        Drops the transcripts of a video in all languages.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._delete_where("video_id = ?", (video_id,))
+            self._conn.execute("COMMIT")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            with self._counters_lock:
+                self._accessed.clear()
+            self._conn.execute("DELETE FROM transcripts")
+            self._conn.execute("INSERT INTO segment_index (segment_index) VALUES ('delete-all')")
+            self._conn.execute("COMMIT")
+
+    def search(
+        self,
+        query: str,
+        language: Optional[str] = None,
+        video_id: Optional[str] = None,
+        max_videos: int = 20,
+        max_matches: int = 5,
+        max_hits: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds the segments matching an FTS5 query (see fts_query) in the stored transcripts, optionally of one
+        language or video. Returns up to `max_videos` transcripts, best match first, each with its `max_matches`
+        best matching segments in transcript order; of all matches only the `max_hits` best are considered.
+        Searching is blocking, callers on the event loop should run it on an executor.
+        """
+        oldest = time.time() - self.ttl if self.ttl is not None else 0
+        with self._counters_lock:
+            self.searches += 1
+        conn = self._reader()
+        # One read transaction, so that the transcripts read match the postings found
+        conn.execute("BEGIN")
+        try:
+            hits = conn.execute(
+                "SELECT rowid, bm25(segment_index) FROM segment_index WHERE segment_index MATCH ? "
+                f"AND (rowid >> {SEGMENT_BITS}) IN (SELECT id FROM transcripts WHERE created_at >= ? "
+                "AND (? IS NULL OR language = ?) AND (? IS NULL OR video_id = ?)) "
+                "ORDER BY bm25(segment_index) LIMIT ?",
+                (query, oldest, language, language, video_id, video_id, max_hits),
+            ).fetchall()
+            # bm25() is lower for better matches, transcripts are ranked by their best segment
+            positions: Dict[int, List[Tuple[int, float]]] = {}
+            for rowid, score in hits:
+                matches = positions.get(rowid >> SEGMENT_BITS)
+                if matches is None:
+                    if len(positions) >= max_videos:
+                        continue
+                    matches = positions[rowid >> SEGMENT_BITS] = []
+                if len(matches) < max_matches:
+                    matches.append((rowid & (MAX_SEGMENTS - 1), -score))
+            ids = list(positions)
+            rows = {
+                row[0]: row
+                for row in conn.execute(
+                    f"SELECT id, video_id, language, starts, durations, offsets, text FROM transcripts "
+                    f"WHERE id IN ({','.join('?' * len(ids))})",
+                    ids,
+                ).fetchall()
+            } if ids else {}
+        finally:
+            conn.execute("COMMIT")
+        results = []
+        for transcript_id in ids:
+            row = rows.get(transcript_id)
+            if row is None:
+                continue
+            transcript = self._transcript(row[3:7])
+            matches = sorted(positions[transcript_id])
+            results.append({
+                "video_id": row[1],
+                "language": row[2],
+                "score": max(score for _, score in matches),
+                "matches": [transcript.segment(position) for position, _ in matches],
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size, videos = self._reader().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT video_id) FROM transcripts"
+        ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "searches": self.searches,
+            "entries": entries,
+            "videos": videos,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class AnalysisSession:
+    """
+    A conversation about one video transcript. The transcript is sent once, as the system message, and every
+    question is appended to the same message history, so that Ollama can reuse the evaluated prefix.
+    """
+
+    def __init__(
+        self,
+        video_id: str,
+        language: str,
+        model: str,
+        system_prompt: str,
+        num_ctx: int,
+        ollama_api_url: Optional[str] = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.video_id = video_id
+        self.language = language
+        self.model = model
+        self.num_ctx = num_ctx  # Fixed for the session, Ollama reloads the model and drops its cache when it changes
+        self.ollama_api_url = ollama_api_url
+        self.host: Optional[str] = None  # Host that answered last and holds the conversation in its KV cache
+        self.messages: List[Dict[str, str]] = [{"role": "system", "content": system_prompt}]
+        self.lock = asyncio.Lock()  # Questions of a session are answered one after the other
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+
+    def history(self) -> List[Dict[str, str]]:
+        """
+        Questions and answers so far, without the system message.
+        """
+        turns = self.messages[1:]
+        return [
+            {"question": question["content"], "answer": answer["content"]}
+            for question, answer in zip(turns[::2], turns[1::2])
+        ]
+
+    def drop_oldest_turn(self) -> bool:
+        """
+        Forgets the oldest question and answer, keeping the transcript. Returns False if there is none.
+        """
+        if len(self.messages) < 3:
+            return False
+        del self.messages[1:3]
+        return True
+
+
+class SessionStore:
+    """
+    In-memory analysis sessions. Sessions expire `ttl` seconds after their last use, and the least
+    recently used session is dropped when more than `max_sessions` exist.
+    """
+
+    def __init__(self, ttl: float = 1800, max_sessions: int = 100):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+
+    def add(self, session: AnalysisSession) -> AnalysisSession:
+        self._purge()
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        self._purge()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for session_id in [session_id for session_id, session in self._sessions.items() if now - session.last_used > self.ttl]:
+            del self._sessions[session_id]
+
+    def stats(self) -> Dict[str, Any]:
+        self._purge()
+        return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, "ttl": self.ttl}
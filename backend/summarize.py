@@ -0,0 +1,224 @@
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Rough characters-per-token ratio of common tokenizers for English text
+CHARS_PER_TOKEN = 4
+
+# Characters-per-token ratios of model families whose tokenizers differ noticeably from the default,
+# matched against the start of the model name
+MODEL_CHARS_PER_TOKEN = {
+    "llama3": 4.2,
+    "llama2": 3.6,
+    "mistral": 3.6,
+    "mixtral": 3.6,
+    "qwen": 3.9,
+    "gemma": 4.1,
+    "phi": 3.7,
+}
+
+# Bracketed caption annotations ([Music], [Applause], [Laughter], ...), music notes and speaker change markers
+NON_SPEECH_PATTERN = re.compile(r"\[[^\]]*\]|[♪♫]+|>>")
+# Hesitations that carry no content, other filler words are left alone because they often do
+FILLER_PATTERN = re.compile(r"\b(?:u+m+|u+h+|e+r+m+|h+m+)\b[,.]?\s*", re.IGNORECASE)
+# Longest overlap, in words, searched for between consecutive captions
+MAX_OVERLAP_WORDS = 40
+# Shortest overlap that is removed: speech repeats a word or two across caption boundaries all the time
+# ("I think that" + "that is the point"), rolling captions repeat whole phrases
+MIN_OVERLAP_WORDS = 3
+
+
+def chars_per_token(model: Optional[str] = None) -> float:
+    if model:
+        name = model.lower().rsplit("/", 1)[-1]
+        for family, ratio in MODEL_CHARS_PER_TOKEN.items():
+            if name.startswith(family):
+                return ratio
+    return CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Cheap token count estimate, good enough to budget prompts without loading a tokenizer.
+    """
+    return int(len(text) / chars_per_token(model)) + 1
+
+
+def _overlap(previous: List[str], current: List[str]) -> int:
+    """
+    Number of leading words of `current` that repeat the trailing words of `previous`, 0 if fewer than
+    MIN_OVERLAP_WORDS do.
+    """
+    previous = [word.lower() for word in previous[-MAX_OVERLAP_WORDS:]]
+    current = [word.lower() for word in current[:MAX_OVERLAP_WORDS]]
+    for size in range(min(len(previous), len(current)), MIN_OVERLAP_WORDS - 1, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def compact_segments(segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Removes text that costs prompt tokens without adding content: non-speech annotations, hesitations,
+    and the words rolling auto-captions repeat from the previous caption. Segments left empty are dropped.
+    """
+    compacted: List[Dict[str, Any]] = []
+    previous_words: List[str] = []
+    for segment in segments:
+        text = NON_SPEECH_PATTERN.sub(" ", segment["text"])
+        text = FILLER_PATTERN.sub("", text)
+        words = text.split()
+        words = words[_overlap(previous_words, words):]
+        if not words:
+            continue
+        compacted.append({**segment, "text": " ".join(words)})
+        previous_words = words
+    return compacted
+
+
+def trim_to_budget(segments: List[Dict[str, Any]], max_tokens: int, model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Drops evenly spaced segments until the transcript fits into `max_tokens`, so that every part of the
+    video stays represented instead of cutting off its end.
+    """
+    total = sum(estimate_tokens(segment["text"], model) for segment in segments)
+    if total <= max_tokens:
+        return segments
+    keep = max_tokens / total
+    trimmed = []
+    credit = 0.0
+    for segment in segments:
+        credit += keep
+        if credit >= 1:
+            credit -= 1
+            trimmed.append(segment)
+    return trimmed
+
+
+def context_window(prompt_tokens: int, output_tokens: int, minimum: int, maximum: int) -> int:
+    """
+    Smallest power of two context size that fits the prompt and the expected output, within the bounds.
+    Ollama reloads a model whenever num_ctx changes, so rounding keeps the number of distinct sizes small.
+    """
+    size = minimum
+    while size < prompt_tokens + output_tokens and size < maximum:
+        size *= 2
+    return min(size, maximum)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def chunk_segments(segments: List[Dict[str, Any]], max_tokens: int) -> List[List[Dict[str, Any]]]:
+    """
+    Splits timestamped transcript segments into consecutive chunks of at most `max_tokens` tokens.
+    Segments are never split, so every chunk starts and ends on a caption boundary.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        tokens = estimate_tokens(segment["text"])
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def group_by_budget(texts: List[str], max_tokens: int) -> List[List[str]]:
+    """
+    Groups consecutive texts so that each group stays within `max_tokens`, with at least two texts
+    per group so that every reduce round shrinks the number of texts.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
+
+
+def map_prompt(chunk: List[Dict[str, Any]], index: int, total: int, language: str) -> str:
+    start = format_timestamp(chunk[0]["start"])
+    end = format_timestamp(chunk[-1]["start"] + chunk[-1].get("duration", 0))
+    text = " ".join(segment["text"] for segment in chunk)
+    return (
+        f"The following is part {index} of {total} of a YouTube video transcript, covering {start} to {end}.\n\n"
+        f"{text}\n\n"
+        "Write concise notes of the main points, insights and the tone of this part. "
+        f"Start the notes with the time range [{start}-{end}]. "
+        f"Write the notes in this language as identified by its short-code: {language}.\n"
+    )
+
+
+def reduce_prompt(notes: List[str], language: str) -> str:
+    joined = "\n\n".join(notes)
+    return (
+        "The following are consecutive notes taken on parts of a YouTube video:\n\n"
+        f"{joined}\n\n"
+        "Merge them into a single set of concise notes that keeps the main points, insights, tone and time ranges. "
+        f"Write the notes in this language as identified by its short-code: {language}.\n"
+    )
+
+
+async def summarize_chunks(
+    generate: Callable[[str], Awaitable[str]],
+    segments: List[Dict[str, Any]],
+    language: str,
+    chunk_tokens: int,
+    parallelism: int,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """
+    Map-reduce stage of long transcript summarization.
+    Summarizes token-budgeted chunks of the transcript concurrently, at most `parallelism` at a time,
+    then merges the chunk notes hierarchically until they fit into a single prompt of `chunk_tokens` tokens.
+    Returns the combined notes, which take the place of the transcript in the final summary prompt.
+    `progress` is called with the number of finished and total chunks whenever a chunk is summarized.
+    """
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    chunks = chunk_segments(segments, chunk_tokens)
+    finished = 0
+
+    async def bounded_generate(prompt: str) -> str:
+        async with semaphore:
+            return await generate(prompt)
+
+    async def summarize_chunk(prompt: str) -> str:
+        nonlocal finished
+        text = await bounded_generate(prompt)
+        finished += 1
+        if progress is not None:
+            progress(finished, len(chunks))
+        return text
+
+    notes = await asyncio.gather(*[
+        summarize_chunk(map_prompt(chunk, index, len(chunks), language))
+        for index, chunk in enumerate(chunks, start=1)
+    ])
+    while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > chunk_tokens:
+        groups = group_by_budget(notes, chunk_tokens)
+        notes = await asyncio.gather(*[bounded_generate(reduce_prompt(group, language)) for group in groups])
+    return "\n\n".join(notes)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other as top-level modules, as when the backend runs from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main creates its caches on import, keep them out of the working tree
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="yt-tldr-tests-"))
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded, RateLimiter
+
+
+def test_bounds_generations_and_queues():
+    async def main():
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 1
+        with pytest.raises(Overloaded) as raised:
+            await controller.acquire()
+        assert raised.value.retry_after >= 1
+        # Jobs and batches wait regardless of the queue limit
+        patient = asyncio.ensure_future(controller.acquire(wait=True))
+        controller.release(1.0)
+        await waiting
+        controller.release(1.0)
+        await patient
+        controller.release(1.0)
+        return controller.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["in_flight"], stats["waiting"], stats["admitted"], stats["rejected"]) == (0, 0, 3, 1)
+
+
+def test_try_acquire_takes_only_free_slots():
+    async def main():
+        controller = AdmissionController(max_in_flight=2, max_queue=4)
+        await controller.acquire()
+        assert await controller.try_acquire()
+        assert not await controller.try_acquire()
+        controller.release()
+        # A free slot goes to a waiting request first
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        controller.release()
+        assert not await controller.try_acquire()
+        await waiting
+        return controller.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 2
+
+
+def test_disabled_controller_admits_everything():
+    async def main():
+        controller = AdmissionController(max_in_flight=0, max_queue=0)
+        for _ in range(10):
+            await controller.acquire()
+        assert await controller.try_acquire()
+        controller.release()
+
+    asyncio.run(main())
+
+
+def test_slot_context_releases_on_errors():
+    async def main():
+        controller = AdmissionController(max_in_flight=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            async with controller.slot():
+                raise RuntimeError("generation failed")
+        async with controller.slot():
+            pass
+        return controller.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 0
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=1, burst=2)
+    assert limiter.acquire("client") is None
+    assert limiter.acquire("client") is None
+    assert limiter.acquire("client") == 1
+    assert limiter.acquire("other") is None
+    assert RateLimiter(rate=0, burst=1).acquire("client") is None
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """
+    Fakes metadata, transcripts and summaries; a video ID starting with "fail" fails, one starting with "boom" raises.
+    """
+    summarized = []
+
+    async def fetch_oembed(video_id):
+        return {"title": f"Title of {video_id}"}
+
+    async def fetch_transcript(video_id, language):
+        return []
+
+    async def summarize_video(pool, video_id, language, model, prompt, progress=None, wait_for_slot=False, profile=None):
+        assert wait_for_slot
+        summarized.append(video_id)
+        await asyncio.sleep(0.01)
+        if video_id.startswith("boom"):
+            raise RuntimeError("generation crashed")
+        if video_id.startswith("fail"):
+            return main.VideoSummaryResponse(error="No transcript found.")
+        return main.VideoSummaryResponse(summary=f"Summary of {video_id}")
+
+    monkeypatch.setattr(main, "fetch_oembed", fetch_oembed)
+    monkeypatch.setattr(main, "fetch_transcript", fetch_transcript)
+    monkeypatch.setattr(main, "summarize_video", summarize_video)
+    return summarized
+
+
+def run_batch(**kwargs):
+    async def run():
+        response = await main.batch_summary(main.BatchSummaryRequest(**kwargs), SimpleNamespace(client=None), None)
+        assert response.media_type == "application/x-ndjson"
+        return [json.loads(line) async for line in response.body_iterator]
+
+    return asyncio.run(run())
+
+
+def test_streams_one_line_per_video_and_the_totals(summaries):
+    lines = run_batch(video_ids=["aaaaaaaaaaa", "https://youtu.be/bbbbbbbbbbb"])
+    items, totals = lines[:-1], lines[-1]["batch"]
+    assert sorted(item["video_id"] for item in items) == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+    for item in items:
+        assert item["title"] == f"Title of {item['video_id']}"
+        assert item["summary"] == f"Summary of {item['video_id']}"
+        assert item["error"] is None
+    assert totals["total"] == 2 and totals["succeeded"] == 2 and totals["failed"] == 0
+
+
+def test_failing_videos_do_not_affect_the_rest_of_the_batch(summaries):
+    lines = run_batch(video_ids=["failfailfai", "boomboomboo", "ccccccccccc"])
+    items = {item["video_id"]: item for item in lines[:-1]}
+    assert items["failfailfai"]["error"] == "No transcript found."
+    assert "generation crashed" in items["boomboomboo"]["error"]
+    assert items["ccccccccccc"]["summary"] == "Summary of ccccccccccc"
+    assert lines[-1]["batch"]["succeeded"] == 1 and lines[-1]["batch"]["failed"] == 2
+
+
+def test_ids_from_text_are_deduplicated_and_comments_skipped(summaries):
+    text = "# watch later\nddddddddddd\n\nhttps://www.youtube.com/watch?v=ddddddddddd\neeeeeeeeeee\n"
+    lines = run_batch(video_ids=["eeeeeeeeeee"], video_ids_text=text)
+    assert sorted(summaries) == ["ddddddddddd", "eeeeeeeeeee"]
+    assert lines[-1]["batch"]["total"] == 2
+
+
+@pytest.mark.parametrize("kwargs, detail", [
+    ({"video_ids": ["not a video"]}, "No valid video IDs"),
+    ({"video_ids": ["aaaaaaaaaaa"], "profile": "unknown"}, "Unknown profile"),
+])
+def test_invalid_batches_are_rejected_up_front(summaries, kwargs, detail):
+    with pytest.raises(HTTPException) as error:
+        run_batch(**kwargs)
+    assert error.value.status_code == 400
+    assert detail in error.value.detail
+    assert summaries == []
+
+
+def test_too_many_videos_are_rejected(summaries, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_VIDEOS", 1)
+    with pytest.raises(HTTPException) as error:
+        run_batch(video_ids=["aaaaaaaaaaa", "bbbbbbbbbbb"])
+    assert error.value.status_code == 400
+
+
+def test_extract_video_id():
+    assert main.extract_video_id(" aaaaaaaaaaa ") == "aaaaaaaaaaa"
+    assert main.extract_video_id("https://www.youtube.com/watch?v=aaaaaaaaaaa&t=10") == "aaaaaaaaaaa"
+    assert main.extract_video_id("https://www.youtube.com/shorts/aaaaaaaaaaa") == "aaaaaaaaaaa"
+    assert main.extract_video_id("https://example.com/") is None
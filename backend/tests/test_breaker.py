@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from breaker import CircuitBreaker, CircuitOpen
+
+
+class UpstreamDown(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+def call(breaker: CircuitBreaker, error=None):
+    async def run():
+        async with breaker.call():
+            if error is not None:
+                raise error
+
+    asyncio.run(run())
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("upstream", failure_threshold=2, backoff=60)
+    for _ in range(2):
+        with pytest.raises(UpstreamDown):
+            call(breaker, UpstreamDown("down"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as raised:
+        call(breaker)
+    assert "down" in str(raised.value)
+    assert raised.value.retry_after >= 1
+
+
+def test_successes_reset_the_count():
+    breaker = CircuitBreaker("upstream", failure_threshold=2, backoff=60)
+    with pytest.raises(UpstreamDown):
+        call(breaker, UpstreamDown())
+    call(breaker)
+    with pytest.raises(UpstreamDown):
+        call(breaker, UpstreamDown())
+    assert breaker.state == "closed"
+
+
+def test_answers_of_the_upstream_are_not_failures():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, is_failure=lambda error: isinstance(error, UpstreamDown))
+    for _ in range(3):
+        with pytest.raises(NotFound):
+            call(breaker, NotFound())
+    assert breaker.state == "closed"
+
+
+def test_probes_after_the_backoff():
+    breaker = CircuitBreaker("upstream", failure_threshold=1, backoff=0.01, max_backoff=1)
+    with pytest.raises(UpstreamDown):
+        call(breaker, UpstreamDown())
+    asyncio.run(asyncio.sleep(0.02))
+    assert breaker.state == "half_open"
+    # A failed probe opens the circuit for twice as long
+    with pytest.raises(UpstreamDown):
+        call(breaker, UpstreamDown())
+    assert breaker.state == "open"
+    asyncio.run(asyncio.sleep(0.03))
+    call(breaker)
+    assert breaker.state == "closed"
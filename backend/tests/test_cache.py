@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from cache import SQLiteCache, SingleFlight, TokenStream
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", max_bytes=1024 * 1024)
+
+
+def stored_size(cache: SQLiteCache) -> int:
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {cache.table}").fetchone()[0]
+
+
+def test_set_and_get(cache):
+    assert cache.get("key") is None
+    cache.set("key", {"summary": "text", "tokens": [1, 2]})
+    assert cache.get("key") == {"summary": "text", "tokens": [1, 2]}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_size_is_tracked_across_writes(cache):
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 50)
+    cache.set("a", "z" * 10)
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+    cache.delete("b")
+    cache.delete("missing")
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+    cache.clear()
+    assert (cache.stats()["entries"], cache.stats()["size_bytes"]) == (0, 0)
+
+
+def test_size_is_read_on_open(cache):
+    cache.set("a", "x" * 100)
+    reopened = SQLiteCache(cache.path, table=cache.table)
+    assert reopened.stats()["size_bytes"] == stored_size(cache) > 100
+
+
+def test_evicts_least_recently_used(cache):
+    cache.set("first", "x" * 100)
+    time.sleep(0.01)
+    cache.set("second", "x" * 100)
+    time.sleep(0.01)
+    cache.get("first")
+    cache.max_bytes = cache.stats()["size_bytes"]
+    cache.set("third", "x" * 100)
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+    assert cache.stats()["size_bytes"] == stored_size(cache) <= cache.max_bytes
+
+
+def test_expired_entries_are_missing_and_dropped(cache):
+    cache.set("old", "x" * 100)
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get("old") is None
+    cache.set("older", "x" * 100)
+    time.sleep(0.02)
+    cache.set("new", "y")
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+
+
+def test_delete_prefix(cache):
+    for key in ["abc:1", "abc:2", "abd:1", "ab:1", "abc"]:
+        cache.set(key, "x" * 10)
+    assert cache.delete_prefix("abc:") == 2
+    assert [key for key in ["abc:1", "abc:2", "abd:1", "ab:1", "abc"] if cache.get(key) is not None] == ["abd:1", "ab:1", "abc"]
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+
+
+def test_single_flight_coalesces_calls():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert flight.in_flight() == 0
+        assert await flight.do("key", work) == "result"
+        return results, flight.coalesced
+
+    results, coalesced = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert (len(calls), coalesced) == (2, 4)
+
+
+def test_single_flight_shares_failures_and_survives_callers():
+    async def work():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream failed")
+
+    async def main():
+        flight = SingleFlight()
+        leaving = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        staying = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(RuntimeError):
+            await staying
+        assert flight.join("key") is None
+
+    asyncio.run(main())
+
+
+def test_token_stream_replays_and_follows():
+    async def main():
+        stream = TokenStream()
+        stream.append("Hello")
+        stream.append(", ")
+
+        async def follow():
+            return [text async for text in stream.follow()]
+
+        early = asyncio.ensure_future(follow())
+        await asyncio.sleep(0)
+        stream.append("world")
+        await asyncio.sleep(0)
+        late = asyncio.ensure_future(follow())
+        await asyncio.sleep(0)
+        stream.append("!")
+        stream.close()
+        return await early, await late
+
+    early, late = asyncio.run(main())
+    assert early == ["Hello, ", "world", "!"]
+    assert late == ["Hello, world", "!"]
+
+
+def test_token_stream_is_abandoned_by_its_last_follower():
+    abandoned = []
+    stream = TokenStream()
+    stream.on_abandoned = lambda: abandoned.append(1)
+    with stream.follower():
+        with stream.follower():
+            pass
+        assert abandoned == []
+    assert abandoned == [1]
+    stream.close()
+    with stream.follower():
+        pass
+    assert abandoned == [1]
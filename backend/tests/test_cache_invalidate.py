@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import main
+
+
+def test_summaries_of_one_video_are_invalidated():
+    first = main.summary_cache_key("video00001", "en", "llama3.2:3b", "prompt", "standard")
+    second = main.summary_cache_key("video00001", "de", "llama3.2:3b", "prompt", "quick")
+    other = main.summary_cache_key("video00002", "en", "llama3.2:3b", "prompt", "standard")
+    for key in (first, second, other):
+        main.summary_cache.set(key, "A summary.")
+
+    asyncio.run(main.cache_invalidate("summaries", "video00001"))
+    assert main.summary_cache.get(first) is None
+    assert main.summary_cache.get(second) is None
+    assert main.summary_cache.get(other) == "A summary."
+
+
+def test_invalidating_transcripts_drops_listed_handles():
+    with main._transcript_lists_lock:
+        main._transcript_lists["video00001"] = (time.monotonic(), object())
+        main._transcript_lists["video00002"] = (time.monotonic(), object())
+
+    asyncio.run(main.cache_invalidate("transcripts", "video00001"))
+    assert "video00001" not in main._transcript_lists
+    assert "video00002" in main._transcript_lists
+    asyncio.run(main.cache_invalidate("transcripts"))
+    assert not main._transcript_lists
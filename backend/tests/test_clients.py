@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import clients
+import ollama_pool
+from clients import DEFAULT_OLLAMA_API_URL, forget_ollama_client, ollama_client, ollama_host, run_blocking
+from ollama_pool import default_pool
+
+
+def test_ollama_host_normalizes_and_defaults():
+    assert ollama_host("http://ollama:11434/") == "http://ollama:11434"
+    assert ollama_host(None) == DEFAULT_OLLAMA_API_URL.rstrip("/")
+    assert ollama_host("") == DEFAULT_OLLAMA_API_URL.rstrip("/")
+
+
+def test_ollama_client_is_shared_per_host():
+    client = ollama_client("http://shared:11434/")
+    assert ollama_client("http://shared:11434") is client
+    assert ollama_client("http://other:11434") is not client
+
+    forget_ollama_client(client)
+    assert ollama_client("http://shared:11434") is not client
+
+
+def test_run_blocking_runs_off_the_event_loop_thread():
+    async def run():
+        return threading.get_ident(), await run_blocking(lambda a, b=0: (threading.get_ident(), a + b), 1, b=2)
+
+    loop_thread, (call_thread, result) = asyncio.run(run())
+    assert result == 3
+    assert call_thread != loop_thread
+
+
+def test_requests_without_or_with_a_configured_host_use_the_default_pool():
+    assert ollama_pool.ollama_pool(None) is default_pool
+    assert ollama_pool.ollama_pool("") is default_pool
+    assert ollama_pool.ollama_pool(default_pool.hosts[0].url + "/") is default_pool
+
+
+def test_direct_pools_are_reused_and_the_least_recently_used_is_closed(monkeypatch):
+    monkeypatch.setattr(ollama_pool, "OLLAMA_MAX_DIRECT_HOSTS", 2)
+    monkeypatch.setattr(ollama_pool, "_direct_pools", type(ollama_pool._direct_pools)())
+
+    async def run():
+        a = ollama_pool.ollama_pool("http://a:11434")
+        b = ollama_pool.ollama_pool("http://b:11434/")
+        assert ollama_pool.ollama_pool("http://a:11434/") is a
+        assert a.name == "http://a:11434"
+        # b is now the least recently used pool
+        ollama_pool.ollama_pool("http://c:11434")
+        assert list(ollama_pool._direct_pools) == ["http://a:11434", "http://c:11434"]
+        await asyncio.gather(*list(ollama_pool._closing))
+        return b
+
+    b = asyncio.run(run())
+    assert b.hosts[0].client._client.is_closed
+    assert "http://b:11434" not in clients._ollama_clients
@@ -0,0 +1,99 @@
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import http_utils
+from http_utils import brotli, compress_body, entity_tag, json_response, not_modified, select_fields
+
+
+PAYLOAD = {"summary": "A summary.", "model": "llama3.2:3b", "error": None}
+
+
+def test_select_fields():
+    assert select_fields(PAYLOAD, None) == PAYLOAD
+    assert select_fields(PAYLOAD, "summary") == {"summary": "A summary."}
+    assert select_fields(PAYLOAD, " model , summary") == {"model": "llama3.2:3b", "summary": "A summary."}
+
+
+def test_select_fields_keeps_error():
+    failed = {"summary": None, "model": None, "error": "Transcript not found for the specified language."}
+    assert select_fields(failed, "summary") == {"summary": None, "error": failed["error"]}
+    assert select_fields(failed, "error,summary") == {"error": failed["error"], "summary": None}
+
+
+def test_select_unknown_fields():
+    with pytest.raises(HTTPException) as raised:
+        select_fields(PAYLOAD, "summary,title")
+    assert raised.value.status_code == 400
+    assert "title" in raised.value.detail
+
+
+def request(**headers):
+    return SimpleNamespace(headers=headers)
+
+
+def test_entity_tags_depend_on_every_part():
+    tag = entity_tag("summary", "key", None)
+    assert tag.startswith('W/"')
+    assert tag == entity_tag("summary", "key", None)
+    assert tag != entity_tag("summary", "key", "summary")
+    assert tag != entity_tag("transcript", "key", None)
+
+
+def test_not_modified_compares_weakly():
+    tag = entity_tag("summary", "key")
+    assert not not_modified(request(), tag)
+    assert not_modified(request(**{"If-None-Match": tag}), tag)
+    assert not_modified(request(**{"If-None-Match": f'"other", {tag[2:]}'}), tag)
+    assert not_modified(request(**{"If-None-Match": "*"}), tag)
+    assert not not_modified(request(**{"If-None-Match": '"other"'}), tag)
+
+
+BODY = json.dumps({"transcript": "words " * 1000}).encode("utf-8")
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_compress_body_picks_the_best_accepted_encoding(accept, encoding):
+    if brotli is None and encoding == "br":
+        pytest.skip("Brotli is not installed")
+    body, used = asyncio.run(compress_body(request(**{"Accept-Encoding": accept}), BODY))
+    assert used == encoding
+    decompress = {"br": getattr(brotli, "decompress", None), "gzip": gzip.decompress, None: bytes}[encoding]
+    assert decompress(body) == BODY
+
+
+def test_small_bodies_are_not_compressed():
+    assert asyncio.run(compress_body(request(**{"Accept-Encoding": "gzip"}), b'{"summary":"short"}')) == (b'{"summary":"short"}', None)
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(http_utils, "COMPRESSION_THREAD_BYTES", 1024)
+    body, encoding = asyncio.run(compress_body(request(**{"Accept-Encoding": "gzip"}), BODY))
+    assert encoding == "gzip" and gzip.decompress(body) == BODY
+
+
+def test_json_response_selects_compresses_and_tags():
+    tag = entity_tag("summary", "key")
+    response = asyncio.run(json_response(request(**{"Accept-Encoding": "gzip"}), {**PAYLOAD, "summary": "x" * 2000}, "summary", tag))
+    assert response.headers["ETag"] == tag
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == {"summary": "x" * 2000}
+
+
+def test_json_response_answers_304_for_a_known_tag():
+    tag = entity_tag("summary", "key")
+    response = asyncio.run(json_response(request(**{"If-None-Match": tag}), PAYLOAD, None, tag))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == tag
@@ -0,0 +1,90 @@
+import asyncio
+
+from jobs import JobQueue
+
+
+async def wait_for(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def test_runs_higher_priorities_first():
+    order = []
+
+    async def run(job):
+        order.append(job.params["name"])
+        await asyncio.sleep(0.01)
+        return job.params["name"]
+
+    async def main():
+        queue = JobQueue(run)
+        jobs = [queue.submit("test", {"name": name}, "host", priority) for name, priority in [("a", 0), ("b", 0), ("c", 5)]]
+        await wait_for(lambda: all(job.finished for job in jobs))
+        await queue.stop()
+        return jobs
+
+    jobs = asyncio.run(main())
+    # All jobs are queued before the worker starts
+    assert order == ["c", "a", "b"]
+    assert [job.result for job in jobs] == ["a", "b", "c"]
+
+
+def test_bounds_jobs_per_host():
+    running = {"now": 0, "most": 0}
+
+    async def run(job):
+        running["now"] += 1
+        running["most"] = max(running["most"], running["now"])
+        await asyncio.sleep(0.02)
+        running["now"] -= 1
+
+    async def main():
+        queue = JobQueue(run, concurrency_for=lambda host: 2)
+        jobs = [queue.submit("test", {}, "host") for _ in range(6)]
+        await wait_for(lambda: all(job.finished for job in jobs))
+        await queue.stop()
+
+    asyncio.run(main())
+    assert running["most"] == 2
+
+
+def test_records_failures():
+    async def run(job):
+        raise RuntimeError("no transcript")
+
+    async def main():
+        queue = JobQueue(run)
+        job = queue.submit("test", {}, "host")
+        await wait_for(lambda: job.finished)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert (job.status, job.error) == ("failed", "no transcript")
+
+
+def test_drops_idle_hosts():
+    async def run(job):
+        await asyncio.sleep(0.05)
+
+    async def main():
+        queue = JobQueue(run, concurrency_for=lambda host: 3, idle_timeout=0.02)
+        jobs = [queue.submit("test", {}, f"http://host{number}:11434") for number in range(20)]
+        # A job running longer than the idle timeout keeps its host
+        await asyncio.sleep(0.03)
+        assert len(queue.stats()["queued_per_host"]) == 20
+        await wait_for(lambda: all(job.finished for job in jobs))
+        await wait_for(lambda: not queue.stats()["queued_per_host"])
+        workers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        # Hosts come back when they get jobs again
+        job = queue.submit("test", {}, "http://host0:11434")
+        await wait_for(lambda: job.finished)
+        await queue.stop()
+        return workers, job
+
+    workers, job = asyncio.run(main())
+    assert workers == []
+    assert job.status == "done"
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+import main
+import ollama_pool
+from ollama_pool import OllamaPool, keep_alive_for, normalize_model, parse_keep_alive
+
+
+class FakeClient:
+    def __init__(self, models=(), loaded=()):
+        self.models = list(models)
+        self.loaded = list(loaded)
+        self.generations = []
+        self.ps_calls = 0
+
+    async def generate(self, model, prompt, **kwargs):
+        self.generations.append((model, prompt, kwargs))
+        self.loaded.append(model)
+        return {"response": ""}
+
+    async def ps(self):
+        self.ps_calls += 1
+        return {"models": [{"model": model} for model in self.loaded]}
+
+
+def make_pool(client, **kwargs):
+    pool = OllamaPool(["http://keepalive:11434"], **kwargs)
+    pool.hosts[0].client = client
+    return pool
+
+
+def test_normalize_model():
+    assert normalize_model(" llama3.2 ") == "llama3.2:latest"
+    assert normalize_model("llama3.2:3b") == "llama3.2:3b"
+
+
+@pytest.mark.parametrize("value, expected", [("", None), ("  ", None), ("-1", -1.0), ("300", 300.0), ("30m", "30m")])
+def test_parse_keep_alive(value, expected):
+    assert parse_keep_alive(value) == expected
+
+
+def test_keep_alive_per_model(monkeypatch):
+    monkeypatch.setattr(ollama_pool, "MODEL_KEEP_ALIVE", "10m")
+    monkeypatch.setattr(ollama_pool, "MODEL_KEEP_ALIVE_OVERRIDES", {"qwen2.5:7b": "1h"})
+    monkeypatch.setattr(ollama_pool, "DEFAULT_MODEL", "llama3.2:3b")
+    assert keep_alive_for("qwen2.5:7b") == "1h"
+    assert keep_alive_for("llama3.2:3b") == -1
+    assert keep_alive_for("mistral:latest") == "10m"
+
+
+def test_generations_send_the_keep_alive_of_their_model(monkeypatch):
+    monkeypatch.setattr(ollama_pool, "MODEL_KEEP_ALIVE", "10m")
+    client = FakeClient()
+    pool = make_pool(client)
+    asyncio.run(pool.generate("m:latest", "hi"))
+    asyncio.run(pool.generate("m:latest", "hi", keep_alive=0))
+    assert [kwargs["keep_alive"] for _, _, kwargs in client.generations] == ["10m", 0]
+
+
+def test_warming_loads_available_models_not_loaded_yet():
+    client = FakeClient(loaded=["a:latest"])
+    pool = make_pool(client)
+    host = pool.hosts[0]
+    host.models = {"a:latest", "b:latest"}
+    host.loaded = {"a:latest"}
+    asyncio.run(pool.warm(["a:latest", "b:latest", "missing:latest"]))
+    assert client.generations == [("b:latest", "", {})]
+    assert host.loaded == {"a:latest", "b:latest"}
+
+
+def test_health_loop_preloads_once_and_keeps_pinned_models_loaded():
+    client = FakeClient()
+    pool = make_pool(client, health_interval=0.01, pinned=["pinned:latest"], preload=["preload:latest"])
+    pool.hosts[0].models = {"pinned:latest", "preload:latest"}
+
+    async def check_health():
+        await pool._list_host_loaded(pool.hosts[0])
+
+    pool.check_health = check_health
+
+    async def run():
+        pool.start()
+        await asyncio.sleep(0.05)
+        # Ollama unloads both models, only the pinned one is loaded again
+        client.loaded.clear()
+        await asyncio.sleep(0.05)
+        await pool.stop()
+
+    asyncio.run(run())
+    warmed = [model for model, _, _ in client.generations]
+    assert warmed.count("preload:latest") == 1
+    assert warmed.count("pinned:latest") == 2
+
+
+def test_loaded_models_are_cached_for_a_short_time():
+    client = FakeClient(loaded=["a:latest"])
+    pool = make_pool(client)
+
+    async def run():
+        first = await pool.loaded_models(max_age=60)
+        second = await pool.loaded_models(max_age=60)
+        third = await pool.loaded_models(max_age=0)
+        return first, second, third
+
+    assert asyncio.run(run()) == ({"a:latest"},) * 3
+    assert client.ps_calls == 2
+
+
+def test_select_model_prefers_the_default_then_a_loaded_model(monkeypatch):
+    client = FakeClient(loaded=["b:latest"])
+    pool = make_pool(client)
+    monkeypatch.setattr(main, "EMBEDDING_MODEL", "embed:latest")
+    monkeypatch.setattr(main, "DEFAULT_MODEL", "c:latest")
+    assert asyncio.run(main.select_model(pool, ["a:latest", "b:latest", "c:latest"])) == "c:latest"
+    monkeypatch.setattr(main, "DEFAULT_MODEL", None)
+    assert asyncio.run(main.select_model(pool, ["a:latest", "b:latest"])) == "b:latest"
+    assert asyncio.run(main.select_model(pool, ["embed:latest", "a:latest"])) == "a:latest"
+    assert asyncio.run(main.select_model(pool, ["embed:latest"])) == "embed:latest"
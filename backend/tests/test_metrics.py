@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+from metrics import observe_generation, record_timing, server_timing_header, stage, start_request_timings
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stages_are_summed_per_request():
+    async def request():
+        timings = start_request_timings()
+        with stage("transcript"):
+            time.sleep(0.01)
+        with stage("transcript"):
+            pass
+        record_timing("ollama_eval", 0.5)
+        return timings
+
+    before = sample("yt_tldr_stage_seconds_count", stage="transcript")
+    timings = asyncio.run(request())
+    assert set(timings) == {"transcript", "ollama_eval"}
+    assert timings["transcript"] >= 0.01
+    assert sample("yt_tldr_stage_seconds_count", stage="transcript") == before + 2
+
+
+def test_concurrent_requests_keep_their_own_timings():
+    async def request(name):
+        timings = start_request_timings()
+        await asyncio.sleep(0)
+        with stage(name):
+            await asyncio.sleep(0.01)
+        return timings
+
+    async def run():
+        return await asyncio.gather(request("oembed"), request("model_list"))
+
+    first, second = asyncio.run(run())
+    assert set(first) == {"oembed"}
+    assert set(second) == {"model_list"}
+
+
+def test_server_timing_header():
+    assert server_timing_header({"transcript": 0.0123, "total": 1.5}) == "transcript;dur=12.3, total;dur=1500.0"
+
+
+def test_observe_generation_records_ollama_timings():
+    model = "metrics-test:latest"
+
+    async def request():
+        timings = start_request_timings()
+        observe_generation(model, {
+            "load_duration": 1_000_000_000, "prompt_eval_duration": 500_000_000, "prompt_eval_count": 1000,
+            "eval_duration": 2_000_000_000, "eval_count": 100,
+        })
+        return timings
+
+    timings = asyncio.run(request())
+    assert timings == {"ollama_load": 1.0, "ollama_prompt_eval": 0.5, "ollama_eval": 2.0}
+    assert sample("yt_tldr_ollama_prompt_tokens_total", model=model) == 1000
+    assert sample("yt_tldr_ollama_eval_tokens_total", model=model) == 100
+    assert sample("yt_tldr_ollama_tokens_per_second_sum", model=model) == 50.0
+    assert sample("yt_tldr_ollama_prompt_tokens_per_second_sum", model=model) == 2000.0
+
+
+def test_observe_generation_tolerates_missing_fields():
+    observe_generation("metrics-test:latest", {"response": "streamed without timings"})
+    observe_generation("metrics-test:latest", None)
+
+
+def test_responses_carry_server_timing_and_are_counted():
+    client = TestClient(main.app)
+    response = client.get("/cache_stats")
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+    metrics = client.get("/metrics").text
+    assert 'yt_tldr_request_seconds_count{method="GET",route="/cache_stats",status="200"}' in metrics
@@ -0,0 +1,132 @@
+import asyncio
+
+import httpx
+import ollama
+import pytest
+
+from ollama_pool import OllamaPool
+
+
+class FakeClient:
+    """
+    Stands in for ollama.AsyncClient, answering with the name of its host or raising `error`.
+    """
+
+    def __init__(self, name, models=(), loaded=(), error=None):
+        self.name = name
+        self.models = list(models)
+        self.loaded = list(loaded)
+        self.error = error
+        self.calls = []
+
+    async def generate(self, model, prompt, stream=False, **kwargs):
+        self.calls.append((model, prompt, kwargs))
+        if self.error is not None:
+            raise self.error
+        if stream:
+            return self._stream()
+        return {"response": self.name}
+
+    async def _stream(self):
+        for token in ("a", "b"):
+            yield {"response": f"{self.name}:{token}"}
+
+    async def list(self):
+        if self.error is not None:
+            raise self.error
+        return {"models": [{"model": model} for model in self.models]}
+
+    async def ps(self):
+        return {"models": [{"model": model} for model in self.loaded]}
+
+
+def make_pool(*clients):
+    pool = OllamaPool([f"http://{client.name}:11434" for client in clients])
+    for host, client in zip(pool.hosts, clients):
+        host.client = client
+    return pool
+
+
+def test_hosts_are_deduplicated_and_normalized():
+    pool = OllamaPool(["http://a:11434/", "http://a:11434", "http://b:11434"])
+    assert pool.name == "http://a:11434,http://b:11434"
+    assert "http://b:11434" in pool
+
+
+def test_requests_go_to_the_host_with_the_fewest_outstanding():
+    pool = make_pool(FakeClient("a"), FakeClient("b"))
+    pool.hosts[0].outstanding = 2
+    assert asyncio.run(pool.generate("m:latest", "hi"))["response"] == "b"
+
+
+def test_hosts_with_the_model_loaded_are_preferred():
+    pool = make_pool(FakeClient("a"), FakeClient("b"))
+    pool.hosts[1].loaded = {"m:latest"}
+    pool.hosts[1].outstanding = 3
+    assert asyncio.run(pool.generate("m:latest", "hi"))["response"] == "b"
+
+
+def test_hosts_without_the_model_are_skipped():
+    pool = make_pool(FakeClient("a"), FakeClient("b"))
+    pool.hosts[0].models = {"other:latest"}
+    pool.hosts[1].models = {"m:latest"}
+    assert [host.url for host in pool.candidates("m:latest")] == ["http://b:11434"]
+    # If no host has the model, all of them are tried
+    assert len(pool.candidates("missing:latest")) == 2
+
+
+def test_fails_over_and_marks_unreachable_hosts_unhealthy():
+    pool = make_pool(FakeClient("a", error=httpx.ConnectError("refused")), FakeClient("b"))
+    pool.hosts[1].outstanding = 1
+    assert asyncio.run(pool.generate("m:latest", "hi"))["response"] == "b"
+    assert not pool.hosts[0].healthy
+    assert pool.hosts[0].failures == 1
+    assert "m:latest" in pool.hosts[1].loaded
+    # The unhealthy host is tried last from now on
+    assert pool.candidates("m:latest")[0].url == "http://b:11434"
+
+
+def test_ollama_errors_keep_the_host_healthy():
+    pool = make_pool(FakeClient("a", error=ollama.ResponseError("model not found")))
+    with pytest.raises(ollama.ResponseError):
+        asyncio.run(pool.generate("m:latest", "hi"))
+    assert pool.hosts[0].healthy
+    assert pool.hosts[0].outstanding == 0
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    pool = make_pool(FakeClient("a", error=httpx.ConnectError("refused")), FakeClient("b"))
+
+    async def run():
+        return [chunk["response"] async for chunk in pool.stream_generate("m:latest", "hi")]
+
+    assert asyncio.run(run()) == ["b:a", "b:b"]
+
+
+def test_list_models_merges_reachable_hosts():
+    pool = make_pool(
+        FakeClient("a", models=["m:latest", "n:latest"]),
+        FakeClient("b", models=["n:latest", "o:latest"]),
+        FakeClient("c", error=httpx.ConnectError("refused")),
+    )
+    assert asyncio.run(pool.list_models()) == ["m:latest", "n:latest", "o:latest"]
+    assert pool.hosts[0].models == {"m:latest", "n:latest"}
+    assert not pool.hosts[2].healthy
+
+
+def test_list_models_raises_if_no_host_is_reachable():
+    pool = make_pool(FakeClient("a", error=httpx.ConnectError("refused")))
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(pool.list_models())
+
+
+def test_health_check_recovers_hosts_and_reads_loaded_models():
+    client = FakeClient("a", models=["m:latest"], loaded=["m:latest"])
+    pool = make_pool(client)
+    pool.hosts[0].healthy = False
+    asyncio.run(pool.check_health())
+    host = pool.hosts[0]
+    assert host.healthy
+    assert host.models == {"m:latest"}
+    assert host.loaded == {"m:latest"}
+    assert host.last_checked is not None
@@ -0,0 +1,148 @@
+import asyncio
+
+import main
+from admission import AdmissionController
+from prewarm import Prewarmer
+
+
+class Watch:
+    """
+    A watch list and a record of the warmed videos, video IDs starting with "fail" fail to warm.
+    """
+
+    def __init__(self, *video_ids):
+        self.video_ids = list(video_ids)
+        self.warmed = []
+        self.busy = False
+
+    async def list_videos(self):
+        if isinstance(self.video_ids, Exception):
+            raise self.video_ids
+        return self.video_ids
+
+    async def warm(self, video_id):
+        self.warmed.append(video_id)
+        if video_id.startswith("fail"):
+            raise RuntimeError("No transcript available.")
+
+    def prewarmer(self, **kwargs):
+        return Prewarmer(self.list_videos, self.warm, lambda: self.busy, idle_seconds=0, poll_interval=0.01, **kwargs)
+
+
+def test_rounds_warm_each_video_once():
+    watch = Watch("a", "b", "a")
+    prewarmer = watch.prewarmer()
+    asyncio.run(prewarmer.run_round())
+    watch.video_ids.insert(0, "c")
+    asyncio.run(prewarmer.run_round())
+    assert watch.warmed == ["a", "b", "c"]
+    assert list(prewarmer.warmed) == ["a", "b", "c"]
+    assert prewarmer.last_round is not None and prewarmer.pending == []
+
+
+def test_failures_are_recorded_and_retried_next_round():
+    watch = Watch("failing", "b")
+    prewarmer = watch.prewarmer()
+    asyncio.run(prewarmer.run_round())
+    assert prewarmer.failed == {"failing": "No transcript available."}
+    assert list(prewarmer.warmed) == ["b"]
+    asyncio.run(prewarmer.run_round())
+    assert watch.warmed == ["failing", "b", "failing"]
+    # Failures of videos no longer watched are forgotten
+    watch.video_ids = ["b"]
+    asyncio.run(prewarmer.run_round())
+    assert prewarmer.failed == {}
+
+
+def test_rounds_are_bounded():
+    watch = Watch(*"abcde")
+    prewarmer = watch.prewarmer(max_videos=2)
+    asyncio.run(prewarmer.run_round())
+    asyncio.run(prewarmer.run_round())
+    assert watch.warmed == list("abcd")
+
+
+def test_listing_errors_end_the_round():
+    watch = Watch()
+    watch.video_ids = ConnectionError("feed unreachable")
+    prewarmer = watch.prewarmer()
+    asyncio.run(prewarmer.run_round())
+    assert "feed unreachable" in prewarmer.last_error
+    assert prewarmer.last_round is None
+
+
+def test_warming_waits_for_live_traffic_and_generations_to_end():
+    watch = Watch("a")
+    prewarmer = watch.prewarmer()
+    prewarmer.idle_seconds = 0.05
+    watch.busy = True
+
+    async def run():
+        prewarmer.note_activity()
+        round_ = asyncio.ensure_future(prewarmer.run_round())
+        await asyncio.sleep(0.1)
+        # Idle long enough, but a generation is still running
+        assert watch.warmed == [] and prewarmer.state == "waiting_for_idle"
+        watch.busy = False
+        await round_
+
+    asyncio.run(run())
+    assert watch.warmed == ["a"]
+    assert prewarmer.deferred == 1
+
+
+def test_start_and_stop():
+    watch = Watch("a")
+    prewarmer = watch.prewarmer(interval=60)
+
+    async def run():
+        prewarmer.start()
+        await asyncio.sleep(0.05)
+        state = prewarmer.state
+        await prewarmer.stop()
+        return state
+
+    assert asyncio.run(run()) == "sleeping"
+    assert prewarmer.state == "stopped"
+    assert watch.warmed == ["a"]
+
+
+def test_watch_lists_accept_ids_and_urls(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "PREWARM_FEED_URLS", [])
+    monkeypatch.setattr(main, "PREWARM_WATCH_LIST", "aaaaaaaaaaa, https://youtu.be/bbbbbbbbbbb,not a video")
+    assert asyncio.run(main.prewarm_video_ids()) == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+
+    watch_list = tmp_path / "watch.txt"
+    watch_list.write_text("# talks\nccccccccccc\n\nhttps://www.youtube.com/watch?v=ddddddddddd\n", encoding="utf-8")
+    monkeypatch.setattr(main, "PREWARM_WATCH_LIST", str(watch_list))
+    assert asyncio.run(main.prewarm_video_ids()) == ["ccccccccccc", "ddddddddddd"]
+
+
+def test_warmed_summaries_serve_default_requests(monkeypatch):
+    segments = [{"text": "a talk about pre-warming", "start": 0.0, "duration": 2.0}]
+    prompts = []
+
+    async def load_video_metadata(video_id):
+        return main.VideoMetadata(title="A talk", thumbnail_url="", supported_languages=[{"code": "de", "name": "German"}])
+
+    async def prepare_summary_request(pool, youtube_video_id, language, model, summary_profile):
+        return main.SummaryInput(segments, segments[0]["text"], segments[0]["text"], model or "llama3.2:3b", summary_profile)
+
+    async def generate(model, prompt, options=None):
+        prompts.append(prompt)
+        return {"response": "The warmed summary."}
+
+    monkeypatch.setattr(main, "load_video_metadata", load_video_metadata)
+    monkeypatch.setattr(main, "prepare_summary_request", prepare_summary_request)
+    monkeypatch.setattr(main.default_pool, "generate", generate)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=1, max_queue=1))
+    main.summary_cache.clear()
+    try:
+        asyncio.run(main.prewarm_video("prewarmvid1"))
+        # The first transcript language, the default profile and the backend's default prompt
+        assert len(prompts) == 1 and "short-code: de" in prompts[0]
+        response = asyncio.run(main.summarize_video(main.default_pool, "prewarmvid1", "de", None, None))
+        assert response.summary == "The warmed summary."
+        assert len(prompts) == 1
+    finally:
+        main.summary_cache.clear()
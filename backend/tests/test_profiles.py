@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+from profiles import CHUNKED, FULL, PROMPT_OVERHEAD_TOKENS, SAMPLE, SUMMARY_PROFILES, SummaryProfile, sample_segments
+from segment_store import CompactTranscript
+
+
+client = TestClient(main.app)
+
+
+def test_resolve_profile():
+    assert main.resolve_profile(None).name == main.resolve_profile("").name
+    assert main.resolve_profile("quick").name == "quick"
+    with pytest.raises(HTTPException) as raised:
+        main.resolve_profile("unknown")
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/batch_summary", "/jobs/summary"])
+def test_unknown_profiles_are_rejected_up_front(path):
+    body = {"video_ids": ["dQw4w9WgXcQ"]} if path == "/batch_summary" else {"video_id": "dQw4w9WgXcQ"}
+    response = client.post(path, json={**body, "profile": "unknown"})
+    assert response.status_code == 400
+    assert "unknown" in response.json()["detail"]
+
+
+def profile(strategy, **kwargs):
+    return SummaryProfile("test", "A test profile.", latency_target=10, num_ctx=kwargs.pop("num_ctx", 4096), num_predict=256, transcript_strategy=strategy, **kwargs)
+
+
+def test_transcript_budget_leaves_room_for_prompt_and_output():
+    assert profile(FULL).transcript_budget() == 4096 - 256 - PROMPT_OVERHEAD_TOKENS
+    assert profile(FULL).transcript_budget(max_ctx=2048) == 2048 - 256 - PROMPT_OVERHEAD_TOKENS
+    assert profile(SAMPLE, transcript_tokens=500).transcript_budget() == 500
+    assert profile(FULL, num_ctx=256).transcript_budget() == 1
+
+
+def test_sample_keeps_the_beginning_and_the_end():
+    segments = [{"text": "x" * 36, "start": float(number), "duration": 1.0} for number in range(100)]
+    assert sample_segments(segments, 10000) is segments
+    sampled = sample_segments(segments, 300)
+    gap = next(index for index, segment in enumerate(sampled) if segment["text"] == "...")
+    head, tail = sampled[:gap], sampled[gap + 1:]
+    assert head == segments[:len(head)]
+    assert tail == segments[-len(tail):]
+    assert len(head) == 2 * len(tail)
+    assert sampled[gap]["start"] == tail[0]["start"]
+
+
+@pytest.mark.parametrize("strategy, compacted_tokens, expected", [
+    (SAMPLE, 100000, False),
+    (FULL, 1000, False),
+    (FULL, 100000, True),
+    (CHUNKED, main.LONG_TRANSCRIPT_THRESHOLD_TOKENS - 10, False),
+    (CHUNKED, main.LONG_TRANSCRIPT_THRESHOLD_TOKENS + 10, True),
+])
+def test_uses_map_reduce(strategy, compacted_tokens, expected):
+    text = "x" * int(compacted_tokens * 4)
+    summary_input = main.SummaryInput([], text, text, "unknown:latest", profile(strategy, transcript_tokens=500))
+    assert main.uses_map_reduce(summary_input) is expected
+
+
+def test_generations_are_bounded_by_the_profile():
+    quick = SUMMARY_PROFILES["quick"]
+    options = main.generation_options("llama3.2:3b", "a short prompt", quick)
+    assert options["num_predict"] == quick.num_predict
+    assert options["stop"] == quick.stop
+    assert options["num_ctx"] <= max(main.NUM_CTX_MIN, quick.num_ctx)
+    assert "stop" not in main.generation_options("llama3.2:3b", "a short prompt", SUMMARY_PROFILES["deep"])
+
+
+def test_profiles_use_their_preferred_model_if_installed(monkeypatch):
+    segments = [{"text": "a talk about latency", "start": 0.0, "duration": 2.0}]
+
+    async def fetch_transcript(video_id, language):
+        return CompactTranscript.from_segments(segments)
+
+    async def available_models(pool, required=None):
+        return ["llama3.2:1b", "llama3.2:3b"]
+
+    async def select_model(pool, models):
+        return "llama3.2:3b"
+
+    monkeypatch.setattr(main, "fetch_transcript", fetch_transcript)
+    monkeypatch.setattr(main, "available_models", available_models)
+    monkeypatch.setattr(main, "select_model", select_model)
+
+    def model_for(summary_profile, model=None):
+        return asyncio.run(main.prepare_summary_request(main.default_pool, "profilevid1", "en", model, summary_profile)).model
+
+    assert model_for(profile(FULL, model="llama3.2:1b")) == "llama3.2:1b"
+    assert model_for(profile(FULL, model="qwen2.5:14b")) == "llama3.2:3b"
+    assert model_for(profile(FULL, model="llama3.2:1b"), "mistral:7b") == "mistral:7b"
@@ -0,0 +1,166 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import main
+from admission import AdmissionController
+from retrieval import EmbeddingIndex, EmbeddingIndexStore, format_passage, index_key, normalize, retrieval_chunks
+
+
+CHUNKS = [{"start": float(number * 60), "end": float(number * 60 + 60), "text": f"passage {number}"} for number in range(4)]
+EMBEDDINGS = [[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [0.0, 0.0, 3.0], [1.0, 1.0, 0.0]]
+
+
+def test_chunks_carry_the_time_range_of_their_segments():
+    segments = [{"text": f" caption {number} ", "start": number * 5.0, "duration": 4.0} for number in range(10)]
+    chunks = retrieval_chunks(segments, 20)
+    assert len(chunks) > 1
+    assert chunks[0]["start"] == 0.0
+    assert chunks[-1]["end"] == 49.0
+    assert chunks[0]["text"].startswith("caption 0 caption 1")
+    assert format_passage({"start": 65, "end": 3725, "text": "hello"}) == "[01:05 - 1:02:05] hello"
+
+
+def test_index_keys_separate_models_and_chunking():
+    key = index_key("video", "en", "nomic-embed-text", 256, True)
+    assert key == index_key("video", "en", "nomic-embed-text", 256, True)
+    assert key != index_key("video", "en", "nomic-embed-text", 512, True)
+    assert key != index_key("video", "en", "mxbai-embed-large", 256, True)
+    assert key.split("-")[0] == index_key("video", "de", "mxbai-embed-large", 512, False).split("-")[0]
+
+
+def test_search_returns_the_best_passages_in_transcript_order():
+    index = EmbeddingIndex(CHUNKS, normalize(np.asarray(EMBEDDINGS, dtype=np.float32)).astype(np.float16))
+    results = index.search([0.0, 1.0, 0.1], top_k=2)
+    assert [chunk["text"] for _, chunk in results] == ["passage 1", "passage 3"]
+    assert results[0][0] == pytest.approx(0.995, abs=0.01)
+    assert len(index.search([1.0, 0.0, 0.0], top_k=10)) == 4
+    assert EmbeddingIndex([], np.zeros((0, 3), dtype=np.float16)).search([1.0, 0.0, 0.0], top_k=3) == []
+
+
+def test_saved_indexes_are_memory_mapped_and_reloaded(tmp_path):
+    store = EmbeddingIndexStore(str(tmp_path))
+    key = index_key("video", "en", "nomic-embed-text", 256, True)
+    assert store.get(key) is None
+    saved = store.save(key, CHUNKS, EMBEDDINGS)
+    assert isinstance(saved.vectors, np.memmap)
+    assert saved.vectors.dtype == np.float16
+    assert np.allclose(np.linalg.norm(saved.vectors.astype(np.float32), axis=1), 1.0, atol=1e-3)
+
+    reopened = EmbeddingIndexStore(str(tmp_path)).get(key)
+    assert reopened.chunks == CHUNKS
+    assert [chunk["text"] for _, chunk in reopened.search([0.0, 0.0, 1.0], top_k=1)] == ["passage 2"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_expired_indexes_are_dropped(tmp_path):
+    store = EmbeddingIndexStore(str(tmp_path), ttl=60)
+    key = index_key("video", "en", "nomic-embed-text", 256, True)
+    store.save(key, CHUNKS, EMBEDDINGS)
+    matrix_path = os.path.join(tmp_path, key + ".npy")
+    built = os.path.getmtime(matrix_path) - 120
+    os.utime(matrix_path, (built, built))
+    assert store.get(key) is None
+    assert store.stats()["entries"] == 0
+
+
+def test_least_recently_used_indexes_are_evicted_beyond_the_size_limit(tmp_path):
+    store = EmbeddingIndexStore(str(tmp_path))
+    keys = [index_key(f"video{number}", "en", "nomic-embed-text", 256, True) for number in range(3)]
+    store.save(keys[0], CHUNKS, EMBEDDINGS)
+    size = store.stats()["size_bytes"]
+    store.max_bytes = 2 * size
+    store.save(keys[1], CHUNKS, EMBEDDINGS)
+    # The first index was used last, so the second one is evicted
+    for age, key in ((20, keys[1]), (10, keys[0])):
+        used = os.path.getmtime(os.path.join(tmp_path, key + ".json")) - age
+        os.utime(os.path.join(tmp_path, key + ".json"), (used, used))
+    store.save(keys[2], CHUNKS, EMBEDDINGS)
+    assert store.get(keys[1]) is None
+    assert store.get(keys[0]) is not None and store.get(keys[2]) is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_indexes_are_deleted_per_video(tmp_path):
+    store = EmbeddingIndexStore(str(tmp_path))
+    kept = index_key("other", "en", "nomic-embed-text", 256, True)
+    store.save(index_key("video", "en", "nomic-embed-text", 256, True), CHUNKS, EMBEDDINGS)
+    store.save(index_key("video", "de", "nomic-embed-text", 256, True), CHUNKS, EMBEDDINGS)
+    store.save(kept, CHUNKS, EMBEDDINGS)
+    store.delete_video("video")
+    assert store.stats()["entries"] == 1
+    assert store.get(kept) is not None
+    store.clear()
+    assert store.stats()["entries"] == 0
+
+
+WORDS = ["sqlite", "caching", "latency", "tokens"]
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """
+    Fakes transcripts and Ollama: every passage is about one word, embedded as a one-hot vector of it.
+    """
+    calls = {"transcripts": 0, "embedded": [], "prompts": []}
+    segments = [{"text": f"this part is about {word}", "start": number * 60.0, "duration": 60.0} for number, word in enumerate(WORDS)]
+
+    async def fetch_transcript_segments(video_id, language):
+        calls["transcripts"] += 1
+        await asyncio.sleep(0.01)
+        return segments
+
+    async def embed(model, inputs):
+        calls["embedded"] += inputs
+        return [[float(word in text) for word in WORDS] for text in inputs]
+
+    async def generate_text(pool, model, prompt):
+        calls["prompts"].append(prompt)
+        return "The answer."
+
+    monkeypatch.setattr(main, "fetch_transcript_segments", fetch_transcript_segments)
+    monkeypatch.setattr(main.default_pool, "embed", embed)
+    monkeypatch.setattr(main, "generate_text", generate_text)
+    monkeypatch.setattr(main, "RETRIEVAL_CHUNK_TOKENS", 8)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=4, max_queue=4))
+    main.embedding_indexes.clear()
+    yield calls
+    main.embedding_indexes.clear()
+
+
+def ask(question, video_id="questionvid", top_k=1):
+    request = main.VideoQuestionRequest(question=question, model="llama3.2:3b", top_k=top_k)
+    return main.answer_video_question(video_id, request, SimpleNamespace(client=None), None)
+
+
+def test_questions_are_answered_from_the_most_similar_passages(ollama):
+    response = asyncio.run(ask("How does caching help?"))
+    assert response.answer == "The answer."
+    assert [source.text for source in response.sources] == ["this part is about caching"]
+    assert response.sources[0].timestamp == "01:00"
+    assert response.passages == 4 and response.index_cached is False
+    assert "[01:00 - 02:00] this part is about caching" in ollama["prompts"][0]
+    assert "sqlite" not in ollama["prompts"][0]
+
+
+def test_the_index_is_built_once_and_reused(ollama):
+    async def run():
+        return await asyncio.gather(ask("What about latency?"), ask("And tokens?"))
+
+    asyncio.run(run())
+    later = asyncio.run(ask("And sqlite?"))
+    assert ollama["transcripts"] == 1
+    # The passages are embedded once, every question once
+    assert len(ollama["embedded"]) == 4 + 3
+    assert later.index_cached is True
+    assert [source.text for source in later.sources] == ["this part is about sqlite"]
+
+
+def test_empty_questions_are_rejected(ollama):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(ask("   "))
+    assert error.value.status_code == 400
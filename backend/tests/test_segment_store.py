@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from segment_store import CompactTranscript, SegmentStore, fts_query
+
+
+SEGMENTS = [
+    {"text": "hello world", "start": 0.0, "duration": 2.0},
+    {"text": "grüße aus köln", "start": 2.0, "duration": 1.5},
+    {"text": "the quick brown fox", "start": 5.0, "duration": 3.0},
+    {"text": "jumps over the lazy dog", "start": 8.0, "duration": 2.0},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SegmentStore(str(tmp_path / "segments.sqlite3"), max_bytes=1024 * 1024)
+
+
+def test_text_slices_segments():
+    transcript = CompactTranscript.from_segments(SEGMENTS)
+    assert len(transcript) == 4
+    assert transcript.text() == "hello world grüße aus köln the quick brown fox jumps over the lazy dog"
+    assert transcript.text(1, 2) == "grüße aus köln"
+    assert transcript.text(2, 4) == "the quick brown fox jumps over the lazy dog"
+    assert transcript.text(3, 3) == ""
+
+
+def test_from_segments_sorts_by_start():
+    transcript = CompactTranscript.from_segments(list(reversed(SEGMENTS)))
+    assert transcript.text(0, 1) == "hello world"
+    assert transcript.segments() == [{"text": s["text"], "start": s["start"], "duration": s["duration"]} for s in SEGMENTS]
+
+
+@pytest.mark.parametrize("start_ms, end_ms, span", [
+    (None, None, (0, 4)),
+    (0, None, (0, 4)),
+    (1000, None, (0, 4)),  # The first segment is still being spoken
+    (2000, None, (1, 4)),
+    (4000, None, (2, 4)),  # Between segments
+    (None, 5000, (0, 2)),
+    (1000, 6000, (0, 3)),
+    (20000, None, (4, 4)),
+    (6000, 7000, (2, 3)),  # Inside one segment
+])
+def test_span(start_ms, end_ms, span):
+    assert CompactTranscript.from_segments(SEGMENTS).span(start_ms, end_ms) == span
+
+
+def test_span_of_empty_transcript():
+    assert CompactTranscript.from_segments([]).span(1000, 2000) == (0, 0)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("hello world", '"hello" "world"'),
+    ('"quick brown" fox', '"quick brown" "fox"'),
+    ("fox* OR dog", '"fox" "OR" "dog"'),
+    ('"" ...', ""),
+    ("Köln", '"Köln"'),
+])
+def test_fts_query(query, expected):
+    assert fts_query(query) == expected
+
+
+def test_put_and_get(store):
+    assert store.get("video", "en") is None
+    stored = store.put("video", "en", SEGMENTS)
+    transcript = store.get("video", "en")
+    assert transcript.text() == stored.text()
+    assert transcript.segments() == stored.segments()
+    assert store.get("video", "de") is None
+    assert (store.stats()["hits"], store.stats()["misses"]) == (1, 2)
+
+
+def test_put_replaces_transcript_and_postings(store):
+    store.put("video", "en", SEGMENTS)
+    store.put("video", "en", [{"text": "something else", "start": 0.0, "duration": 1.0}])
+    assert store.get("video", "en").text() == "something else"
+    assert store.search(fts_query("fox")) == []
+    assert store.stats()["entries"] == 1
+
+
+def test_search(store):
+    store.put("video", "en", SEGMENTS)
+    store.put("other", "de", [{"text": "der fuchs und der hund", "start": 3.0, "duration": 2.0}])
+    results = store.search(fts_query("lazy dog"))
+    assert [(result["video_id"], result["language"]) for result in results] == [("video", "en")]
+    assert results[0]["matches"] == [{"start_ms": 8000, "end_ms": 10000, "text": "jumps over the lazy dog"}]
+    assert store.search(fts_query('"dog lazy"')) == []
+    # Diacritics are ignored
+    assert store.search(fts_query("koln"))[0]["matches"][0]["start_ms"] == 2000
+    assert store.search(fts_query("the"), language="de") == []
+    assert store.search(fts_query("der"), video_id="video") == []
+
+
+def test_search_limits(store):
+    for number in range(3):
+        store.put(f"video{number}", "en", SEGMENTS)
+    results = store.search(fts_query("the"), max_videos=2, max_matches=1)
+    assert len(results) == 2
+    assert all(len(result["matches"]) == 1 for result in results)
+
+
+def test_evicts_least_recently_used(store):
+    store.put("first", "en", SEGMENTS)
+    store.put("second", "en", SEGMENTS)
+    store.get("first", "en")
+    store.max_bytes = store.stats()["size_bytes"]
+    store.put("third", "en", SEGMENTS)
+    assert store.get("second", "en") is None
+    assert store.get("first", "en") is not None
+    assert store.get("third", "en") is not None
+    assert {result["video_id"] for result in store.search(fts_query("fox"))} == {"first", "third"}
+
+
+def test_expired_transcripts_are_missing(store):
+    store.put("video", "en", SEGMENTS)
+    store.ttl = 0.01
+    time.sleep(0.02)
+    assert store.get("video", "en") is None
+    assert store.search(fts_query("fox")) == []
+
+
+def test_delete_and_clear(store):
+    store.put("video", "en", SEGMENTS)
+    store.put("video", "de", SEGMENTS)
+    store.put("other", "en", SEGMENTS)
+    store.delete("video")
+    assert store.get("video", "de") is None
+    assert [result["video_id"] for result in store.search(fts_query("fox"))] == ["other"]
+    store.clear()
+    assert store.stats()["entries"] == 0
+    assert store.search(fts_query("fox")) == []
@@ -0,0 +1,136 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from admission import AdmissionController
+from sessions import AnalysisSession, SessionStore
+
+
+SEGMENTS = [{"text": "today we talk about kv caches", "start": 0.0, "duration": 3.0}]
+
+
+def session(video_id="sessionvid1"):
+    return AnalysisSession(video_id, "en", "llama3.2:3b", "transcript", num_ctx=2048)
+
+
+def test_history_pairs_questions_and_answers():
+    s = session()
+    s.messages += [
+        {"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"},
+        {"role": "user", "content": "q2"}, {"role": "assistant", "content": "a2"},
+    ]
+    assert s.history() == [{"question": "q1", "answer": "a1"}, {"question": "q2", "answer": "a2"}]
+    assert s.drop_oldest_turn()
+    assert s.history() == [{"question": "q2", "answer": "a2"}]
+    assert s.drop_oldest_turn()
+    # The transcript is never dropped
+    assert not s.drop_oldest_turn()
+    assert s.messages == [{"role": "system", "content": "transcript"}]
+
+
+def test_store_drops_the_least_recently_used_session():
+    store = SessionStore(ttl=60, max_sessions=2)
+    first, second, third = session(), session(), session()
+    store.add(first)
+    store.add(second)
+    store.get(first.id)
+    store.add(third)
+    assert store.get(second.id) is None
+    assert store.get(first.id) is first
+    assert store.delete(third.id)
+    assert not store.delete(third.id)
+
+
+def test_store_expires_unused_sessions():
+    store = SessionStore(ttl=60)
+    s = store.add(session())
+    s.last_used -= 61
+    assert store.get(s.id) is None
+    assert store.stats()["sessions"] == 0
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    """
+    Fakes transcripts and Ollama's chat API, records the messages and preferred host of every chat.
+    """
+    calls = []
+
+    async def prepare_summary_request(pool, youtube_video_id, language, model, summary_profile=None):
+        assert summary_profile is None
+        return main.SummaryInput(SEGMENTS, SEGMENTS[0]["text"], SEGMENTS[0]["text"], model or "llama3.2:3b")
+
+    async def chat(model, messages, prefer=None, **kwargs):
+        calls.append({"messages": list(messages), "prefer": prefer, "options": kwargs.get("options")})
+        response = {"message": {"content": f"Answer {len(calls)}"}, "prompt_eval_count": 7, "eval_duration": 2_000_000}
+        return response, "http://host-b:11434"
+
+    monkeypatch.setattr(main, "prepare_summary_request", prepare_summary_request)
+    monkeypatch.setattr(main.default_pool, "chat", chat)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=2, max_queue=4))
+    return calls
+
+
+REQUEST = SimpleNamespace(client=None)
+
+
+def create():
+    return asyncio.run(main.create_analysis_session(main.AnalysisSessionRequest(video_id="sessionvid1"), REQUEST, None))
+
+
+def ask(session_id, **kwargs):
+    return asyncio.run(main.ask_analysis_question(session_id, main.AnalysisQuestionRequest(**kwargs), REQUEST))
+
+
+def test_the_transcript_is_evaluated_when_the_session_is_created(chats):
+    response = create()
+    assert response.error is None
+    assert response.model == "llama3.2:3b"
+    assert response.num_ctx == main.context_window(
+        main.estimate_tokens(main.analysis_system_prompt(SEGMENTS[0]["text"], "en"), "llama3.2:3b") + main.ANALYSIS_HISTORY_TOKENS,
+        main.SUMMARY_OUTPUT_TOKENS, main.NUM_CTX_MIN, main.NUM_CTX_MAX,
+    )
+    assert chats[0]["messages"][0]["role"] == "system"
+    assert SEGMENTS[0]["text"] in chats[0]["messages"][0]["content"]
+    assert chats[0]["options"] == {"num_ctx": response.num_ctx, "num_predict": 1}
+
+
+def test_follow_up_questions_extend_the_conversation_on_the_same_host(chats):
+    session_id = create().session_id
+    first = ask(session_id, question="What is a KV cache?")
+    second = ask(session_id, preset="takeaways")
+    assert (first.answer, second.answer) == ("Answer 2", "Answer 3")
+    assert second.question == main.ANALYSIS_PRESETS["takeaways"]
+    assert second.prompt_eval_count == 7 and second.eval_ms == 2.0
+    # Every question goes to the host holding the conversation, with the earlier turns as prefix
+    assert chats[2]["prefer"] == "http://host-b:11434"
+    assert chats[2]["messages"][:3] == chats[1]["messages"] + [{"role": "assistant", "content": "Answer 2"}]
+    history = asyncio.run(main.get_analysis_session_status(session_id)).history
+    assert [turn["answer"] for turn in history] == ["Answer 2", "Answer 3"]
+
+
+def test_old_turns_are_dropped_when_the_conversation_outgrows_the_context(chats):
+    session_id = create().session_id
+    s = main.analysis_sessions.get(session_id)
+    s.messages += [{"role": "user", "content": "x" * 4 * s.num_ctx}, {"role": "assistant", "content": "long answer"}]
+    ask(session_id, question="And now?")
+    assert [message["content"] for message in chats[-1]["messages"][1:]] == ["And now?"]
+
+
+def test_questions_need_a_question_or_a_known_preset(chats):
+    session_id = create().session_id
+    with pytest.raises(HTTPException) as error:
+        ask(session_id, preset="unknown")
+    assert error.value.status_code == 400
+
+
+def test_unknown_and_deleted_sessions_answer_404(chats):
+    session_id = create().session_id
+    asyncio.run(main.delete_analysis_session(session_id))
+    for call in (lambda: ask(session_id, question="Still there?"), lambda: asyncio.run(main.delete_analysis_session(session_id))):
+        with pytest.raises(HTTPException) as error:
+            call()
+        assert error.value.status_code == 404
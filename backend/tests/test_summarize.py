@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from summarize import (
+    chunk_segments, compact_segments, context_window, estimate_tokens, format_timestamp, group_by_budget, map_prompt,
+    summarize_chunks, trim_to_budget,
+)
+
+
+def texts(*captions):
+    segments = [{"text": text, "start": float(number), "duration": 1.0} for number, text in enumerate(captions)]
+    return [segment["text"] for segment in compact_segments(segments)]
+
+
+def test_removes_annotations_and_hesitations():
+    assert texts("[Music] so um today we", "♪♪ >> uh, look at caching") == ["so today we", "look at caching"]
+
+
+def test_drops_segments_left_empty():
+    assert texts("[Applause]", "hello there") == ["hello there"]
+
+
+def test_removes_rolling_caption_overlaps():
+    assert texts(
+        "welcome back to the channel",
+        "back to the channel today we look",
+        "today we look at sqlite",
+    ) == ["welcome back to the channel", "today we look", "at sqlite"]
+
+
+def test_removes_repeated_captions():
+    assert texts("this is the same caption", "this is the same caption", "and this is new") == [
+        "this is the same caption", "and this is new",
+    ]
+
+
+@pytest.mark.parametrize("captions", [
+    ("I really think that", "that is the point"),
+    ("it was very", "very good"),
+    ("we need to go go", "go now"),
+    ("New York New", "York is big"),
+])
+def test_keeps_repeated_words_of_speech(captions):
+    assert texts(*captions) == list(captions)
+
+
+def test_overlap_ignores_case():
+    assert texts("So This Is It", "so this is it really") == ["So This Is It", "really"]
+
+
+def test_token_estimates_follow_the_model_family():
+    text = "x" * 420
+    assert estimate_tokens(text) == 106
+    assert estimate_tokens(text, "llama3.2:3b") == 101
+    assert estimate_tokens(text, "library/mistral:7b") == 117
+    assert estimate_tokens(text, "unknown:latest") == estimate_tokens(text)
+
+
+def test_trim_keeps_transcripts_within_the_budget():
+    segments = [{"text": "x" * 36, "start": float(number), "duration": 1.0} for number in range(100)]
+    assert trim_to_budget(segments, 1000) is segments
+    trimmed = trim_to_budget(segments, 250)
+    assert sum(estimate_tokens(segment["text"]) for segment in trimmed) <= 250
+    # Evenly spaced segments are kept, so the end of the video is still represented
+    assert len(trimmed) == 25
+    assert trimmed[-1]["start"] >= 96
+
+
+@pytest.mark.parametrize("prompt_tokens, output_tokens, expected", [
+    (100, 100, 2048),
+    (2000, 100, 4096),
+    (5000, 1000, 8192),
+    (50000, 1000, 32768),
+])
+def test_context_window_is_a_bounded_power_of_two(prompt_tokens, output_tokens, expected):
+    assert context_window(prompt_tokens, output_tokens, minimum=2048, maximum=32768) == expected
+
+
+def caption(number, text=None, duration=5.0):
+    return {"text": text or f"caption number {number} with a few words", "start": number * 5.0, "duration": duration}
+
+
+def test_chunks_stay_within_the_budget_on_caption_boundaries():
+    segments = [caption(number) for number in range(30)]
+    chunks = chunk_segments(segments, 40)
+    assert [segment for chunk in chunks for segment in chunk] == segments
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert sum(estimate_tokens(segment["text"]) for segment in chunk) <= 40
+
+
+def test_oversized_captions_get_a_chunk_of_their_own():
+    segments = [caption(0), caption(1, "word " * 200), caption(2)]
+    assert [len(chunk) for chunk in chunk_segments(segments, 40)] == [1, 1, 1]
+
+
+def test_groups_have_at_least_two_texts():
+    groups = group_by_budget(["note " * 50] * 5, 10)
+    assert [len(group) for group in groups] == [2, 3]
+    assert group_by_budget(["short"], 100) == [["short"]]
+
+
+def test_map_prompts_carry_the_time_range():
+    prompt = map_prompt([caption(0), caption(13)], 2, 7, "de")
+    assert "part 2 of 7" in prompt
+    assert "[00:00-01:10]" in prompt
+    assert "short-code: de" in prompt
+    assert format_timestamp(3725) == "1:02:05"
+
+
+def test_summarize_chunks_maps_then_reduces_until_the_notes_fit():
+    prompts = []
+    running = {"now": 0, "most": 0}
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        running["now"] += 1
+        running["most"] = max(running["most"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return "notes " * 30
+
+    progress = []
+    segments = [caption(number) for number in range(40)]
+    notes = asyncio.run(summarize_chunks(generate, segments, "en", 60, 3, lambda done, total: progress.append((done, total))))
+    chunks = len(chunk_segments(segments, 60))
+    maps = [prompt for prompt in prompts if prompt.startswith("The following is part")]
+    reduces = [prompt for prompt in prompts if prompt.startswith("The following are consecutive notes")]
+    assert len(maps) == chunks
+    assert reduces
+    assert estimate_tokens(notes) <= 60
+    assert running["most"] == 3
+    assert progress[-1] == (chunks, chunks)
+
+
+def test_summarize_chunks_keeps_short_notes():
+    async def generate(prompt):
+        return "short notes"
+
+    assert asyncio.run(summarize_chunks(generate, [caption(number) for number in range(4)], "en", 20, 2)) == "\n\n".join(["short notes"] * 2)
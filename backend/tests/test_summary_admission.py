@@ -0,0 +1,116 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from admission import AdmissionController
+
+
+SEGMENTS = [{"text": f"sentence number {number} of the video", "start": float(number), "duration": 1.0} for number in range(40)]
+TOKENS = [f"token{number} " for number in range(10)]
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """
+    Fakes transcripts and Ollama: every video has the same short transcript, every generation streams TOKENS.
+    """
+    started = []
+    profile = main.resolve_profile("standard")
+
+    async def prepare_summary_request(pool, youtube_video_id, language, model, summary_profile):
+        transcript = " ".join(segment["text"] for segment in SEGMENTS)
+        return main.SummaryInput(SEGMENTS, f"{youtube_video_id} {transcript}", transcript, "llama3.2:3b", profile)
+
+    async def stream_generate(model, prompt, options=None):
+        started.append(prompt.split("\n\n")[1].split()[0])
+        for token in TOKENS:
+            await asyncio.sleep(0.005)
+            yield {"response": token}
+
+    monkeypatch.setattr(main, "prepare_summary_request", prepare_summary_request)
+    monkeypatch.setattr(main.default_pool, "stream_generate", stream_generate)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=2, max_queue=8))
+    main.summary_cache.clear()
+    yield started
+    main.summary_cache.clear()
+
+
+async def stream(video_id):
+    request = SimpleNamespace(client=None)
+    response = await main.video_summary_stream(request, video_id, "en", None, None, "standard", None)
+    events = []
+    async for chunk in response.body_iterator:
+        event, data = chunk.split("\n")[:2]
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def streamed_text(events):
+    return "".join(data["token"] for event, data in events if event == "token")
+
+
+def test_streams_waiting_for_a_slot_join_a_flight_started_meanwhile(generations):
+    async def run():
+        # Two streams hold both slots while two identical streams of another video wait for one
+        holders = [asyncio.ensure_future(stream(video_id)) for video_id in ("vidholder01", "vidholder02")]
+        await asyncio.sleep(0.001)
+        waiting = [asyncio.ensure_future(stream("vidwaiting1")) for _ in range(2)]
+        results = await asyncio.wait_for(asyncio.gather(*holders, *waiting), 5)
+        later = await asyncio.wait_for(stream("vidlater001"), 5)
+        return results, later
+
+    results, later = asyncio.run(run())
+    for events in results + [later]:
+        assert events[-1][0] == "done"
+        assert streamed_text(events) == "".join(TOKENS)
+    assert sorted(generations) == ["vidholder01", "vidholder02", "vidlater001", "vidwaiting1"]
+    assert main.generation_admission.stats()["in_flight"] == 0
+    assert not main.summary_streams
+
+
+def test_identical_streams_share_one_generation(generations):
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(stream("vidshared01") for _ in range(4))), 5)
+
+    for events in asyncio.run(run()):
+        assert streamed_text(events) == "".join(TOKENS)
+    assert generations == ["vidshared01"]
+    assert main.generation_admission.stats()["in_flight"] == 0
+
+
+def test_chunk_generations_count_towards_the_slots(monkeypatch):
+    running = {"now": 0, "most": 0}
+
+    async def generate_text(pool, model, prompt, profile):
+        running["now"] += 1
+        running["most"] = max(running["most"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return "notes"
+
+    monkeypatch.setattr(main, "generate_text", generate_text)
+    monkeypatch.setattr(main, "uses_map_reduce", lambda summary_input: True)
+    monkeypatch.setattr(main, "LONG_TRANSCRIPT_CHUNK_TOKENS", 20)
+    monkeypatch.setattr(main, "LONG_TRANSCRIPT_PARALLELISM", 4)
+    summary_input = main.SummaryInput(SEGMENTS, "transcript", "transcript", "llama3.2:3b", main.resolve_profile("deep"))
+
+    async def run(max_in_flight, summaries):
+        admission = AdmissionController(max_in_flight=max_in_flight, max_queue=8)
+        monkeypatch.setattr(main, "generation_admission", admission)
+        running["most"] = 0
+
+        async def summarize():
+            async with admission.slot():
+                return await main.summary_final_prompt(main.default_pool, summary_input, None, "en")
+
+        await asyncio.gather(*(summarize() for _ in range(summaries)))
+        return running["most"], admission.stats()["in_flight"]
+
+    # Spare slots let the chunks of one summary run in parallel, up to LONG_TRANSCRIPT_PARALLELISM
+    assert asyncio.run(run(8, 1)) == (4, 0)
+    # Without spare slots every summary generates one chunk at a time
+    assert asyncio.run(run(2, 2)) == (2, 0)
+    assert asyncio.run(run(3, 2)) == (3, 0)
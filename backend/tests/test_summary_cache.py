@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import AdmissionController
+
+
+SEGMENTS = [{"text": "a short video about caching", "start": 0.0, "duration": 2.0}]
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """
+    Fakes transcripts and Ollama, records the prompt of every generation.
+    """
+    prompts = []
+
+    async def prepare_summary_request(pool, youtube_video_id, language, model, summary_profile):
+        return main.SummaryInput(SEGMENTS, SEGMENTS[0]["text"], SEGMENTS[0]["text"], model or "llama3.2:3b", summary_profile)
+
+    async def generate(model, prompt, options=None):
+        prompts.append(prompt)
+        await asyncio.sleep(0.02)
+        return {"response": f"Summary number {len(prompts)}"}
+
+    monkeypatch.setattr(main, "prepare_summary_request", prepare_summary_request)
+    monkeypatch.setattr(main.default_pool, "generate", generate)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=4, max_queue=16))
+    main.summary_cache.clear()
+    yield prompts
+    main.summary_cache.clear()
+
+
+def summarize(video_id="cachevideo1", **kwargs):
+    return main.summarize_video(main.default_pool, video_id, kwargs.pop("language", "en"), kwargs.pop("model", None), kwargs.pop("prompt", None), **kwargs)
+
+
+def test_identical_requests_share_one_generation(generations):
+    async def run():
+        return await asyncio.gather(*(summarize() for _ in range(5)))
+
+    responses = asyncio.run(run())
+    assert len(generations) == 1
+    assert {response.summary for response in responses} == {"Summary number 1"}
+
+
+def test_repeated_requests_are_answered_from_the_cache(generations):
+    first = asyncio.run(summarize())
+    second = asyncio.run(summarize())
+    assert len(generations) == 1
+    assert second.summary == first.summary
+    assert main.summary_cache.stats()["hits"] >= 1
+
+
+@pytest.mark.parametrize("change", [
+    {"video_id": "cachevideo2"},
+    {"language": "de"},
+    {"model": "mistral:7b"},
+    {"prompt": "Summarize [[concatenated_transcript]] in one line."},
+    {"profile": "quick"},
+])
+def test_different_requests_are_generated_separately(generations, change):
+    asyncio.run(summarize())
+    asyncio.run(summarize(**change))
+    assert len(generations) == 2
+
+
+def test_summary_keys_are_content_addresses():
+    key = main.summary_cache_key("video", "en", "llama3.2:3b", "prompt", "standard")
+    assert key == main.summary_cache_key("video", "en", "llama3.2:3b", "prompt", "standard")
+    assert key != main.summary_cache_key("video", "en", "llama3.2:3b", "prompt ", "standard")
+    assert key.startswith("video:")
+
+
+def test_clients_holding_the_summary_get_304_without_a_generation(generations):
+    client = TestClient(main.app)
+    first = client.get("/video_summary/cachevideo3", params={"fields": "summary"})
+    assert first.json() == {"summary": "Summary number 1"}
+    etag = first.headers["ETag"]
+    main.summary_cache.clear()
+    again = client.get("/video_summary/cachevideo3", params={"fields": "summary"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert len(generations) == 1
+    # The ETag covers the selected fields
+    assert client.get("/video_summary/cachevideo3", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,20 @@
+import ast
+import os
+
+import main
+
+
+def frontend_default_prompt() -> str:
+    # Read without importing the frontend, which needs Dash
+    path = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "app.py")
+    with open(path, encoding="utf-8") as f:
+        module = ast.parse(f.read())
+    for node in module.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "DEFAULT_PROMPT" for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise AssertionError("frontend/app.py defines no DEFAULT_PROMPT")
+
+
+def test_frontend_default_prompt_is_the_backend_default():
+    # The frontend leaves an unchanged default prompt out, so that its summaries are the pre-warmed ones
+    assert main.build_summary_prompt(frontend_default_prompt(), "TRANSCRIPT", "de") == main.build_summary_prompt(None, "TRANSCRIPT", "de")
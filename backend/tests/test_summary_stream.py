@@ -0,0 +1,105 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from admission import AdmissionController
+
+
+SEGMENTS = [{"text": "a short video about streaming", "start": 0.0, "duration": 2.0}]
+TOKENS = ["Streamed ", "summary ", "text."]
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    state = {"started": 0, "cancelled": 0}
+
+    async def prepare_summary_request(pool, youtube_video_id, language, model, summary_profile):
+        if youtube_video_id.startswith("missing"):
+            raise main.SummaryRequestError("Transcript not found for the specified language.")
+        return main.SummaryInput(SEGMENTS, SEGMENTS[0]["text"], SEGMENTS[0]["text"], "llama3.2:3b", summary_profile)
+
+    async def stream_generate(model, prompt, options=None):
+        state["started"] += 1
+        try:
+            for token in TOKENS:
+                await asyncio.sleep(0.02)
+                yield {"response": token}
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+
+    monkeypatch.setattr(main, "prepare_summary_request", prepare_summary_request)
+    monkeypatch.setattr(main.default_pool, "stream_generate", stream_generate)
+    monkeypatch.setattr(main, "generation_admission", AdmissionController(max_in_flight=1, max_queue=0))
+    main.summary_cache.clear()
+    yield state
+    main.summary_cache.clear()
+
+
+async def open_stream(video_id):
+    response = await main.video_summary_stream(SimpleNamespace(client=None), video_id, "en", None, None, None, None)
+    assert response.media_type == "text/event-stream"
+    return response.body_iterator
+
+
+def parse(chunk):
+    event, data = chunk.split("\n")[:2]
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+async def read(video_id):
+    return [parse(chunk) async for chunk in await open_stream(video_id)]
+
+
+def test_streams_tokens_then_the_summary(generations):
+    events = asyncio.run(read("streamvid01"))
+    assert [event for event, _ in events] == ["token"] * len(TOKENS) + ["done"]
+    assert [data["token"] for _, data in events[:-1]] == TOKENS
+    assert events[-1][1]["summary"] == "".join(TOKENS)
+    assert events[-1][1]["cached"] is False
+
+
+def test_streams_cached_summaries_at_once(generations):
+    asyncio.run(read("streamvid02"))
+    events = asyncio.run(read("streamvid02"))
+    assert events == [
+        ("token", {"token": "".join(TOKENS)}),
+        ("done", {**events[-1][1], "summary": "".join(TOKENS), "cached": True}),
+    ]
+    assert generations["started"] == 1
+
+
+def test_streams_errors(generations):
+    assert asyncio.run(read("missing0001")) == [("error", {"error": "Transcript not found for the specified language."})]
+
+
+def test_disconnected_streams_cancel_their_generation(generations):
+    async def run():
+        events = await open_stream("streamvid03")
+        await events.__anext__()
+        await events.aclose()
+        await asyncio.sleep(0.05)
+        # The slot is free again
+        return await read("streamvid04")
+
+    events = asyncio.run(run())
+    assert events[-1][0] == "done"
+    assert generations["cancelled"] == 1
+    assert main.generation_admission.stats()["in_flight"] == 0
+    assert main.summary_cache.stats()["entries"] == 1
+
+
+def test_rejects_streams_while_overloaded(generations):
+    async def run():
+        first = await open_stream("streamvid05")
+        with pytest.raises(main.HTTPException) as raised:
+            await open_stream("streamvid06")
+        await first.aclose()
+        return raised.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert "Retry-After" in error.headers
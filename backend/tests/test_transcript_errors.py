@@ -0,0 +1,84 @@
+import asyncio
+import traceback
+
+import pytest
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+import main
+from cache import NegativeCache
+
+
+def traceback_depth(error: BaseException) -> int:
+    return len(traceback.extract_tb(error.__traceback__))
+
+
+@pytest.fixture(autouse=True)
+def reset_transcript_state():
+    main.negative_cache.invalidate()
+    main.transcript_breaker.success()
+    yield
+    main.negative_cache.invalidate()
+    main.transcript_breaker.success()
+
+
+def test_negative_cache_returns_fresh_copies():
+    cache = NegativeCache(ttl=60)
+    try:
+        raise NoTranscriptFound("video", ["de"], [])
+    except NoTranscriptFound as e:
+        cache.set("transcript:video:de", e)
+    first = cache.get("transcript:video:de")
+    second = cache.get("transcript:video:de")
+    assert first is not second
+    assert type(first) is NoTranscriptFound
+    assert first.video_id == "video"
+    assert str(first) == str(second)
+    assert first.__traceback__ is None
+
+
+def test_negative_cache_expires():
+    cache = NegativeCache(ttl=0.01)
+    cache.set("key", TranscriptsDisabled("video"))
+    assert cache.get("key") is not None
+    asyncio.run(asyncio.sleep(0.02))
+    assert cache.get("key") is None
+
+
+def test_remembered_failures_do_not_grow_tracebacks():
+    calls = []
+
+    async def download():
+        calls.append(1)
+        raise NoTranscriptFound("video", ["de"], [])
+
+    async def request():
+        with pytest.raises(NoTranscriptFound) as raised:
+            await main.guarded_transcript_call(["transcript:video", "transcript:video:de"], download)
+        return raised.value
+
+    async def run():
+        return [await request() for _ in range(200)]
+
+    errors = asyncio.run(run())
+    assert len(calls) == 1
+    assert max(traceback_depth(error) for error in errors[1:]) < 5
+
+
+def test_missing_language_is_remembered_for_the_language_only():
+    async def download():
+        raise NoTranscriptFound("video", ["de"], [])
+
+    with pytest.raises(NoTranscriptFound):
+        asyncio.run(main.guarded_transcript_call(["transcript:video", "transcript:video:de"], download))
+    assert main.negative_cache.get("transcript:video:de") is not None
+    assert main.negative_cache.get("transcript:video") is None
+
+
+@pytest.mark.parametrize("error, counts", [
+    (NoTranscriptFound("video", ["de"], []), False),
+    (TranscriptsDisabled("video"), False),
+    (main.TranscriptServiceUnavailable("video"), True),
+    (ConnectionResetError("reset"), True),
+])
+def test_only_upstream_faults_count_towards_the_breaker(error, counts):
+    assert main.transcript_breaker.is_failure(error) is counts
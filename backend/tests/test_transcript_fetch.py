@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import main
+
+
+SEGMENTS = [{"text": "hello world", "start": 0.0, "duration": 2.0}]
+LANGUAGES = [{"code": "en", "name": "English"}]
+
+
+def counting(monkeypatch, name, result):
+    calls = []
+    lock = threading.Lock()
+
+    def download(*args):
+        with lock:
+            calls.append(args)
+        time.sleep(0.05)
+        return result
+
+    monkeypatch.setattr(main, name, download)
+    monkeypatch.setattr(main, "TRANSCRIPT_SERVICE_URL", None)
+    return calls
+
+
+def test_concurrent_transcript_requests_share_one_download(monkeypatch):
+    calls = counting(monkeypatch, "_download_transcript", (SEGMENTS, LANGUAGES))
+    puts = []
+    put = main.segment_store.put
+    monkeypatch.setattr(main.segment_store, "put", lambda *args: puts.append(args) or put(*args))
+
+    async def run():
+        return await asyncio.gather(*(main.fetch_transcript("coalesced01", "en") for _ in range(8)))
+
+    transcripts = asyncio.run(run())
+    assert len(calls) == 1
+    assert len(puts) == 1
+    assert {transcript.text() for transcript in transcripts} == {"hello world"}
+    # Later requests read the stored transcript
+    asyncio.run(main.fetch_transcript("coalesced01", "en"))
+    assert len(calls) == 1
+
+
+def test_concurrent_language_requests_share_one_download(monkeypatch):
+    calls = counting(monkeypatch, "_download_transcript_languages", LANGUAGES)
+
+    async def run():
+        return await asyncio.gather(*(main.fetch_transcript_languages("coalesced02") for _ in range(8)))
+
+    assert asyncio.run(run()) == [LANGUAGES] * 8
+    assert len(calls) == 1
+
+
+def test_different_languages_are_not_coalesced(monkeypatch):
+    calls = counting(monkeypatch, "_download_transcript", (SEGMENTS, LANGUAGES))
+
+    async def run():
+        await asyncio.gather(main.fetch_transcript("coalesced03", "en"), main.fetch_transcript("coalesced03", "de"))
+
+    asyncio.run(run())
+    assert sorted(args[1] for args in calls) == ["de", "en"]
@@ -0,0 +1,116 @@
+import asyncio
+
+import main
+from cache import TTLCache
+
+
+class Loader:
+    def __init__(self, *values, delay=0.0):
+        self.values = list(values)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def age(cache: TTLCache, key: str, seconds: float) -> None:
+    stored_at, value = cache._entries[key]
+    cache._entries[key] = (stored_at - seconds, value)
+
+
+def test_fresh_entries_are_served_from_the_cache():
+    cache = TTLCache(ttl=60)
+    loader = Loader("first", "second")
+
+    async def run():
+        return await cache.get_or_load("k", loader), await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == ("first", "first")
+    assert loader.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_concurrent_loads_of_a_key_are_coalesced():
+    cache = TTLCache(ttl=60)
+    loader = Loader("value", delay=0.02)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert loader.calls == 1
+
+
+def test_stale_entries_are_served_while_refreshed_in_the_background():
+    cache = TTLCache(ttl=10, stale_ttl=60)
+    loader = Loader("old", "new")
+
+    async def run():
+        await cache.get_or_load("k", loader)
+        age(cache, "k", 20)
+        stale = await cache.get_or_load("k", loader)
+        await asyncio.gather(*cache._refreshes)
+        return stale, await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == ("old", "new")
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_a_failed_refresh_keeps_the_stale_value():
+    cache = TTLCache(ttl=10, stale_ttl=60)
+    loader = Loader("old", RuntimeError("upstream down"))
+
+    async def run():
+        await cache.get_or_load("k", loader)
+        age(cache, "k", 20)
+        await cache.get_or_load("k", loader)
+        await asyncio.gather(*cache._refreshes)
+        return cache._entries["k"][1]
+
+    assert asyncio.run(run()) == "old"
+
+
+def test_expired_entries_are_loaded_again():
+    cache = TTLCache(ttl=10, stale_ttl=5)
+    loader = Loader("old", "new")
+
+    async def run():
+        await cache.get_or_load("k", loader)
+        age(cache, "k", 20)
+        return await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == "new"
+
+
+def test_none_is_not_cached_and_the_oldest_entries_are_evicted():
+    cache = TTLCache(ttl=60, max_entries=2)
+    asyncio.run(cache.get_or_load("none", Loader(None)))
+    assert cache.stats()["entries"] == 0
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert list(cache._entries) == ["b", "c"]
+    cache.invalidate("b")
+    assert list(cache._entries) == ["c"]
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_model_list_is_refreshed_when_a_required_model_is_missing(monkeypatch):
+    lists = Loader(["a:latest"], ["a:latest", "b:latest"])
+    monkeypatch.setattr(main.default_pool, "list_models", lists)
+    main.model_list_cache.invalidate()
+
+    async def run():
+        return await main.available_models(main.default_pool), await main.available_models(main.default_pool, "b:latest")
+
+    try:
+        assert asyncio.run(run()) == (["a:latest"], ["a:latest", "b:latest"])
+        assert lists.calls == 2
+    finally:
+        main.model_list_cache.invalidate()
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+LANGUAGES = [{"code": "de", "name": "German"}, {"code": "en", "name": "English"}]
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """
+    Fakes oEmbed, transcripts and Ollama, records the prefetched transcripts.
+    """
+    state = {"oembed": {"title": "A video", "thumbnail_url": "https://i.ytimg.com/a.jpg"}, "models": ["a:latest", "b:latest"], "prefetched": []}
+
+    async def fetch_oembed(video_id):
+        return state["oembed"]
+
+    async def fetch_transcript_languages(video_id):
+        return LANGUAGES
+
+    async def fetch_transcript(video_id, language):
+        state["prefetched"].append((video_id, language))
+        return []
+
+    async def available_models(pool, required=None):
+        if isinstance(state["models"], Exception):
+            raise state["models"]
+        return state["models"]
+
+    async def loaded_models():
+        return {"b:latest"}
+
+    monkeypatch.setattr(main, "fetch_oembed", fetch_oembed)
+    monkeypatch.setattr(main, "fetch_transcript_languages", fetch_transcript_languages)
+    monkeypatch.setattr(main, "fetch_transcript", fetch_transcript)
+    monkeypatch.setattr(main, "available_models", available_models)
+    monkeypatch.setattr(main, "DEFAULT_MODEL", None)
+    monkeypatch.setattr(main.default_pool, "loaded_models", loaded_models)
+    return state
+
+
+def prepare(video_id="preparevid1"):
+    async def run():
+        response = await main.prepare_video(video_id, None)
+        await asyncio.gather(*main._prefetches)
+        return response
+
+    return asyncio.run(run())
+
+
+def test_returns_metadata_languages_models_and_profiles(upstreams):
+    response = prepare()
+    assert response.title == "A video"
+    assert response.supported_languages == LANGUAGES
+    assert response.models == ["a:latest", "b:latest"]
+    # The loaded model is picked, so the summary does not wait for a model load
+    assert response.default_model == "b:latest"
+    assert response.default_profile == main.DEFAULT_SUMMARY_PROFILE
+    assert {profile["name"] for profile in response.profiles} == set(main.SUMMARY_PROFILES)
+
+
+def test_prefetches_the_transcript_of_the_first_language(upstreams):
+    prepare()
+    assert upstreams["prefetched"] == [("preparevid1", "de")]
+
+
+def test_model_errors_are_reported_next_to_the_metadata(upstreams):
+    upstreams["models"] = ConnectionError("Ollama is down")
+    response = prepare()
+    assert response.title == "A video"
+    assert response.models == []
+    assert "Ollama is down" in response.models_error
+
+
+def test_unknown_videos_answer_404(upstreams):
+    upstreams["oembed"] = None
+    with pytest.raises(HTTPException) as error:
+        prepare()
+    assert error.value.status_code == 404
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Ollama API, used by the benchmark harness.
+Simulates model load time, prompt evaluation, time-to-first-token, generation speed and failures,
+and reports the same timing fields as Ollama (load_duration, prompt_eval_count, eval_duration, ...).
+Like Ollama, it keeps the last prompt per model and only evaluates the part of a prompt that differs from it.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import os
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHARS_PER_TOKEN = 4
+EMBEDDING_DIMENSIONS = 256
+
+
+def create_app(
+    models=("llama3.2:3b", "qwen2.5:7b", "nomic-embed-text:latest"),
+    tokens_per_second: float = 40.0,
+    ttft_ms: float = 300.0,
+    prompt_tokens_per_second: float = 2000.0,
+    output_tokens: int = 200,
+    load_ms: float = 2000.0,
+    failure_rate: float = 0.0,
+) -> FastAPI:
+    app = FastAPI()
+    loaded = set()
+    last_prompts = {}  # Model -> last prompt, standing in for the KV cache
+
+    def evaluated_tokens(model: str, prompt: str) -> int:
+        """
+        Tokens of `prompt` that are not a prefix shared with the previous prompt of the model.
+        """
+        shared = len(os.path.commonprefix([last_prompts.get(model, ""), prompt]))
+        last_prompts[model] = prompt
+        return (len(prompt) - shared) // CHARS_PER_TOKEN + 1
+
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    async def prepare(model: str, prompt_tokens: int) -> dict:
+        """
+        Sleeps for model load, prompt evaluation and time-to-first-token, returns the timing fields in nanoseconds.
+        """
+        load_duration = 0.0
+        if model not in loaded:
+            load_duration = load_ms / 1000
+            loaded.add(model)
+        prompt_eval_duration = prompt_tokens / prompt_tokens_per_second
+        await asyncio.sleep(load_duration + prompt_eval_duration + ttft_ms / 1000)
+        return {
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval_duration * 1e9),
+        }
+
+    def failed() -> bool:
+        return random.random() < failure_rate
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": model, "model": model, "size": 2_000_000_000, "digest": "0" * 64} for model in models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": model, "model": model, "size": 2_000_000_000, "digest": "0" * 64} for model in loaded]}
+
+    @app.get("/")
+    async def health():
+        return "Ollama is running"
+
+    async def generation(model: str, prompt: str, body: dict, chat: bool):
+        """
+        Generation response, streamed or not, in the format of /api/generate or /api/chat.
+        """
+        prompt_tokens = evaluated_tokens(model, prompt)
+        options = body.get("options") or {}
+        count = min(output_tokens, options.get("num_predict") or output_tokens)
+        if count < 0:
+            count = output_tokens
+        stream = body.get("stream", True)
+
+        async def tokens():
+            started = time.monotonic()
+            timings = await prepare(model, prompt_tokens)
+            eval_started = time.monotonic()
+            for index in range(count):
+                await asyncio.sleep(1 / tokens_per_second)
+                yield {"model": model, "created_at": now(), **text(f"tok{index} "), "done": False}
+            eval_duration = time.monotonic() - eval_started
+            yield {
+                "model": model, "created_at": now(), **text(""), "done": True, "done_reason": "stop",
+                "total_duration": int((time.monotonic() - started) * 1e9),
+                "eval_count": count, "eval_duration": int(eval_duration * 1e9), **timings,
+                **({} if chat else {"context": [1, 2, 3]}),
+            }
+
+        def text(content: str) -> dict:
+            return {"message": {"role": "assistant", "content": content}} if chat else {"response": content}
+
+        if stream:
+            async def lines():
+                async for chunk in tokens():
+                    yield json.dumps(chunk) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        parts = []
+        async for chunk in tokens():
+            parts.append(chunk["message"]["content"] if chat else chunk["response"])
+        chunk.update(text("".join(parts).strip()))
+        return chunk
+
+    def check_request(model: str):
+        # Like Ollama, a model name without a tag means the "latest" tag
+        if model not in models and f"{model}:latest" not in models:
+            return JSONResponse({"error": f"model '{model}' not found"}, status_code=404)
+        if failed():
+            return JSONResponse({"error": "simulated failure"}, status_code=500)
+        return None
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = body.get("model", models[0])
+        error = check_request(model)
+        if error is not None:
+            return error
+
+        if not body.get("prompt"):
+            # Empty prompts only load the model, as in Ollama
+            started = time.monotonic()
+            timings = await prepare(model, 0)
+            return {"model": model, "created_at": now(), "response": "", "done": True, "done_reason": "load",
+                    "total_duration": int((time.monotonic() - started) * 1e9), **timings}
+
+        return await generation(model, body["prompt"], body, chat=False)
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", models[0])
+        error = check_request(model)
+        if error is not None:
+            return error
+
+        prompt = "".join(f"<|{message['role']}|>{message.get('content', '')}\n" for message in body.get("messages", []))
+        return await generation(model, prompt, body, chat=True)
+
+    def embedding(text: str) -> list:
+        """
+        Hashed bag of words, so that texts sharing words get similar embeddings.
+        """
+        vector = [0.0] * EMBEDDING_DIMENSIONS
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,!?").encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS] += 1.0
+        return vector
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        model = body.get("model", models[0])
+        error = check_request(model)
+        if error is not None:
+            return error
+
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        started = time.monotonic()
+        prompt_tokens = sum(len(text) // CHARS_PER_TOKEN + 1 for text in inputs)
+        timings = await prepare(model, prompt_tokens)
+        return {"model": model, "embeddings": [embedding(text) for text in inputs],
+                "total_duration": int((time.monotonic() - started) * 1e9),
+                "load_duration": timings["load_duration"], "prompt_eval_count": prompt_tokens}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18002)
+    parser.add_argument("--models", default="llama3.2:3b,qwen2.5:7b,nomic-embed-text:latest", help="Comma separated model names.")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Time to first token after prompt evaluation.")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--load-ms", type=float, default=2000.0, help="Model load time on first use.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of generations answered with HTTP 500.")
+    args = parser.parse_args()
+    app = create_app(
+        models=tuple(args.models.split(",")),
+        tokens_per_second=args.tokens_per_second,
+        ttft_ms=args.ttft_ms,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        output_tokens=args.output_tokens,
+        load_ms=args.load_ms,
+        failure_rate=args.failure_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,105 @@
+"""
+Local stand-in for YouTube's oEmbed endpoint and for transcripts, used by the benchmark harness.
+Point the backend at it with YOUTUBE_OEMBED_URL=http://host:port/oembed and TRANSCRIPT_SERVICE_URL=http://host:port.
+
+Video IDs starting with "missing" are unknown (404), IDs starting with "nocaps" have transcripts disabled,
+and requests for IDs starting with "limited" are rate limited (429).
+/feeds/videos.xml?channel_id=... stands in for a channel's Atom feed, as read by the backend's pre-warming.
+"""
+import argparse
+import asyncio
+import random
+import re
+
+from fastapi import FastAPI, HTTPException, Response
+
+WORDS = (
+    "the model video today we talk about performance latency cache token transcript summary "
+    "really important thing here is that you know we measure everything and then improve it"
+).split()
+
+
+def create_app(segments: int = 600, words_per_segment: int = 12, latency_ms: float = 80.0) -> FastAPI:
+    app = FastAPI()
+
+    async def simulate_latency():
+        if latency_ms:
+            # +-25% jitter around the configured latency
+            await asyncio.sleep(latency_ms / 1000 * random.uniform(0.75, 1.25))
+
+    def check_video(video_id: str):
+        if video_id.startswith("limited"):
+            raise HTTPException(status_code=429, detail="Too Many Requests")
+        if video_id.startswith("missing"):
+            raise HTTPException(status_code=404, detail="Video not found.")
+        if video_id.startswith("nocaps"):
+            raise HTTPException(status_code=403, detail="Transcripts are disabled.")
+
+    @app.get("/oembed")
+    async def oembed(url: str, format: str = "json"):
+        await simulate_latency()
+        match = re.search(r"v=([0-9A-Za-z_-]+)", url)
+        video_id = match.group(1) if match else "unknown"
+        if video_id.startswith("limited"):
+            raise HTTPException(status_code=429, detail="Too Many Requests")
+        if video_id.startswith("missing"):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return {
+            "title": f"Benchmark video {video_id}",
+            "thumbnail_url": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            "author_name": "Benchmark",
+        }
+
+    @app.get("/transcripts/{video_id}")
+    async def transcript_languages(video_id: str):
+        await simulate_latency()
+        check_video(video_id)
+        return {"languages": [{"code": "en", "name": "English"}, {"code": "de", "name": "German (auto-generated)"}]}
+
+    @app.get("/transcripts/{video_id}/{language}")
+    async def transcript(video_id: str, language: str):
+        await simulate_latency()
+        check_video(video_id)
+        if language not in ("en", "de"):
+            raise HTTPException(status_code=404, detail="No transcript in this language.")
+        rng = random.Random(f"{video_id}:{language}")
+        return {"segments": [
+            {
+                "text": " ".join(rng.choice(WORDS) for _ in range(words_per_segment)),
+                "start": index * 4.0,
+                "duration": 4.0,
+            }
+            for index in range(segments)
+        ]}
+
+    @app.get("/feeds/videos.xml")
+    async def feed(channel_id: str = "benchmark", videos: int = 5):
+        await simulate_latency()
+        # Stable 11 character video IDs per channel, newest first
+        prefix = re.sub(r"[^0-9A-Za-z]", "", channel_id)[:4].ljust(4, "x")
+        entries = "".join(
+            f"<entry><id>yt:video:{prefix}{index:07d}</id><yt:videoId>{prefix}{index:07d}</yt:videoId>"
+            f"<title>Benchmark video {index}</title></entry>"
+            for index in range(videos, 0, -1)
+        )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>{channel_id}</title>{entries}</feed>"
+        )
+        return Response(body, media_type="application/atom+xml")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18001)
+    parser.add_argument("--segments", type=int, default=600, help="Caption segments per transcript (600 is about 40 minutes).")
+    parser.add_argument("--words-per-segment", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Simulated upstream latency per request.")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.segments, args.words_per_segment, args.latency_ms), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,110 @@
+"""
+Load generator for the backend endpoints.
+Sends a fixed number of requests at a fixed concurrency and reports latency percentiles and throughput.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Endpoint paths per scenario, {video_id} is replaced for every request
+SCENARIOS = {
+    "metadata": "/video_metadata/{video_id}",
+    "transcripts": "/video_transcripts/{video_id}",
+    "summary": "/video_summary/{video_id}",
+    "prepare": "/video_prepare/{video_id}",
+}
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_latencies(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies) + errors,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration else None,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ms), 2) if ms else None,
+            "p50": round(percentile(ms, 0.50), 2) if ms else None,
+            "p95": round(percentile(ms, 0.95), 2) if ms else None,
+            "p99": round(percentile(ms, 0.99), 2) if ms else None,
+            "max": round(max(ms), 2) if ms else None,
+        },
+    }
+
+
+async def run_load(
+    base_url: str,
+    scenario: str,
+    concurrency: int,
+    requests: int,
+    video_pool: int,
+    video_prefix: str = "bench",
+    params: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 600,
+) -> Dict[str, Any]:
+    """
+    Sends `requests` requests of `scenario` with at most `concurrency` in flight, cycling through
+    `video_pool` distinct video IDs (a pool of 1 measures the fully cached path).
+    A request counts as an error if it is not answered with 200 or its JSON body carries an error.
+    """
+    path = SCENARIOS[scenario]
+    latencies: List[float] = []
+    errors = 0
+    error_samples: List[str] = []
+    counter = iter(range(requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for index in counter:
+                video_id = f"{video_prefix}{index % video_pool:06d}"
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path.format(video_id=video_id), params=params, headers=headers)
+                    body = response.json()
+                    error = body.get("error") if isinstance(body, dict) else None
+                    if response.status_code != 200 or error:
+                        raise RuntimeError(error or f"HTTP {response.status_code}: {body}")
+                except Exception as e:
+                    errors += 1
+                    if len(error_samples) < 5:
+                        error_samples.append(str(e)[:200])
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        duration = time.perf_counter() - started
+
+    result = summarize_latencies(latencies, errors, duration)
+    result.update({"scenario": scenario, "concurrency": concurrency, "video_pool": video_pool, "error_samples": error_samples})
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="metadata")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--video-pool", type=int, default=20, help="Number of distinct video IDs to cycle through.")
+    parser.add_argument("--video-prefix", default="bench")
+    args = parser.parse_args()
+    result = asyncio.run(run_load(args.base_url, args.scenario, args.concurrency, args.requests, args.video_pool, args.video_prefix))
+    print(json.dumps(result, indent=2))
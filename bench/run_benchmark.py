@@ -0,0 +1,174 @@
+"""
+Runs the backend against local stand-ins for YouTube and Ollama and measures it under load.
+
+Starts fake_youtube.py, fake_ollama.py and the backend (with a fresh cache directory) as subprocesses,
+drives every scenario at every concurrency level with loadgen.py, samples the backend's resident memory
+and writes all results, together with the configuration and git revision, to a JSON file.
+
+    python bench/run_benchmark.py --scenarios metadata,summary --concurrency 1,16,64 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from loadgen import SCENARIOS, run_load
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), "backend")
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """
+    Resident set size of a process, read from /proc (Linux only).
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_memory(pid: int, samples: List[int], interval: float = 0.1) -> None:
+    while True:
+        rss = rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds.")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenarios(args, backend_pid: int, base_url: str) -> List[Dict[str, Any]]:
+    results = []
+    for scenario in args.scenarios.split(","):
+        for concurrency in [int(value) for value in args.concurrency.split(",")]:
+            samples: List[int] = []
+            sampler = asyncio.create_task(sample_memory(backend_pid, samples))
+            # Every run uses its own video IDs, so caches only help within a run
+            prefix = f"{scenario[:3]}c{concurrency}-"
+            result = await run_load(base_url, scenario, concurrency, args.requests, args.video_pool, video_prefix=prefix)
+            sampler.cancel()
+            result["backend_rss_bytes"] = {"peak": max(samples) if samples else None, "end": samples[-1] if samples else None}
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                result["cache_stats"] = (await client.get("/cache_stats")).json()
+            results.append(result)
+            latency = result["latency_ms"]
+            print(
+                f"{scenario:12s} c={concurrency:<4d} ok={result['succeeded']:<5d} err={result['errors']:<4d} "
+                f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+                f"rps={result['throughput_rps']}",
+                flush=True,
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="metadata,transcripts,summary", help=f"Comma separated, out of: {', '.join(sorted(SCENARIOS))}.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level.")
+    parser.add_argument("--video-pool", type=int, default=20, help="Distinct video IDs per run, fewer IDs mean more cache hits.")
+    parser.add_argument("--output", default=None, help="Result file, defaults to bench/results/<timestamp>.json.")
+    parser.add_argument("--backend-port", type=int, default=18000)
+    parser.add_argument("--youtube-port", type=int, default=18001)
+    parser.add_argument("--ollama-port", type=int, default=18002)
+    # Stand-in behaviour
+    parser.add_argument("--segments", type=int, default=600)
+    parser.add_argument("--youtube-latency-ms", type=float, default=80.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--load-ms", type=float, default=2000.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    youtube_url = f"http://127.0.0.1:{args.youtube_port}"
+    ollama_url = f"http://127.0.0.1:{args.ollama_port}"
+    base_url = f"http://127.0.0.1:{args.backend_port}"
+    cache_dir = tempfile.mkdtemp(prefix="yt-tldr-bench-")
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, "fake_youtube.py"), "--port", str(args.youtube_port),
+            "--segments", str(args.segments), "--latency-ms", str(args.youtube_latency_ms),
+        ]))
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, "fake_ollama.py"), "--port", str(args.ollama_port),
+            "--tokens-per-second", str(args.tokens_per_second), "--ttft-ms", str(args.ttft_ms),
+            "--output-tokens", str(args.output_tokens), "--load-ms", str(args.load_ms),
+            "--failure-rate", str(args.failure_rate),
+        ]))
+        backend_env = {
+            **os.environ,
+            "CACHE_DIR": cache_dir,
+            "OLLAMA_API_URL": ollama_url,
+            "OLLAMA_HOSTS": ollama_url,
+            "YOUTUBE_OEMBED_URL": f"{youtube_url}/oembed",
+            "TRANSCRIPT_SERVICE_URL": youtube_url,
+        }
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.backend_port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=backend_env,
+        )
+        processes.append(backend)
+
+        wait_ready(f"{youtube_url}/transcripts/ready")
+        wait_ready(ollama_url)
+        wait_ready(f"{base_url}/cache_stats")
+
+        started_at = datetime.now(timezone.utc)
+        results = asyncio.run(run_scenarios(args, backend.pid, base_url))
+
+        report = {
+            "started_at": started_at.isoformat(),
+            "git_revision": git_revision(),
+            "config": vars(args),
+            "results": results,
+        }
+        output = args.output or os.path.join(BENCH_DIR, "results", f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as result_file:
+            json.dump(report, result_file, indent=2)
+        print(f"Results written to {output}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
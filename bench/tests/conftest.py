@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bench scripts import each other as top-level modules, as when they run from the bench directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import fake_ollama
+import fake_youtube
+
+
+def youtube():
+    return TestClient(fake_youtube.create_app(segments=3, words_per_segment=4, latency_ms=0))
+
+
+def ollama(**kwargs):
+    return TestClient(fake_ollama.create_app(
+        tokens_per_second=10000, ttft_ms=0, prompt_tokens_per_second=1e9, output_tokens=5, load_ms=0, **kwargs,
+    ))
+
+
+def test_fake_youtube_transcripts_are_deterministic():
+    client = youtube()
+    first = client.get("/transcripts/benchvideo1/en").json()["segments"]
+    assert len(first) == 3
+    assert all(len(segment["text"].split()) == 4 for segment in first)
+    assert client.get("/transcripts/benchvideo1/en").json()["segments"] == first
+    assert client.get("/transcripts/benchvideo1/fr").status_code == 404
+
+
+def test_fake_youtube_failure_prefixes():
+    client = youtube()
+    assert client.get("/transcripts/missing0001").status_code == 404
+    assert client.get("/transcripts/nocaps00001/en").status_code == 403
+    assert client.get("/transcripts/limited0001").status_code == 429
+    assert client.get("/oembed", params={"url": "http://www.youtube.com/watch?v=missing0001"}).status_code == 404
+    assert client.get("/oembed", params={"url": "http://www.youtube.com/watch?v=benchvideo1"}).json()["title"] == "Benchmark video benchvideo1"
+
+
+def test_fake_youtube_feed_lists_stable_video_ids():
+    body = youtube().get("/feeds/videos.xml", params={"channel_id": "UCabc", "videos": 2}).text
+    assert "<yt:videoId>UCab0000002</yt:videoId>" in body
+    assert "<yt:videoId>UCab0000001</yt:videoId>" in body
+
+
+def test_fake_ollama_generates_with_ollama_timing_fields():
+    client = ollama()
+    response = client.post("/api/generate", json={"model": "llama3.2:3b", "prompt": "hello", "stream": False}).json()
+    assert response["response"] == "tok0 tok1 tok2 tok3 tok4"
+    assert response["eval_count"] == 5
+    assert {"load_duration", "prompt_eval_count", "prompt_eval_duration", "total_duration"} <= set(response)
+    assert [model["model"] for model in client.get("/api/ps").json()["models"]] == ["llama3.2:3b"]
+
+
+def test_fake_ollama_streams_and_honors_num_predict():
+    client = ollama()
+    response = client.post("/api/generate", json={"model": "llama3.2:3b", "prompt": "hello", "options": {"num_predict": 2}})
+    chunks = [json.loads(line) for line in response.text.splitlines()]
+    assert [chunk["response"] for chunk in chunks] == ["tok0 ", "tok1 ", ""]
+    assert chunks[-1]["done"]
+
+
+def test_fake_ollama_evaluates_only_the_new_part_of_a_prompt():
+    client = ollama()
+
+    def evaluated(prompt):
+        body = {"model": "llama3.2:3b", "prompt": prompt, "stream": False}
+        return client.post("/api/generate", json=body).json()["prompt_eval_count"]
+
+    prefix = "transcript " * 100
+    assert evaluated(prefix + "first question") > 250
+    assert evaluated(prefix + "second question") < 10
+
+
+def test_fake_ollama_rejects_unknown_models_and_simulates_failures():
+    assert ollama().post("/api/generate", json={"model": "unknown", "prompt": "hi"}).status_code == 404
+    assert ollama(failure_rate=1.0).post("/api/generate", json={"model": "llama3.2:3b", "prompt": "hi"}).status_code == 500
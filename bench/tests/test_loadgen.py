@@ -0,0 +1,25 @@
+from loadgen import percentile, summarize_latencies
+
+
+def test_percentile():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 0.0) == 1.0
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 1.0) == 5.0
+    assert percentile([], 0.5) is None
+
+
+def test_summarize_latencies():
+    result = summarize_latencies([0.1, 0.2, 0.3, 0.4], errors=1, duration=2.0)
+    assert result["requests"] == 5
+    assert result["succeeded"] == 4
+    assert result["errors"] == 1
+    assert result["throughput_rps"] == 2.0
+    assert result["latency_ms"]["mean"] == 250.0
+    assert result["latency_ms"]["max"] == 400.0
+
+
+def test_summarize_latencies_without_successes():
+    result = summarize_latencies([], errors=3, duration=0)
+    assert result["throughput_rps"] is None
+    assert set(result["latency_ms"].values()) == {None}
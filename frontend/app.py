@@ -1,12 +1,23 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback_context
+from dash import html, dcc, Input, Output, State, DiskcacheManager, no_update
 import dash_bootstrap_components as dbc
+import diskcache
 import requests
+from requests.adapters import HTTPAdapter
+import os
 import re
+import json
+import time
+
+# Long-running callbacks run as background jobs in worker processes, coordinated through a disk cache,
+# so that they do not hold a web server thread while the summary is generated
+BACKGROUND_CACHE_DIR = os.getenv("BACKGROUND_CACHE_DIR", "./cache")
+background_callback_manager = DiskcacheManager(diskcache.Cache(BACKGROUND_CACHE_DIR))
 
 # Initialize the Dash app with Bootstrap theme for better styling
 app = dash.Dash(
     __name__, 
+    background_callback_manager=background_callback_manager,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
     title="YT-TL;DR",
     meta_tags=[
@@ -28,6 +39,32 @@ DEFAULT_PROMPT = (
     "4. The summary shall be in this language as identified by its short-code: [[language]].\n"
     "5. Output the summary in Markdown syntax.\n"
 )
+STREAM_REFRESH_INTERVAL_MS = 300  # How often the result area is refreshed while a summary is streamed
+BACKEND_TIMEOUT = (5, 60)  # Connect and read timeout in seconds for backend requests
+SUMMARY_READ_TIMEOUT = 600  # Seconds a streamed summary may stay silent, e.g. while a long transcript is condensed
+BACKEND_POOL_SIZE = 32  # Pooled keep-alive connections to the backend per process
+
+# Pooled backend sessions, one per process: background callbacks run in worker processes,
+# which must not reuse connections opened by their parent
+_backend_sessions = {}
+
+def backend_session():
+    session = _backend_sessions.get(os.getpid())
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BACKEND_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _backend_sessions[os.getpid()] = session
+    return session
+
+RESULT_BOX_STYLE = {
+    "border": "2px solid #ddd",  # Light grey border
+    "borderRadius": "10px",     # Rounded corners
+    "padding": "15px",          # Padding inside the box
+    "backgroundColor": "#FFF8DC",  # Light cream background
+    "minHeight": "100px",       # Ensure it is visible by default
+}
 
 # Layout of the Dash app
 app.layout = dbc.Container([
@@ -50,10 +87,10 @@ app.layout = dbc.Container([
                         dbc.Input(
                             id="ollama-api-url-input",
                             type="url",
-                            placeholder="http://localhost:11434",
-                            value="http://localhost:11434",  # Updated default
+                            placeholder="Ollama hosts of the backend",
+                            value="",
                         ),
-                        dbc.FormText("Enter the URL where your Ollama instance is running."),
+                        dbc.FormText("Enter the URL of another Ollama instance, or leave empty to use the Ollama hosts the backend is configured with."),
                     ], width=12),
                 ]),
                 dbc.Row([
@@ -121,35 +158,52 @@ app.layout = dbc.Container([
                     ),
                 ], width=12),
             ], className="mt-2"),
+
+            # Summary Profile Selection Dropdown: trades summary depth for latency
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Select Summary Profile"),
+                    dcc.Dropdown(
+                        id="profile-dropdown",
+                        options=[],  # To be populated dynamically
+                        value=None,
+                        placeholder="Select a profile",
+                        clearable=False,
+                    ),
+                ], width=12),
+            ], className="mt-2"),
             
-            # Action Button: Generate Summary
+            # Action Buttons: Generate Summary and cancel a running one
             dbc.Button("Generate Summary", id="generate-summary-button", color="success", className="mt-2", disabled=True),
+            dbc.Button("Cancel", id="cancel-summary-button", color="secondary", className="mt-2 ms-2", disabled=True),
             html.Hr(),
             
-            # Result Display Area
-            dcc.Loading(
-                id="loading-output",
-                type="default",  # Default spinner type
-                children=html.Div(
-                    id="shared-results",
-                    className="mt-2",
-                    style={
-                        "border": "2px solid #ddd",  # Light grey border
-                        "borderRadius": "10px",     # Rounded corners
-                        "padding": "15px",          # Padding inside the box
-                        "backgroundColor": "#FFF8DC",  # Light cream background
-                        "minHeight": "100px",       # Ensure it is visible by default
-                    },
-                ),
-            )
+            # Result Display Area. The preview is filled progressively while the summary is streamed
+            # and replaced by the final result once it is finished
+            html.Div(
+                [
+                    html.Div(id="summary-preview", hidden=True),
+                    html.Div(
+                        id="shared-results",
+                        children=dcc.Markdown(
+                            "No results yet.",
+                            style={"whiteSpace": "pre-wrap"},
+                        ),
+                    ),
+                ],
+                className="mt-2",
+                style=RESULT_BOX_STYLE,
+            ),
 
         ], width=6)
     ], justify="center"),
     # Hidden store components to keep settings and selected language
-    dcc.Store(id='ollama-api-url-store', data="http://localhost:11434"),
+    dcc.Store(id='ollama-api-url-store', data=""),  # Empty unless the user overrides the backend's Ollama hosts
     dcc.Store(id='selected-language-store', data=None),
     dcc.Store(id='default-prompt-store', data=DEFAULT_PROMPT),
-    dcc.Store(id='default-model', data=DEFAULT_MODEL)
+    dcc.Store(id='default-model', data=DEFAULT_MODEL),
+    dcc.Store(id='profiles-store', data={}),  # Summary profiles of the backend and the model it would pick
+    dcc.Store(id='profile-model-store', data=None),  # Model last selected for a profile, to tell it from the user's choice
 ])
 
 def extract_video_id(input_str):
@@ -166,27 +220,36 @@ def extract_video_id(input_str):
     else:
         return None
 
-# Callback to fetch video metadata and populate language dropdown
+# Callback to fetch video metadata, transcript languages and available models in one backend round-trip
 @app.callback(
     [
         Output("error-message", "children"),
         Output("video-metadata", "children"),
         Output("language-dropdown", "options"),
         Output("language-dropdown", "value"),
+        Output("model-dropdown", "options"),
+        Output("model-dropdown", "value"),
+        Output("profile-dropdown", "options"),
+        Output("profile-dropdown", "value"),
+        Output("profiles-store", "data"),
+        Output("generate-summary-button", "disabled"),
     ],
     [Input("submit-button", "n_clicks")],
-    [State("youtube-url-input", "value")],
+    [State("youtube-url-input", "value"), State("ollama-api-url-store", "data")],
 )
-def fetch_video_metadata(n_clicks, input_value):
+def fetch_video_metadata(n_clicks, input_value, ollama_api_url):
     if not n_clicks:
-        return "", "", [], None
+        return "", "", [], None, [], None, [], None, {}, True
 
-    video_id = extract_video_id(input_value)
+    video_id = extract_video_id(input_value or "")
     if not video_id:
-        return "Invalid YouTube URL or Video ID.", "", [], None
+        return "Invalid YouTube URL or Video ID.", "", [], None, [], None, [], None, {}, True
 
     try:
-        response = requests.get(f"{BACKEND_API_URL}/video_metadata/{video_id}")
+        headers = {}
+        if ollama_api_url:
+            headers["X-Ollama-API-URL"] = ollama_api_url
+        response = backend_session().get(f"{BACKEND_API_URL}/video_prepare/{video_id}", headers=headers, timeout=BACKEND_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             metadata_items = [
@@ -206,52 +269,67 @@ def fetch_video_metadata(n_clicks, input_value):
             # Default to first language if available
             default_language = languages[0]["code"] if languages else 'No transcript available'
 
-            return "", metadata_div, language_options, default_language
+            # Prepare model options, preferring the backend's choice (a model already loaded in memory),
+            # then models that contain DEFAULT_MODEL
+            models = data.get("models") or []
+            if not models:
+                return data.get("models_error") or "No models found in Ollama.", metadata_div, language_options, default_language, [], None, [], None, {}, True
+            model_options = [{"label": model, "value": model} for model in models]
+            default_model = ([m for m in [data.get("default_model")] if m in models] + [m for m in models if DEFAULT_MODEL in m.lower()] + models)[0]
+
+            # Prepare profile options, labelled with their latency targets
+            profiles = data.get("profiles") or []
+            profile_options = [
+                {"label": f"{profile['name'].capitalize()} (about {profile['latency_target']:g} s)", "value": profile["name"], "title": profile["description"]}
+                for profile in profiles
+            ]
+            profiles_data = {"profiles": profiles, "default_model": default_model}
+
+            return "", metadata_div, language_options, default_language, model_options, default_model, profile_options, data.get("default_profile"), profiles_data, False
         else:
             # Attempt to extract error detail from response
             try:
                 error_detail = response.json().get('detail', 'Unknown error')
             except ValueError:
                 error_detail = "Unknown error."
-            return f"Error fetching metadata: {error_detail}", "", [], None
+            return f"Error fetching metadata: {error_detail}", "", [], None, [], None, [], None, {}, True
     except Exception as e:
-        return f"Error connecting to backend: {e}", "", [], None
+        return f"Error connecting to backend: {e}", "", [], None, [], None, [], None, {}, True
 
-# Callback to fetch available models and populate the model dropdown
+def profile_model(profile, profiles_data, models, model, selected_model):
+    """
+    Returns the model to select for a profile, or None to keep the selected one: the profile's preferred model
+    (SUMMARY_PROFILE_MODELS on the backend), e.g. a small model for the quick profile, or else the model the
+    backend picked. A model the user chose by hand is kept.
+    """
+    profiles_data = profiles_data or {}
+    default_model = profiles_data.get("default_model")
+    if model and model not in (selected_model, default_model):
+        return None
+    preferred = next((item.get("model") for item in profiles_data.get("profiles", []) if item["name"] == profile), None)
+    return preferred if preferred in models else default_model
+
+# Callback to select the model of the chosen profile
 @app.callback(
     [
-        Output("model-dropdown", "options"),
-        Output("model-dropdown", "value"),
-        Output("generate-summary-button", "disabled"),
+        Output("model-dropdown", "value", allow_duplicate=True),
+        Output("profile-model-store", "data"),
     ],
-    [Input("submit-button", "n_clicks")],
-    [State("ollama-api-url-store", "data")],
-    prevent_initial_call=True
+    [Input("profile-dropdown", "value")],
+    [
+        State("profiles-store", "data"),
+        State("model-dropdown", "options"),
+        State("model-dropdown", "value"),
+        State("profile-model-store", "data"),
+    ],
+    prevent_initial_call=True,
 )
-def fetch_available_models(n_clicks, ollama_api_url):
-    if not n_clicks:
-        return [], None, True
-    
-    try:
-        headers = {}
-        if ollama_api_url:
-            headers["X-Ollama-API-URL"] = ollama_api_url
-        response = requests.get(
-            f"{BACKEND_API_URL}/available_models",
-            #headers=headers
-        )
-        if response.status_code == 200:
-            models = response.json()
-            if not models:
-                return ['empty'], None, True
-            options = [{"label": model, "value": model} for model in models]
-            default_models = [m for m in models if DEFAULT_MODEL in m.lower()] + models
-            default_model = default_models[0]
-            return options, default_model, False
-        else:
-            return ['wrong_status_code'], None, True
-    except Exception as e:
-        return ['error'], None, True
+def select_profile_model(profile, profiles_data, model_options, model, selected_model):
+    models = [option["value"] for option in model_options or []]
+    selected = profile_model(profile, profiles_data, models, model, selected_model)
+    if selected is None:
+        return no_update, no_update
+    return selected, selected
 
 # Callback to store selected language
 @app.callback(
@@ -267,7 +345,7 @@ def store_selected_language(selected_language):
     [Input('ollama-api-url-input', 'value')]
 )
 def store_ollama_api_url(ollama_api_url):
-    return ollama_api_url
+    return (ollama_api_url or "").strip()
 
 # Callback to store default prompt
 @app.callback(
@@ -298,7 +376,15 @@ def check_ollama_connection(n_clicks, ollama_api_url):
     if not n_clicks:
         return ""
     try:
-        response = requests.get(f"{ollama_api_url}/health")  # Assuming Ollama has a health endpoint
+        if not ollama_api_url:
+            # Without an override the backend's own Ollama hosts are used, it reports their health
+            response = backend_session().get(f"{BACKEND_API_URL}/ollama_hosts", timeout=BACKEND_TIMEOUT)
+            response.raise_for_status()
+            healthy = [host["url"] for host in response.json() if host.get("healthy")]
+            if healthy:
+                return dbc.Alert(f"Connected to Ollama API via the backend ({', '.join(healthy)}).", color="success")
+            return dbc.Alert("None of the backend's Ollama hosts is reachable.", color="danger")
+        response = backend_session().get(f"{ollama_api_url}/health", timeout=BACKEND_TIMEOUT)  # Assuming Ollama has a health endpoint
         if response.status_code == 200:
             return dbc.Alert("Connected to Ollama API successfully.", color="success")
         else:
@@ -306,7 +392,49 @@ def check_ollama_connection(n_clicks, ollama_api_url):
     except Exception as e:
         return dbc.Alert(f"Error connecting to Ollama API: {e}", color="danger")
 
-# Callback to update the result field based on button clicks
+def stream_summary(video_id, params, headers, on_update):
+    """
+    Reads the Server-Sent Events of the backend's streaming summary endpoint, calling `on_update` with
+    the text generated so far (or a status message) at most every STREAM_REFRESH_INTERVAL_MS.
+    Returns the complete summary and an error message, one of which is None.
+    """
+    text = ""
+    last_update = 0.0
+    with backend_session().get(
+        f"{BACKEND_API_URL}/video_summary_stream/{video_id}",
+        params=params,
+        headers=headers,
+        stream=True,
+        timeout=(BACKEND_TIMEOUT[0], SUMMARY_READ_TIMEOUT),
+    ) as response:
+        if response.status_code != 200:
+            try:
+                error_detail = response.json().get('detail', 'Unknown error')
+            except ValueError:
+                error_detail = "Unknown error."
+            return None, f"Error generating summary: {error_detail}"
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "token":
+                    text += data.get("token", "")
+                elif event == "progress" and not text:
+                    on_update(None, "Condensing the long transcript part by part...")
+                elif event == "done":
+                    return data.get("summary", text), None
+                elif event == "error":
+                    return None, data.get("error", "Unknown error.")
+                if text and time.monotonic() - last_update >= STREAM_REFRESH_INTERVAL_MS / 1000:
+                    last_update = time.monotonic()
+                    on_update(text, None)
+    return (text or None), (None if text else "The summary stream ended unexpectedly.")
+
+# Background callback to generate a summary when the button is clicked. The summary is streamed
+# into the preview while it is generated, and the Cancel button stops the generation.
 @app.callback(
     Output("shared-results", "children"),
     [
@@ -317,59 +445,56 @@ def check_ollama_connection(n_clicks, ollama_api_url):
         State("selected-language-store", "data"),
         State("ollama-api-url-store", "data"),
         State("model-dropdown", "value"),
+        State("profile-dropdown", "value"),
         State("default-prompt-store", "data"),
-    ]
+    ],
+    background=True,
+    progress=[Output("summary-preview", "children")],
+    progress_default=[dbc.Spinner(size="sm", spinner_class_name="me-2")],
+    running=[
+        (Output("summary-preview", "hidden"), False, True),
+        (Output("shared-results", "hidden"), True, False),
+        (Output("cancel-summary-button", "disabled"), False, True),
+    ],
+    cancel=[Input("cancel-summary-button", "n_clicks")],
+    interval=STREAM_REFRESH_INTERVAL_MS,
+    prevent_initial_call=True
 )
-def update_output(summary_click, input_value, language, ollama_api_url, model, default_prompt):
-    ctx = callback_context
-
-    if not ctx.triggered:
-        return dcc.Markdown(
-            "No results yet.",
-            style={"whiteSpace": "pre-wrap"},
-        )
-
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+def update_output(set_progress, summary_click, input_value, language, ollama_api_url, model, profile, default_prompt):
+    if not summary_click:
+        return dcc.Markdown("No results yet.", style={"whiteSpace": "pre-wrap"})
 
-    video_id = extract_video_id(input_value)
+    video_id = extract_video_id(input_value or "")
     if not video_id:
         return dbc.Alert("Invalid Video ID.", color="danger")
 
-    if triggered_id == "generate-summary-button" and summary_click:
-        try:
-            headers = {}
-            if ollama_api_url:
-                headers["X-Ollama-API-URL"] = ollama_api_url
-
-            # Replace placeholders in the prompt
-            custom_prompt = default_prompt.format(transcript=("{transcript}"), language=language)
-
-            # Since the backend expects {transcript} and {language}, we'll send the full prompt
-            response = requests.get(
-                f"{BACKEND_API_URL}/video_summary/{video_id}",
-                params={"language": language, "model": model, "prompt": custom_prompt},
-                headers=headers,
-            )
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("error"):
-                    return dbc.Alert(data["error"], color="danger")
-                summary = data.get("summary", "No summary available.")
-                return dcc.Markdown(summary, className="mt-2")
-            else:
-                # Attempt to extract error detail from response
-                try:
-                    error_detail = response.json().get('detail', 'Unknown error')
-                except ValueError:
-                    error_detail = "Unknown error."
-                return dbc.Alert(f"Error generating summary: {error_detail}", color="danger")
-        except Exception as e:
-            return dbc.Alert(f"Error connecting to backend: {e}", color="danger")
-
-    return dcc.Markdown(
-        "No results available.",
-        style={"whiteSpace": "pre-wrap"},
-    )
+    headers = {}
+    if ollama_api_url:
+        headers["X-Ollama-API-URL"] = ollama_api_url
+
+    # Replace placeholders in the prompt
+    custom_prompt = default_prompt.format(transcript=("{transcript}"), language=language)
+
+    # Since the backend expects {transcript} and {language}, we'll send the full prompt, unless it is
+    # unchanged: then the backend uses the profile's prompt or its own default, the same text as DEFAULT_PROMPT,
+    # and the summary is shared with other clients and with pre-warming
+    params = {"language": language, "model": model, "profile": profile}
+    if default_prompt != DEFAULT_PROMPT:
+        params["prompt"] = custom_prompt
+
+    def on_update(text, status):
+        if text:
+            set_progress([dcc.Markdown(text, className="mt-2")])
+        else:
+            set_progress([html.Div([dbc.Spinner(size="sm", spinner_class_name="me-2"), status])])
+
+    try:
+        summary, error = stream_summary(video_id, params, headers, on_update)
+    except Exception as e:
+        return dbc.Alert(f"Error connecting to backend: {e}", color="danger")
+    if error:
+        return dbc.Alert(error, color="danger")
+    return dcc.Markdown(summary, className="mt-2")
 
 if __name__ == '__main__':
     app.run_server(host='0.0.0.0', port=8050, debug=False)
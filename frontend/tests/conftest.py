@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# app is imported as a top-level module, as when the frontend runs from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The background callback cache is created on import, keep it out of the working tree
+os.environ.setdefault("BACKGROUND_CACHE_DIR", tempfile.mkdtemp(prefix="yt-tldr-frontend-tests-"))
@@ -0,0 +1,40 @@
+import pytest
+
+from app import extract_video_id, profile_model
+
+
+PROFILES = {
+    "default_model": "llama3.2:3b",
+    "profiles": [
+        {"name": "quick", "model": "llama3.2:1b"},
+        {"name": "standard", "model": None},
+        {"name": "deep", "model": "qwen2.5:14b"},
+    ],
+}
+MODELS = ["llama3.2:3b", "llama3.2:1b", "mistral:7b"]
+
+
+def test_selects_the_preferred_model_of_a_profile():
+    assert profile_model("quick", PROFILES, MODELS, "llama3.2:3b", None) == "llama3.2:1b"
+    assert profile_model("quick", PROFILES, MODELS, None, None) == "llama3.2:1b"
+
+
+def test_falls_back_to_the_backend_default():
+    # Back from quick to a profile without a preferred model
+    assert profile_model("standard", PROFILES, MODELS, "llama3.2:1b", "llama3.2:1b") == "llama3.2:3b"
+    # The preferred model is not installed
+    assert profile_model("deep", PROFILES, MODELS, "llama3.2:3b", None) == "llama3.2:3b"
+
+
+def test_keeps_a_model_chosen_by_hand():
+    assert profile_model("quick", PROFILES, MODELS, "mistral:7b", None) is None
+    assert profile_model("standard", PROFILES, MODELS, "mistral:7b", "llama3.2:1b") is None
+
+
+@pytest.mark.parametrize("value, video_id", [
+    ("dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42", "dQw4w9WgXcQ"),
+    ("https://youtu.be/dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+])
+def test_extract_video_id(value, video_id):
+    assert extract_video_id(value) == video_id
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+import app
+
+
+class FakeResponse:
+    def __init__(self, lines=(), status_code=200, body=None):
+        self.lines = list(lines)
+        self.status_code = status_code
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("No JSON")
+        return self.body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return self.response
+
+
+def events(*items):
+    lines = []
+    for event, data in items:
+        lines += [f"event: {event}", f"data: {json.dumps(data)}", ""]
+    return lines
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """
+    Answers backend requests with `backend.response`, and refreshes the preview on every event.
+    """
+    session = FakeSession(FakeResponse())
+    monkeypatch.setattr(app, "backend_session", lambda: session)
+    monkeypatch.setattr(app, "STREAM_REFRESH_INTERVAL_MS", 0)
+    return session
+
+
+def stream(updates=None):
+    updates = [] if updates is None else updates
+    return app.stream_summary("dQw4w9WgXcQ", {"language": "en"}, {}, lambda text, status: updates.append((text, status)))
+
+
+def test_tokens_update_the_preview_until_the_summary_is_done(backend):
+    backend.response = FakeResponse(events(
+        ("token", {"token": "Hello"}), ("token", {"token": " world"}), ("done", {"summary": "Hello world."}),
+    ))
+    updates = []
+    assert stream(updates) == ("Hello world.", None)
+    assert updates == [("Hello", None), ("Hello world", None)]
+    url, kwargs = backend.requests[0]
+    assert url.endswith("/video_summary_stream/dQw4w9WgXcQ")
+    assert kwargs["stream"] and kwargs["params"] == {"language": "en"}
+
+
+def test_progress_shows_a_status_before_the_first_token(backend):
+    backend.response = FakeResponse(events(("progress", {"stage": "map", "done": 1, "total": 4}), ("done", {"summary": "Done."})))
+    updates = []
+    assert stream(updates) == ("Done.", None)
+    assert updates == [(None, "Condensing the long transcript part by part...")]
+
+
+def test_errors_are_returned(backend):
+    backend.response = FakeResponse(events(("token", {"token": "Hel"}), ("error", {"error": "Ollama went away."})))
+    assert stream() == (None, "Ollama went away.")
+
+
+def test_rejected_requests_return_the_backend_detail(backend):
+    backend.response = FakeResponse(status_code=429, body={"detail": "Too many summaries are being generated."})
+    assert stream() == (None, "Error generating summary: Too many summaries are being generated.")
+    backend.response = FakeResponse(status_code=502)
+    assert stream() == (None, "Error generating summary: Unknown error.")
+
+
+def test_a_stream_ending_early_keeps_the_text_so_far(backend):
+    backend.response = FakeResponse(events(("token", {"token": "Partial"})))
+    assert stream() == ("Partial", None)
+    backend.response = FakeResponse([])
+    assert stream() == (None, "The summary stream ended unexpectedly.")
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """
+    Records the parameters of the summaries update_output requests.
+    """
+    requests = []
+
+    def stream_summary(video_id, params, headers, on_update):
+        requests.append((video_id, params, headers))
+        on_update("Partial", None)
+        return "The summary.", None
+
+    monkeypatch.setattr(app, "stream_summary", stream_summary)
+    return requests
+
+
+def test_update_output_streams_into_the_preview(summaries):
+    progress = []
+    result = app.update_output(progress.append, 1, "https://youtu.be/dQw4w9WgXcQ", "en", None, "llama3.2:3b", "quick", app.DEFAULT_PROMPT)
+    assert result.children == "The summary."
+    assert progress[0][0].children == "Partial"
+    video_id, params, headers = summaries[0]
+    assert video_id == "dQw4w9WgXcQ"
+    # The unchanged default prompt is left to the backend, so the summary is shared
+    assert params == {"language": "en", "model": "llama3.2:3b", "profile": "quick"}
+    assert headers == {}
+
+
+def test_update_output_sends_custom_prompts_and_ollama_urls(summaries):
+    app.update_output(lambda _: None, 1, "dQw4w9WgXcQ", "de", "http://ollama:11434", None, "standard", "Summarize [[concatenated_transcript]]")
+    _, params, headers = summaries[0]
+    assert params["prompt"] == "Summarize [[concatenated_transcript]]"
+    assert headers == {"X-Ollama-API-URL": "http://ollama:11434"}
+
+
+def test_update_output_rejects_invalid_videos(summaries):
+    result = app.update_output(lambda _: None, 1, "not a video", "en", None, None, "standard", app.DEFAULT_PROMPT)
+    assert result.children == "Invalid Video ID."
+    assert summaries == []